@@ -0,0 +1,86 @@
+"""
+Benchmark of the block-parallel bz2 readers in `exomol2lida.read_data` against the
+`exomole.read_data` readers.
+
+By default, the integration-test resources are read. Optionally, a synthetic .trans
+file of a given (uncompressed) size can be generated and read as well:
+
+    python -m benchmarks.bz2_reader --threads 1 4 8 --synthetic-mb 4000
+"""
+
+import argparse
+import bz2
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from exomole import read_data as exomole_read_data
+
+from exomol2lida import read_data
+
+resources_dir = Path(__file__).parents[1] / "tests_integration" / "resources"
+
+
+def write_synthetic_trans(path, size_mb, num_states=1_000_000, seed=0):
+    """Write a synthetic bz2-compressed .trans file of roughly `size_mb` megabytes
+    (uncompressed)."""
+    rng = np.random.default_rng(seed)
+    rows_per_batch = 1_000_000
+    written = 0
+    with bz2.open(path, "wb") as stream:
+        while written < size_mb * 1e6:
+            i = rng.integers(1, num_states, rows_per_batch)
+            f = rng.integers(1, num_states, rows_per_batch)
+            a_if = rng.lognormal(-2, 3, rows_per_batch)
+            lines = "".join(
+                f"{ii:12d} {ff:12d} {aa:10.4e}\n" for ii, ff, aa in zip(i, f, a_if)
+            ).encode()
+            stream.write(lines)
+            written += len(lines)
+
+
+def time_trans_reader(trans_paths, chunk_size, num_threads=None):
+    start = time.perf_counter()
+    num_rows = 0
+    if num_threads is None:
+        chunks = exomole_read_data.trans_chunks(trans_paths, chunk_size=chunk_size)
+    else:
+        chunks = read_data.trans_chunks(
+            trans_paths, chunk_size=chunk_size, num_threads=num_threads
+        )
+    for chunk in chunks:
+        num_rows += len(chunk)
+    return num_rows, time.perf_counter() - start
+
+
+def run(trans_paths, chunk_size, threads):
+    size_mb = sum(path.stat().st_size for path in trans_paths) / 1e6
+    print(f"{len(trans_paths)} file(s), {size_mb:.1f} MB compressed")
+    num_rows, elapsed = time_trans_reader(trans_paths, chunk_size)
+    print(f"  exomole reader:     {elapsed:8.2f} s  {num_rows / elapsed:12,.0f} rows/s")
+    for num_threads in threads:
+        num_rows, elapsed = time_trans_reader(trans_paths, chunk_size, num_threads)
+        print(
+            f"  {num_threads:2d} thread(s):       {elapsed:8.2f} s  "
+            f"{num_rows / elapsed:12,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--synthetic-mb", type=int, default=0)
+    args = parser.parse_args()
+
+    run(
+        sorted(resources_dir.glob("dummy_data.trans_0*.bz2")),
+        args.chunk_size,
+        args.threads,
+    )
+    if args.synthetic_mb:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            synthetic_path = Path(tmp_dir) / "synthetic.trans.bz2"
+            write_synthetic_trans(synthetic_path, args.synthetic_mb)
+            run([synthetic_path], args.chunk_size, args.threads)
@@ -0,0 +1,94 @@
+"""
+Benchmark of the .trans readers selectable by `config.TRANS_READER`: the
+`exomole.read_data.trans_chunks` against the NumPy-based
+`exomol2lida.read_data.fixed_width_trans_chunks`.
+
+The .trans files are decompressed into a temporary directory first, so only the
+parsing is timed. By default, the integration-test resources are read. Optionally, a
+synthetic fixed-width .trans file of a given size can be generated and read as well:
+
+    python -m benchmarks.trans_parser --synthetic-mb 500
+"""
+
+import argparse
+import bz2
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from exomol2lida import read_data
+
+resources_dir = Path(__file__).parents[1] / "tests_integration" / "resources"
+
+
+def write_synthetic_trans(path, size_mb, num_states=1_000_000, seed=0):
+    """Write a synthetic fixed-width .trans file (with the v_if column) of roughly
+    `size_mb` megabytes."""
+    rng = np.random.default_rng(seed)
+    rows_per_batch = 1_000_000
+    written = 0
+    with open(path, "wb") as stream:
+        while written < size_mb * 1e6:
+            i = rng.integers(1, num_states, rows_per_batch)
+            f = rng.integers(1, num_states, rows_per_batch)
+            a_if = rng.lognormal(-2, 3, rows_per_batch)
+            v_if = rng.uniform(0, 20_000, rows_per_batch)
+            lines = "".join(
+                f"{ii:12d} {ff:12d} {aa:10.4e} {vv:15.6f}\n"
+                for ii, ff, aa, vv in zip(i, f, a_if, v_if)
+            ).encode()
+            stream.write(lines)
+            written += len(lines)
+
+
+def time_trans_reader(trans_paths, chunk_size, reader):
+    start = time.perf_counter()
+    num_rows = 0
+    for chunk in read_data.read_trans_chunks(trans_paths, chunk_size, reader=reader):
+        num_rows += len(chunk)
+    return num_rows, time.perf_counter() - start
+
+
+def run(trans_paths, chunk_size, repeat):
+    size_mb = sum(path.stat().st_size for path in trans_paths) / 1e6
+    print(f"{len(trans_paths)} file(s), {size_mb:.1f} MB uncompressed")
+    rates = {}
+    for reader in read_data.TRANS_READERS:
+        num_rows, elapsed = min(
+            (time_trans_reader(trans_paths, chunk_size, reader) for _ in range(repeat)),
+            key=lambda result: result[1],
+        )
+        rates[reader] = num_rows / elapsed
+        print(f"  {reader + ':':10s} {elapsed:8.2f} s  {rates[reader]:12,.0f} rows/s")
+    print(f"  gain:      {rates['numpy'] / rates['exomole']:8.2f} x")
+
+
+def decompress(paths, out_dir):
+    out_paths = []
+    for path in paths:
+        out_path = Path(out_dir) / path.stem
+        with bz2.open(path, "rb") as src, open(out_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        out_paths.append(out_path)
+    return out_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synthetic-mb", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trans_paths = decompress(
+            sorted(resources_dir.glob("dummy_data.trans_0*.bz2")), tmp_dir
+        )
+        run(trans_paths, args.chunk_size, args.repeat)
+        if args.synthetic_mb:
+            synthetic_path = Path(tmp_dir) / "synthetic.trans"
+            write_synthetic_trans(synthetic_path, args.synthetic_mb)
+            run([synthetic_path], args.chunk_size, args.repeat)
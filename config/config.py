@@ -8,10 +8,61 @@ OUTPUT_DIR = project_root / "output"
 EXOMOL_DATA_DIR = None
 
 # ******************************* PROCESSING ***************************************** #
-# chunk size for .states files: approx 1,000,000 per 1GB of RAM
+# chunk size for .states files: approx 5,000,000 per 1GB of RAM (only the needed
+# columns are parsed, into compact dtypes)
 STATES_CHUNK_SIZE = 1_000_000
 # chunk size for .trans files: roughly 10,000,000 per 1GB of RAM
 TRANS_CHUNK_SIZE = 10_000_000
+# number of worker processes reducing the .trans files (1 for serial processing)
+NUM_WORKERS = 1
+# approx size in bytes of the spans the .trans files are split into, each reduced by
+# a single worker task (a .trans file to be indexed is only split once indexed)
+TRANS_SPAN_SIZE = 256_000_000
+# number of threads decompressing each .bz2 file by blocks (1 for the exomole readers)
+DECOMPRESSION_THREADS = 1
+# reader of the .trans files: "exomole" (pandas-based exomole readers) or "numpy"
+# (fixed-width NumPy parser, skipping the v_if column)
+TRANS_READER = "exomole"
+# local cache of the decompressed input files in a columnar binary form
+# (None disables caching) and its disk budget in bytes
+CACHE_DIR = None
+CACHE_SIZE_LIMIT = 100_000_000_000
+# directory of the block indices of the .trans files, used to skip the blocks without
+# any transitions between the filtered states (None for a "trans_index" directory in
+# the CACHE_DIR, or for no indexing at all if the CACHE_DIR is None either)
+TRANS_INDEX_DIR = None
+# checkpoints of the transitions lumping (see `process.py --resume`), saved every
+# CHECKPOINT_CHUNKS chunks of the .trans files or every CHECKPOINT_INTERVAL seconds,
+# whichever comes first (None disables either)
+CHECKPOINT_CHUNKS = 100
+CHECKPOINT_INTERVAL = 600
+# persist the prelumps of each .trans file in the output directories, so the
+# transitions lumping can be re-evaluated without reading the .trans files again
+PERSIST_PRELUMPS = False
+# persist the results of the states lumping (the lumped states, the dense map of the
+# original onto the lumped states and the Boltzmann weights of all the original states)
+# in the output directories, so the states lumping is skipped when processed again
+PERSIST_STATES = False
+# temperatures in [K] of the Boltzmann weights of the lifetimes, all processed in a
+# single pass (None for the TEMP from exomol2lida/utils.py only). The outputs at the
+# first temperature go to the usual files, and with several temperatures, the outputs
+# at each of them go also to the states_data_{T}K.csv and transitions_data_{T}K.csv
+TEMPERATURES = None
+# number of the fastest decay channels (lumped transitions) kept for each lumped state,
+# unless overridden by the "num_channels" of the molecule input
+NUM_CHANNELS = 5
+# discard the transitions which cannot end up lumped into the downward (negative nu)
+# lumped transitions as soon as they are read, instead of accumulating them first, to
+# roughly halve the memory of the transitions lumping (the outputs are the same)
+DOWNWARD_ONLY = False
+# store the raw transitions as uint32 i, f and float32 A_if as soon as they are read
+# (12 instead of up to 24 bytes per row), only summing the A_if in float64. The tau_if,
+# tau and tau_five are then within about 2**-24 (6e-8) relative of their float64
+# values (the renormalized tau_if within 3 * 2**-24), if all the A_if exceed 1.2e-38
+MIXED_PRECISION = False
+# memory budget in bytes of all the jobs running at once with `process.py all --jobs N`
+# (a job estimated over the budget only runs with no other jobs running)
+MEMORY_BUDGET = 16_000_000_000
 
 # ****************************** LOCAL CONFIG **************************************** #
 # load the local config:
@@ -0,0 +1,760 @@
+"""
+Module with array-backed accumulators used by the `DatasetProcessor` to reduce the
+ExoMol data chunk by chunk.
+
+The accumulators replace the per-lump python callbacks and per-chunk re-indexing of
+the growing pandas objects: each chunk is reduced with a single vectorized aggregation
+and merged into numpy arrays indexed by an integer *slot*, which is assigned to each
+lump the first time it is seen.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _grow(array, size, fill_value):
+    """Return the `array` extended to at least `size` elements.
+
+    The capacity is doubled, so the amortized cost of growing is linear. New elements
+    are initialised to the `fill_value`.
+
+    Parameters
+    ----------
+    array : numpy.ndarray
+    size : int
+    fill_value : int or float
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill_value, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def _segment_starts(sorted_codes):
+    """Get the start positions of the runs of equal values in the `sorted_codes`.
+
+    Parameters
+    ----------
+    sorted_codes : numpy.ndarray
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    return np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+
+
+class LumpedStatesAccumulator:
+    """Accumulator of the composite (lumped) states over chunks of the .states file.
+
+    Each lump is identified by the values of the resolved quanta (a single value for a
+    single resolved quantum, tuple otherwise) and gets assigned an integer slot in the
+    order of its first appearance (and in sorted order within a single chunk), which
+    is the same order in which the lumps used to be appended to the lumped states
+    frame by the per-chunk ``groupby().apply`` logic.
+
+    The lumped state energy is calculated only from the lowest-J original states, and
+    it is not known in which chunk these appear. Whenever a chunk brings a lower J for
+    a lump, the energy accumulate of the lump is reset.
+
+    Parameters
+    ----------
+    resolved_quanta : list[str]
+    keep_tau : bool, default=False
+        If True, also the original lifetimes (the "tau" column) of all the original
+        states belonging to each lump are collected.
+
+    Attributes
+    ----------
+    lump_keys : list[str or int or tuple]
+        Lump identifiers, indexed by slots.
+    j_en : numpy.ndarray
+        The lowest J value per slot.
+    sum_w : numpy.ndarray
+        Energy accumulate of the lowest-J states per slot.
+    sum_g_tot : numpy.ndarray
+        Sum of the total degeneracies of all the states per slot.
+    """
+
+    def __init__(self, resolved_quanta, keep_tau=False):
+        self.resolved_quanta = list(resolved_quanta)
+        self.keep_tau = keep_tau
+
+        self.lump_keys = []
+        self._lump_slots = {}
+        self.j_en = np.empty(0, dtype="float64")
+        self.sum_w = np.empty(0, dtype="float64")
+        self.sum_g_tot = np.empty(0, dtype="float64")
+
+        # lump membership, collected per chunk and concatenated only when needed:
+        self._state_ids = []
+        self._state_slots = []
+        self._state_tau = []
+
+    @property
+    def num_lumps(self):
+        return len(self.lump_keys)
+
+    def _get_slots(self, keys):
+        """Map the lump keys onto slots, assigning new slots to the unseen keys.
+
+        Parameters
+        ----------
+        keys : iterable of (str or int or tuple)
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        slots = np.empty(len(keys), dtype="int64")
+        for n, key in enumerate(keys):
+            slot = self._lump_slots.get(key)
+            if slot is None:
+                slot = self._lump_slots[key] = len(self.lump_keys)
+                self.lump_keys.append(key)
+            slots[n] = slot
+        size = len(self.lump_keys)
+        self.j_en = _grow(self.j_en, size, float("inf"))
+        self.sum_w = _grow(self.sum_w, size, 0.0)
+        self.sum_g_tot = _grow(self.sum_g_tot, size, 0.0)
+        return slots
+
+    def update(self, chunk):
+        """Reduce a (filtered) chunk of the .states file and merge it into the
+        accumulators.
+
+        Parameters
+        ----------
+        chunk : pandas.DataFrame
+            Chunk of the .states file indexed by the original state ids, with at least
+            the float columns "J", "E", "g_tot" and the resolved quanta columns
+            (and "tau", if `keep_tau`).
+
+        Returns
+        -------
+        numpy.ndarray
+            Mask of the rows of the `chunk` accumulated. The states with any of the
+            resolved quanta missing (NaN or NA) are not accumulated, the same as if
+            filtered out.
+        """
+        # only the observed values of any categorical quanta make lumps
+        grouped = chunk.groupby(self.resolved_quanta, sort=True, observed=True)
+        # the states with missing quanta do not belong to any group (their group
+        # numbers are NaN, or -1 with the newer pandas)
+        codes = grouped.ngroup().fillna(-1).to_numpy(dtype="int64")
+        accepted = codes != -1
+        if not accepted.all():
+            chunk = chunk[accepted]
+            codes = codes[accepted]
+        if not len(chunk):
+            return accepted
+        keys = grouped.size().index
+        if len(self.resolved_quanta) == 1:
+            keys = list(keys)  # str or int
+        else:
+            keys = [tuple(key) for key in keys]  # tuple
+        slots = self._get_slots(keys)
+
+        # sort all the rows by lumps, keeping the original order within each lump
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = _segment_starts(sorted_codes)
+        j_sorted = chunk["J"].to_numpy(dtype="float64")[order]
+        e_sorted = chunk["E"].to_numpy(dtype="float64")[order]
+        g_sorted = chunk["g_tot"].to_numpy(dtype="float64")[order]
+
+        j_min = np.minimum.reduceat(j_sorted, starts)
+        g_sums = np.add.reduceat(g_sorted, starts)
+        # mean energy of the lowest-J states within each lump in this chunk
+        lowest = j_sorted == j_min[sorted_codes]
+        lowest_codes = sorted_codes[lowest]
+        lowest_starts = _segment_starts(lowest_codes)
+        e_means = np.add.reduceat(e_sorted[lowest], lowest_starts) / np.diff(
+            np.append(lowest_starts, len(lowest_codes))
+        )
+
+        # reset the accumulates wherever a new lower J has been found...
+        reset = j_min < self.j_en[slots]
+        self.j_en[slots[reset]] = j_min[reset]
+        self.sum_w[slots[reset]] = 0.0
+        self.sum_g_tot[slots[reset]] = 0.0
+        # ... and add to those where the J matches the lowest J found so far
+        update = j_min == self.j_en[slots]
+        self.sum_w[slots[update]] += e_means[update]
+        self.sum_g_tot[slots[update]] += g_sums[update]
+
+        self._state_ids.append(chunk.index.to_numpy(dtype="int64"))
+        self._state_slots.append(slots[codes])
+        if self.keep_tau:
+            self._state_tau.append(chunk["tau"].to_numpy(dtype="float64"))
+        return accepted
+
+    @property
+    def state_ids(self):
+        """Original ids of all the accumulated states."""
+        return np.concatenate(self._state_ids or [np.empty(0, dtype="int64")])
+
+    @property
+    def state_slots(self):
+        """Slots of all the accumulated states, aligned with `state_ids`."""
+        return np.concatenate(self._state_slots or [np.empty(0, dtype="int64")])
+
+    @property
+    def lump_sizes(self):
+        """Number of the original states in each slot."""
+        return np.bincount(self.state_slots, minlength=self.num_lumps)
+
+    def get_lumped_states(self):
+        """Get the accumulated lumped states.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Indexed by the lump keys (ordered by slots), with columns "J_en", "sum_w"
+            and "sum_en_x_w" (sum of g_tot).
+        """
+        if len(self.resolved_quanta) == 1:
+            index = pd.Index(self.lump_keys, name=self.resolved_quanta[0])
+        else:
+            index = pd.MultiIndex.from_tuples(
+                self.lump_keys, names=self.resolved_quanta
+            )
+        n = self.num_lumps
+        return pd.DataFrame(
+            {
+                "J_en": self.j_en[:n],
+                "sum_w": self.sum_w[:n],
+                "sum_en_x_w": self.sum_g_tot[:n],
+            },
+            index=index,
+            dtype="float64",
+        )
+
+    def group_by_slot(self, values):
+        """Split the `values` (aligned with `state_ids`) by slots.
+
+        The chunk order and the original order within each chunk is preserved.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+
+        Returns
+        -------
+        list[numpy.ndarray]
+            Indexed by slots.
+        """
+        state_slots = self.state_slots
+        order = np.argsort(state_slots, kind="stable")
+        bounds = np.cumsum(np.bincount(state_slots, minlength=self.num_lumps))
+        return np.split(values[order], bounds[:-1])
+
+    @property
+    def state_tau(self):
+        """Original lifetimes of all the accumulated states, aligned with
+        `state_ids`."""
+        return np.concatenate(self._state_tau or [np.empty(0, dtype="float64")])
+
+
+def compact_transitions(
+    states_map, i, f, einstein_coeffs, unmapped_state=-1, downward_only=False
+):
+    """Map a block of transitions onto the lumped states, keeping only the survivors.
+
+    All the transitions from or to a state not belonging to any lumped state, and all
+    the transitions within the same lumped state are discarded in the same pass in
+    which the states are looked up.
+
+    With `downward_only`, also all the transitions to a lumped state with a higher id
+    than the lumped initial state are discarded. The lumped state ids are ordered by
+    the lumped energies, so these could only end up in the lumped transitions with a
+    non-negative nu, which are filtered out once lumped anyway (the transitions
+    between the lumped states of equal energies are left to that filter).
+
+    Parameters
+    ----------
+    states_map : numpy.ndarray
+        Dense map between original and lumped state ids, where the last element is the
+        `unmapped_state` sentinel.
+    i, f : numpy.ndarray
+        Original initial and final state ids.
+    einstein_coeffs : numpy.ndarray
+        Einstein A_if coefficients of the transitions.
+    unmapped_state : int, default=-1
+    downward_only : bool, default=False
+
+    Returns
+    -------
+    i, lumped_f, einstein_coeffs : numpy.ndarray
+        Original initial state ids, lumped final state ids and Einstein coefficients
+        of the surviving transitions.
+    """
+    # the ids out of the map range are clipped onto the sentinel
+    lumped_i = states_map.take(i, mode="clip")
+    lumped_f = states_map.take(f, mode="clip")
+    mask = (
+        (lumped_i != unmapped_state)
+        & (lumped_f != unmapped_state)
+        & ((lumped_f < lumped_i) if downward_only else (lumped_i != lumped_f))
+    )
+    return i[mask], lumped_f[mask], einstein_coeffs[mask]
+
+
+def _chunk_pieces(column_blocks, chunk_size):
+    """Split the blocks of raw transitions at the boundaries of the chunks.
+
+    If the blocks come with the positions the reading can be resumed from (see
+    `exomol2lida.trans_index.indexed_trans_columns`), the blocks are not split, and
+    each chunk ends with the first block reaching at least `chunk_size` raw
+    transitions, so the chunks end at the positions.
+
+    Parameters
+    ----------
+    column_blocks : iterable of tuple
+        The raw i, f and A_if arrays of consecutive blocks of a single .trans file,
+        possibly followed by the position right after each block.
+    chunk_size : int
+
+    Yields
+    ------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, bool, object]
+        The i, f and A_if views of the pieces of the blocks, whether the piece is the
+        last one of a chunk of (at least) `chunk_size` raw transitions (or of the
+        file), and the position right after the piece (None if not known).
+    """
+    num_raw = 0
+    for i, f, einstein_coeffs, *position in column_blocks:
+        if position:
+            num_raw += len(i)
+            last = num_raw >= chunk_size
+            if last:
+                num_raw = 0
+            yield i, f, einstein_coeffs, last, position[0]
+            continue
+        start = 0
+        while start < len(i):
+            end = start + min(chunk_size - num_raw, len(i) - start)
+            num_raw += end - start
+            last = num_raw == chunk_size
+            if last:
+                num_raw = 0
+            yield i[start:end], f[start:end], einstein_coeffs[start:end], last, None
+            start = end
+    if num_raw:
+        # empty pieces of the same dtypes, not to upcast the last chunk
+        yield i[:0], f[:0], einstein_coeffs[:0], True, position[0] if position else None
+
+
+def surviving_transitions(
+    column_blocks, chunk_size, states_map, unmapped_state=-1, downward_only=False
+):
+    """Stream the blocks of raw transitions, compacting them to the survivors.
+
+    Each block is compacted (see `compact_transitions`) as soon as it is parsed, so
+    only the surviving transitions are ever held beyond a single block. The survivors
+    are grouped by the chunks of `chunk_size` *raw* transitions, so the reduction
+    into prelumps does not depend on how the input was split into blocks.
+
+    Parameters
+    ----------
+    column_blocks : iterable of tuple[numpy.ndarray]
+        The raw i, f and A_if arrays of consecutive blocks of a single .trans file.
+    chunk_size : int
+    states_map : numpy.ndarray
+    unmapped_state : int, default=-1
+    downward_only : bool, default=False
+        See `compact_transitions`.
+
+    Yields
+    ------
+    i, lumped_f, einstein_coeffs : numpy.ndarray
+        The surviving transitions of each chunk of the raw transitions.
+    """
+    for survivors, _ in shared_surviving_transitions(
+        column_blocks, chunk_size, [states_map], unmapped_state, downward_only
+    ):
+        yield survivors[0]
+
+
+def shared_surviving_transitions(
+    column_blocks, chunk_size, states_maps, unmapped_state=-1, downward_only=False
+):
+    """Stream the blocks of raw transitions once, compacting them for several maps.
+
+    The same as `surviving_transitions`, but for several datasets lumped from the same
+    .trans files, each with its own map between the original and lumped states.
+
+    Parameters
+    ----------
+    column_blocks : iterable of tuple
+        The raw i, f and A_if arrays of consecutive blocks of a single .trans file,
+        possibly followed by the position right after each block (see
+        `_chunk_pieces`).
+    chunk_size : int
+    states_maps : list[numpy.ndarray]
+    unmapped_state : int, default=-1
+    downward_only : bool, default=False
+        See `compact_transitions`.
+
+    Yields
+    ------
+    survivors : list[tuple[numpy.ndarray]]
+        The surviving (i, lumped_f, einstein_coeffs) of each chunk of the raw
+        transitions, for each of the `states_maps`.
+    position : object
+        The position right after the chunk, or None if the blocks come without any.
+    """
+    pending = [[] for _ in states_maps]
+    for i, f, einstein_coeffs, last, position in _chunk_pieces(
+        column_blocks, chunk_size
+    ):
+        for states_map, map_pending in zip(states_maps, pending):
+            map_pending.append(
+                compact_transitions(
+                    states_map,
+                    i,
+                    f,
+                    einstein_coeffs,
+                    unmapped_state=unmapped_state,
+                    downward_only=downward_only,
+                )
+            )
+        if last:
+            survivors = [
+                tuple(np.concatenate(column) for column in zip(*map_pending))
+                for map_pending in pending
+            ]
+            # the pieces are released before the survivors are reduced
+            for map_pending in pending:
+                map_pending.clear()
+            yield survivors, position
+
+
+def _two_sum(a, b):
+    """Split the sums of the `a` and `b` into the rounded sums and their exact errors
+    (the branch-free TwoSum by Knuth).
+    """
+    sums = a + b
+    b_virtual = sums - a
+    return sums, (a - (sums - b_virtual)) + (b - b_virtual)
+
+
+def _add_double_doubles(sums_a, errors_a, sums_b, errors_b):
+    """Add up the double-double numbers (the rounded sums and their errors).
+
+    Returns
+    -------
+    sums, errors : numpy.ndarray
+        The renormalized double-double sums.
+    """
+    pair_sums, pair_errors = _two_sum(sums_a, sums_b)
+    pair_errors += errors_a + errors_b
+    sums = pair_sums + pair_errors
+    return sums, pair_errors - (sums - pair_sums)
+
+
+def _reduce_sorted_prelumps(keys, sums, errors, sizes):
+    """Reduce the prelumps with sorted (repeated) keys into the unique prelumps.
+
+    The sums and errors of the prelumps are double-double numbers (the rounded sums
+    and the errors of the rounding), added up with the TwoSum pairwise within the runs
+    of the equal keys, so the rounded sums are accurate to the last bit no matter how
+    the prelumps have been split before (see `PrelumpsAccumulator`).
+
+    Parameters
+    ----------
+    keys : numpy.ndarray
+        Sorted packed keys.
+    sums, errors : numpy.ndarray
+        Sums of the Einstein coefficients and their errors. Modified in place.
+    sizes : numpy.ndarray
+
+    Returns
+    -------
+    keys, einstein_coeff_sums, einstein_coeff_errors, sizes : numpy.ndarray
+    """
+    num = len(keys)
+    starts = _segment_starts(keys)
+    if len(starts) == num:
+        # fast path: no keys are repeated, so nothing is added up
+        return keys, sums, errors, sizes
+    run_sizes = np.diff(np.append(starts, num))
+    ranks = np.arange(num) - np.repeat(starts, run_sizes)
+    ends = np.repeat(starts + run_sizes, run_sizes)
+    # each pass adds the partial sums of the runs of `step` prelumps pairwise into the
+    # left ones, which are the only ones taking part in the next pass
+    left = np.flatnonzero(ranks % 2 == 0)
+    step = 1
+    while True:
+        left = left[left + step < ends[left]]
+        if not len(left):
+            break
+        right = left + step
+        sums[left], errors[left] = _add_double_doubles(
+            sums[left], errors[left], sums[right], errors[right]
+        )
+        step *= 2
+        left = left[ranks[left] % (2 * step) == 0]
+    return keys[starts], sums[starts], errors[starts], np.add.reduceat(sizes, starts)
+
+
+def reduce_prelumps(i, lumped_f, einstein_coeffs, num_lumped):
+    """Reduce a chunk of surviving transitions into prelumps.
+
+    Parameters
+    ----------
+    i : numpy.ndarray
+        Original initial state ids.
+    lumped_f : numpy.ndarray
+        Lumped final state ids.
+    einstein_coeffs : numpy.ndarray
+        Einstein A_if coefficients of the transitions.
+    num_lumped : int
+        Number of the lumped states.
+
+    Returns
+    -------
+    tuple[numpy.ndarray] or None
+        Packed prelump keys, sums of the Einstein coefficients, errors of the sums and
+        prelump sizes, or None, if there are no transitions.
+    """
+    if not len(i):
+        return None
+    keys = _pack_prelumps(i, lumped_f, num_lumped)
+    order = np.argsort(keys)
+    # the unsorted arrays are released as soon as sorted, and the sums (of the A_if
+    # in any precision) are accumulated in float64
+    keys = keys[order]
+    sums = einstein_coeffs[order].astype("float64")
+    del order
+    return _reduce_sorted_prelumps(
+        keys,
+        sums,
+        np.zeros(len(keys), dtype="float64"),
+        np.ones(len(keys), dtype="int64"),
+    )
+
+
+def reduce_transitions_chunk(
+    states_map, i, f, einstein_coeffs, num_lumped, unmapped_state=-1
+):
+    """Map a chunk of transitions onto the lumped states and reduce it into prelumps.
+
+    All the transitions from or to a state not belonging to any lumped state, and all
+    the transitions within the same lumped state are discarded. The rest is reduced
+    into partial sums for each (original i, lumped f) prelump.
+
+    Parameters
+    ----------
+    states_map : numpy.ndarray
+        Dense map between original and lumped state ids, where the last element is the
+        `unmapped_state` sentinel.
+    i, f : numpy.ndarray
+        Original initial and final state ids.
+    einstein_coeffs : numpy.ndarray
+        Einstein A_if coefficients of the transitions.
+    num_lumped : int
+        Number of the lumped states.
+    unmapped_state : int, default=-1
+
+    Returns
+    -------
+    tuple[numpy.ndarray] or None
+        See `reduce_prelumps`, or None, if no transitions survived the filtering.
+    """
+    return reduce_prelumps(
+        *compact_transitions(states_map, i, f, einstein_coeffs, unmapped_state),
+        num_lumped=num_lumped,
+    )
+
+
+def _pack_prelumps(i, lumped_f, num_lumped):
+    keys = i.astype("int64")
+    keys *= max(int(num_lumped), 1)
+    keys += lumped_f
+    return keys
+
+
+class PrelumpsAccumulator:
+    """Accumulator of the transitions prelumps over chunks of the .trans files.
+
+    A prelump groups all the transitions from a single *original* initial state
+    ``i`` to a single *lumped* final state ``lumped_f``. Each (i, lumped_f) pair is
+    packed into a single int64 key ``i * num_lumped + lumped_f``, so each chunk is
+    reduced with a single sort. The reduced chunks are buffered and merged into the
+    sorted store only once the buffer outgrows it: only the buffer is sorted, and then
+    merged into the store linearly, keeping the cost of merging amortized linear in
+    the number of prelumps (besides sorting each buffer).
+
+    The sums of the Einstein coefficients are kept as double-double numbers: the
+    rounded sums along with the exact errors of their rounding, added up by the
+    error-free TwoSum. The rounded sums are therefore correctly rounded (barring an
+    exact sum of n terms within some n * 1e-31 relative of a rounding tie), so they do
+    not depend on the order of the additions: on the chunk size, on how the .trans
+    files are split and distributed among the workers, or on whether the prelumps of
+    the .trans files are persisted. The keys without any repeats (most of the prelumps
+    of a single chunk) skip the additions altogether.
+
+    Parameters
+    ----------
+    num_lumped : int
+        Number of the lumped states (upper bound of the lumped_f values).
+
+    Attributes
+    ----------
+    keys : numpy.ndarray
+        Sorted unique packed keys of the merged prelumps.
+    einstein_coeff_sums : numpy.ndarray
+        Sums of the Einstein coefficients A_if of the merged prelumps.
+    einstein_coeff_errors : numpy.ndarray
+        Errors of the rounded `einstein_coeff_sums`.
+    sizes : numpy.ndarray
+        Numbers of the original transitions in the merged prelumps.
+    """
+
+    def __init__(self, num_lumped):
+        self.num_lumped = max(int(num_lumped), 1)
+        self.keys = np.empty(0, dtype="int64")
+        self.einstein_coeff_sums = np.empty(0, dtype="float64")
+        self.einstein_coeff_errors = np.empty(0, dtype="float64")
+        self.sizes = np.empty(0, dtype="int64")
+        self._pending = []
+        self._pending_size = 0
+
+    def pack(self, i, lumped_f):
+        return _pack_prelumps(i, lumped_f, self.num_lumped)
+
+    def unpack(self, keys):
+        return np.divmod(keys, self.num_lumped)
+
+    def update(self, i, lumped_f, einstein_coeffs):
+        """Reduce a chunk of (already mapped and filtered) transitions.
+
+        Parameters
+        ----------
+        i : numpy.ndarray
+            Original initial state ids.
+        lumped_f : numpy.ndarray
+            Lumped final state ids.
+        einstein_coeffs : numpy.ndarray
+            Einstein A_if coefficients of the transitions.
+        """
+        if not len(i):
+            return
+        self.add_partial(reduce_prelumps(i, lumped_f, einstein_coeffs, self.num_lumped))
+
+    def add_partial(self, partial):
+        """Add already reduced prelumps (see `reduce_prelumps`).
+
+        Parameters
+        ----------
+        partial : tuple[numpy.ndarray]
+            Unique packed keys, sums of the Einstein coefficients, errors of the sums
+            and prelump sizes.
+        """
+        self._pending.append(tuple(partial))
+        self._pending_size += len(partial[0])
+        if self._pending_size > len(self.keys):
+            self._merge_pending()
+
+    def _merge_pending(self):
+        """Merge all the buffered partial prelumps into the sorted store.
+
+        Only the buffered prelumps are sorted and reduced, and then merged into the
+        (already sorted) store in a single linear pass: the prelumps already in the
+        store are added up in place, the new ones inserted at their sorted positions.
+        """
+        if not self._pending:
+            return
+        keys, sums, errors, sizes = (
+            np.concatenate(column) for column in zip(*self._pending)
+        )
+        self._pending = []
+        self._pending_size = 0
+        order = np.argsort(keys, kind="stable")
+        keys, sums, errors, sizes = _reduce_sorted_prelumps(
+            keys[order], sums[order], errors[order], sizes[order]
+        )
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        slots = positions[found]
+        (
+            self.einstein_coeff_sums[slots],
+            self.einstein_coeff_errors[slots],
+        ) = _add_double_doubles(
+            self.einstein_coeff_sums[slots],
+            self.einstein_coeff_errors[slots],
+            sums[found],
+            errors[found],
+        )
+        self.sizes[slots] += sizes[found]
+        new = ~found
+        if new.any():
+            positions = positions[new]
+            self.keys = np.insert(self.keys, positions, keys[new])
+            self.einstein_coeff_sums = np.insert(
+                self.einstein_coeff_sums, positions, sums[new]
+            )
+            self.einstein_coeff_errors = np.insert(
+                self.einstein_coeff_errors, positions, errors[new]
+            )
+            self.sizes = np.insert(self.sizes, positions, sizes[new])
+
+    @property
+    def num_prelumps(self):
+        """Number of the distinct (i, lumped_f) prelumps held."""
+        self._merge_pending()
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        """Memory held by the merged prelumps, in bytes."""
+        self._merge_pending()
+        return sum(array.nbytes for array in self.get_store())
+
+    def get_prelumps(self):
+        """Get all the accumulated prelumps, sorted by (i, lumped_f).
+
+        Returns
+        -------
+        i, lumped_f, einstein_coeff_sums, sizes : numpy.ndarray
+        """
+        self._merge_pending()
+        i, lumped_f = self.unpack(self.keys)
+        return i, lumped_f, self.einstein_coeff_sums, self.sizes
+
+    def get_store(self):
+        """Get the merged prelumps, such as for checkpointing.
+
+        Returns
+        -------
+        keys, einstein_coeff_sums, einstein_coeff_errors, sizes : numpy.ndarray
+        """
+        self._merge_pending()
+        return (
+            self.keys,
+            self.einstein_coeff_sums,
+            self.einstein_coeff_errors,
+            self.sizes,
+        )
+
+    def load_store(self, keys, einstein_coeff_sums, einstein_coeff_errors, sizes):
+        """Replace all the accumulated prelumps by the merged prelumps passed.
+
+        Parameters
+        ----------
+        keys, einstein_coeff_sums, einstein_coeff_errors, sizes : numpy.ndarray
+            See `get_store`.
+        """
+        self.keys = np.asarray(keys, dtype="int64")
+        self.einstein_coeff_sums = np.asarray(einstein_coeff_sums, dtype="float64")
+        self.einstein_coeff_errors = np.asarray(einstein_coeff_errors, dtype="float64")
+        self.sizes = np.asarray(sizes, dtype="int64")
+        self._pending = []
+        self._pending_size = 0
@@ -0,0 +1,303 @@
+"""
+Module with a local, size-bounded cache of the ExoMol input files in a columnar
+binary form.
+
+Each cached input file (.states or .trans) is stored in its own entry directory,
+with each column saved as a raw binary array, which is memory-mapped when read back.
+Numerical columns are stored as they are, string and categorical columns (such as the
+.states quanta) as integer codes into a list of categories. The entries are keyed by
+the input file path, its size, its modification time and a fingerprint of its
+content, so any change in the input file invalidates its entry, and by the columns
+and the settings of the reader (such as the column types), so any change in those
+invalidates it too. The least recently
+used entries are evicted whenever the total size of the cache exceeds its limit.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# number of bytes from the beginning and the end of a file used for the fingerprint
+FINGERPRINT_SIZE = 1 << 20
+
+
+def file_fingerprint(path):
+    """Get a cheap fingerprint of a file content.
+
+    Only the size and the first and the last `FINGERPRINT_SIZE` bytes of the file
+    are hashed, so even files of tens of GB are fingerprinted instantly.
+
+    Parameters
+    ----------
+    path : str or Path
+
+    Returns
+    -------
+    str
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as stream:
+        digest.update(stream.read(FINGERPRINT_SIZE))
+        if size > FINGERPRINT_SIZE:
+            stream.seek(max(size - FINGERPRINT_SIZE, FINGERPRINT_SIZE))
+            digest.update(stream.read())
+    return digest.hexdigest()
+
+
+def get_file_key(path):
+    """Get a key identifying an input file and its content.
+
+    Parameters
+    ----------
+    path : str or Path
+
+    Returns
+    -------
+    dict
+        The resolved path, size, modification time and fingerprint of the file.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return {
+        "path": str(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "fingerprint": file_fingerprint(path),
+    }
+
+
+class ColumnarCache:
+    """Columnar binary cache of the ExoMol input files.
+
+    Parameters
+    ----------
+    cache_dir : str or Path
+    size_limit : int or float
+        Disk budget of the cache in bytes.
+
+    Attributes
+    ----------
+    cache_dir : Path
+    size_limit : int or float
+    """
+
+    meta_file = "meta.json"
+
+    def __init__(self, cache_dir, size_limit):
+        self.cache_dir = Path(cache_dir)
+        self.size_limit = size_limit
+
+    def get_key(self, path, columns=None, settings=None):
+        """Get the cache key of an input file.
+
+        Parameters
+        ----------
+        path : str or Path
+        columns : list[str], optional
+            Columns to be cached, all of them if not given.
+        settings : dict, optional
+            Any other settings the chunks of the input file depend on (such as the
+            types of the columns), JSON-serializable.
+
+        Returns
+        -------
+        dict
+        """
+        return {**get_file_key(path), "columns": columns, "settings": settings}
+
+    def _entry_dir(self, key):
+        name = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return self.cache_dir / name[:20]
+
+    def _read_meta(self, entry_dir):
+        with open(entry_dir / self.meta_file) as fp:
+            return json.load(fp)
+
+    def _write_meta(self, entry_dir, meta):
+        tmp_path = entry_dir / f"{self.meta_file}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(meta, fp, indent=2)
+        os.replace(tmp_path, entry_dir / self.meta_file)
+
+    def chunks(self, path, source_chunks, chunk_size, columns=None, settings=None):
+        """Get chunks of an input file, from the cache if possible.
+
+        If the file is cached, the chunks are served from the memory-mapped columns.
+        Otherwise, the chunks are taken from the `source_chunks` and cached as they
+        are yielded. The entry is only committed to the cache once the source has been
+        exhausted.
+
+        Parameters
+        ----------
+        path : str or Path
+            Path of the input file.
+        source_chunks : callable
+            Callable returning the generator of the `pandas.DataFrame` chunks of the
+            input file, used if the file is not cached yet.
+        chunk_size : int
+            Number of rows per chunk served from the cache.
+        columns : list[str], optional
+            Columns to be cached (and served), all of them if not given.
+        settings : dict, optional
+            Settings of the `source_chunks`, see `get_key`.
+
+        Yields
+        ------
+        pandas.DataFrame
+        """
+        key = self.get_key(path, columns, settings)
+        entry_dir = self._entry_dir(key)
+        if (entry_dir / self.meta_file).is_file():
+            yield from self._cached_chunks(entry_dir, chunk_size)
+        else:
+            yield from self._caching_chunks(entry_dir, key, source_chunks(), columns)
+
+    def _cached_chunks(self, entry_dir, chunk_size):
+        meta = self._read_meta(entry_dir)
+        meta["last_used"] = time.time()
+        self._write_meta(entry_dir, meta)
+        if not meta["num_rows"]:
+            return
+        arrays = {}
+        for name, col in meta["columns"].items():
+            arrays[name] = np.memmap(
+                entry_dir / col["file"],
+                dtype=col["dtype"],
+                mode="r",
+                shape=(meta["num_rows"],),
+            )
+            if col.get("categorical"):
+                # categoricals are served with sorted categories
+                categories = np.array(col["categories"], dtype=object)
+                order = np.argsort(categories)
+                # the missing values have the code of -1, mapping onto -1
+                codes_map = np.full(len(categories) + 1, -1, dtype="int32")
+                codes_map[order] = np.arange(len(categories))
+                arrays[name] = (arrays[name], codes_map, categories[order])
+            elif "categories" in col:
+                # the missing values have the code of -1, pointing at NaN
+                categories = np.array(col["categories"] + [np.nan], dtype=object)
+                arrays[name] = (arrays[name], categories)
+        index_name = meta["index"]
+        for start in range(0, meta["num_rows"], chunk_size):
+            data = {}
+            for name, array in arrays.items():
+                if isinstance(array, tuple) and len(array) == 3:
+                    codes, codes_map, categories = array
+                    data[name] = pd.Categorical.from_codes(
+                        codes_map[codes[start : start + chunk_size]], categories
+                    )
+                elif isinstance(array, tuple):
+                    codes, categories = array
+                    data[name] = categories[codes[start : start + chunk_size]]
+                else:
+                    data[name] = np.array(array[start : start + chunk_size])
+            index = data.pop(index_name) if index_name is not None else None
+            chunk = pd.DataFrame(data, index=index)
+            if index_name is None:
+                chunk.index = pd.RangeIndex(start, start + len(chunk))
+            yield chunk
+
+    def _caching_chunks(self, entry_dir, key, chunks, columns):
+        tmp_dir = entry_dir.with_name(f"{entry_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        meta = {"key": key, "index": None, "columns": {}, "num_rows": 0}
+        categories = {}
+        streams = {}
+        try:
+            for chunk in chunks:
+                data = chunk if columns is None else chunk[columns]
+                if not isinstance(chunk.index, pd.RangeIndex):
+                    meta["index"] = "__index__"
+                    data = data.assign(__index__=chunk.index.to_numpy())
+                for name, values in data.items():
+                    if name not in meta["columns"]:
+                        meta["columns"][name] = {"file": f"{len(streams)}.bin"}
+                        streams[name] = open(tmp_dir / f"{len(streams)}.bin", "wb")
+                    col = meta["columns"][name]
+                    is_categorical = isinstance(values.dtype, pd.CategoricalDtype)
+                    if is_categorical:
+                        col["categorical"] = True
+                        chunk_codes = values.cat.codes.to_numpy()
+                        uniques = values.cat.categories
+                    elif values.dtype == object:
+                        chunk_codes, uniques = pd.factorize(values.to_numpy())
+                    if is_categorical or values.dtype == object:
+                        # string columns are stored as codes into categories
+                        col_categories = categories.setdefault(name, {})
+                        codes = np.array(
+                            [
+                                col_categories.setdefault(value, len(col_categories))
+                                for value in uniques
+                            ]
+                            + [-1],
+                            dtype="int32",
+                        )
+                        # the missing values have the chunk code of -1
+                        values = codes[chunk_codes]
+                    else:
+                        values = values.to_numpy()
+                    col["dtype"] = values.dtype.str
+                    values.tofile(streams[name])
+                meta["num_rows"] += len(chunk)
+                yield chunk
+            for name, col_categories in categories.items():
+                meta["columns"][name]["categories"] = list(col_categories)
+            for stream in streams.values():
+                stream.close()
+            meta["last_used"] = time.time()
+            self._write_meta(tmp_dir, meta)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                # the same entry has been committed concurrently by another process
+                pass
+        finally:
+            for stream in streams.values():
+                stream.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict(keep=entry_dir)
+
+    def entries(self):
+        """Get all the committed cache entries.
+
+        Returns
+        -------
+        list[tuple[Path, dict, int]]
+            Entry directory, its metadata and its size in bytes.
+        """
+        if not self.cache_dir.is_dir():
+            return []
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            if not (entry_dir / self.meta_file).is_file():
+                continue
+            size = sum(path.stat().st_size for path in entry_dir.iterdir())
+            entries.append((entry_dir, self._read_meta(entry_dir), size))
+        return entries
+
+    def evict(self, keep=None):
+        """Evict the least recently used entries until the cache fits its size limit.
+
+        Parameters
+        ----------
+        keep : Path, optional
+            Entry directory which will not be evicted.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[1]["last_used"])
+        total_size = sum(size for _, _, size in entries)
+        for entry_dir, _, size in entries:
+            if total_size <= self.size_limit:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
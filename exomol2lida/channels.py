@@ -0,0 +1,151 @@
+"""
+Module with the selection of the fastest decay channels of the lumped states and the
+renormalization of their partial lifetimes.
+
+Only the `num_channels` fastest decay channels (the lumped transitions with the lowest
+partial lifetimes) are kept for each initial lumped state, and their partial lifetimes
+are renormalized, so the kept channels add up to the total lifetime of the state
+(evaluated from all its channels).
+
+Instead of sorting all the lumped transitions by their initial states and partial
+lifetimes, the channels are selected by a segmented partial selection over the lumped
+transitions already grouped by their initial states: each round picks the fastest
+channel not picked yet from every initial state at once, so the selection is linear
+in the number of the lumped transitions for any fixed `num_channels`.
+"""
+
+import numpy as np
+
+from .accumulators import _segment_starts
+
+
+def select_fastest_channels(i, tau_if, num_channels):
+    """Select the fastest decay channels of each initial state.
+
+    The selected channels are ordered by the initial states and by the partial
+    lifetimes in descending order, where the channels with equal partial lifetimes
+    keep their relative order, and of these, the later ones are preferred when not all
+    of them are selected. This is the same as taking the last `num_channels` rows of
+    each initial state after a stable sort by the initial states and the descending
+    partial lifetimes.
+
+    Parameters
+    ----------
+    i : numpy.ndarray
+        Initial state ids of the channels, grouped into contiguous runs.
+    tau_if : numpy.ndarray
+        Partial lifetimes of the channels.
+    num_channels : int
+        Maximal number of the channels selected for each initial state.
+
+    Returns
+    -------
+    numpy.ndarray
+        Positions of the selected channels in the `i` and `tau_if`.
+    """
+    num = len(i)
+    if not num:
+        return np.empty(0, dtype="int64")
+    starts = _segment_starts(i)
+    sizes = np.diff(np.append(starts, num))
+    segments = np.repeat(np.arange(len(starts)), sizes)
+    num_selected = np.minimum(sizes, num_channels)
+    # the selected channels of each state are written backwards from its last slot
+    last_slots = np.cumsum(num_selected) - 1
+    selected = np.empty(num_selected.sum(), dtype="int64")
+    remaining = np.array(tau_if, dtype="float64")
+    # the missing lifetimes go last in the descending order, so count as the fastest
+    remaining[np.isnan(remaining)] = -np.inf
+    taken = np.zeros(num, dtype=bool)
+    positions = np.arange(num)
+    for n in range(int(num_selected.max())):
+        # the fastest channel of each state not taken yet, the last one of any ties
+        minima = np.minimum.reduceat(remaining, starts)
+        candidates = (remaining == minima[segments]) & ~taken
+        picked = np.maximum.reduceat(np.where(candidates, positions, -1), starts)
+        picked = picked[n < num_selected]
+        selected[last_slots[segments[picked]] - n] = picked
+        remaining[picked] = np.inf
+        taken[picked] = True
+    return selected
+
+
+def segment_sums(values, starts):
+    """Sum the runs of the `values` starting at the `starts`.
+
+    Each run is summed sequentially with the Kahan compensation and skipping any NaN
+    values, the same as by the pandas groupby sums, so the results are bit-identical.
+    The runs are summed all at once, position by position, so the number of the
+    vectorized steps is the length of the longest run.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+    starts : numpy.ndarray
+        Start positions of the runs, see `exomol2lida.accumulators._segment_starts`.
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    sizes = np.diff(np.append(starts, len(values)))
+    # the runs ordered by their sizes, so the runs still summed are always a prefix
+    order = np.argsort(-sizes, kind="stable")
+    sorted_sizes = sizes[order]
+    sorted_starts = starts[order]
+    sums = np.zeros(len(starts), dtype="float64")
+    compensations = np.zeros(len(starts), dtype="float64")
+    for n in range(int(sorted_sizes[0]) if len(starts) else 0):
+        num_runs = np.searchsorted(-sorted_sizes, -n, side="left")
+        run_sums = sums[:num_runs]
+        vals = values[sorted_starts[:num_runs] + n]
+        valid = ~np.isnan(vals)
+        y = vals - compensations[:num_runs]
+        t = run_sums + y
+        compensations[:num_runs] = np.where(
+            valid, t - run_sums - y, compensations[:num_runs]
+        )
+        sums[:num_runs] = np.where(valid, t, run_sums)
+    result = np.empty_like(sums)
+    result[order] = sums
+    return result
+
+
+def renormalize_channels(i, tau_if, num_channels):
+    """Evaluate the lifetimes of the initial states and their renormalized channels.
+
+    Parameters
+    ----------
+    i : numpy.ndarray
+        Initial state ids of the channels, grouped into contiguous runs.
+    tau_if : numpy.ndarray
+        Partial lifetimes of the channels.
+    num_channels : int
+        Maximal number of the channels kept for each initial state.
+
+    Returns
+    -------
+    states : numpy.ndarray
+        The initial state ids (the first of each run).
+    tau : numpy.ndarray
+        Total lifetimes of the `states`, from all their channels.
+    tau_kept : numpy.ndarray
+        Lifetimes of the `states` from their kept channels only.
+    kept : numpy.ndarray
+        Positions of the kept channels, see `select_fastest_channels`.
+    tau_if_renorm : numpy.ndarray
+        Renormalized partial lifetimes of the kept channels.
+    """
+    tau_if = np.asarray(tau_if, dtype="float64")
+    if not len(i):
+        empty = np.empty(0, dtype="float64")
+        return np.asarray(i), empty, empty, np.empty(0, dtype="int64"), empty
+    starts = _segment_starts(i)
+    tau = 1 / segment_sums(1 / tau_if, starts)
+    kept = select_fastest_channels(i, tau_if, num_channels)
+    kept_starts = _segment_starts(i[kept])
+    tau_kept = 1 / segment_sums(1 / tau_if[kept], kept_starts)
+    renorm = tau / tau_kept
+    kept_sizes = np.diff(np.append(kept_starts, len(kept)))
+    tau_if_renorm = tau_if[kept] * np.repeat(renorm, kept_sizes)
+    return i[starts], tau, tau_kept, kept, tau_if_renorm
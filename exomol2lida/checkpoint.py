@@ -0,0 +1,187 @@
+"""
+Module with the checkpoints of the transitions lumping, allowing an interrupted
+processing of a molecule to be resumed.
+
+The transitions lumping reduces the chunks of the sorted .trans files one after
+another into the `exomol2lida.accumulators.PrelumpsAccumulator`. A checkpoint holds the
+merged prelumps accumulated so far, together with the position of the last chunk
+added: the index of the .trans file in the sorted .trans files, and the position in
+that file right after the chunk (see `exomol2lida.trans_index.indexed_trans_columns`),
+or the number of its chunks added already if the .trans files are served from the
+columnar cache. On resuming, the reading of the file seeks straight to that position,
+none of the chunks added already is decompressed or parsed again. The prelumps sums
+do not depend on the order of the additions, so the resumed lumping gives exactly the
+same results as an uninterrupted one.
+
+Each checkpoint is keyed by everything the partial prelumps depend on (the .trans
+files and their content, the chunk size and reader, the states map, and whether only
+the downward transitions are reduced) and by the kind of the positions, and it is
+only resumed from if its key matches. The checkpoint is a single compressed *.npz*
+file, written to a temporary file first and atomically moved in place, so an
+interrupted write never corrupts the previous checkpoint.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .cache import get_file_key
+
+
+def get_checkpoint_key(
+    trans_paths,
+    chunk_size,
+    trans_reader,
+    states_map,
+    num_lumped,
+    unmapped_state,
+    downward_only=False,
+    mixed_precision=False,
+    cached=False,
+):
+    """Get the key identifying the lumping the checkpoint belongs to.
+
+    Parameters
+    ----------
+    trans_paths : list[Path]
+    chunk_size : int
+    trans_reader : str
+    states_map : numpy.ndarray
+        Dense map between the original and lumped state ids.
+    num_lumped : int
+    unmapped_state : int
+    downward_only : bool, default=False
+        See `exomol2lida.accumulators.compact_transitions`.
+    mixed_precision : bool, default=False
+        Whether the A_if are stored in single precision, see
+        `exomol2lida.read_data.single_precision_columns`.
+    cached : bool, default=False
+        Whether the .trans files are served from the columnar cache (and the
+        positions are the numbers of the chunks).
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "trans_files": [get_file_key(path) for path in sorted(trans_paths)],
+        "chunk_size": int(chunk_size),
+        "trans_reader": trans_reader,
+        "states_map": hashlib.sha1(
+            np.ascontiguousarray(states_map, dtype="int64").tobytes()
+        ).hexdigest(),
+        "num_lumped": int(num_lumped),
+        "unmapped_state": int(unmapped_state),
+        "downward_only": bool(downward_only),
+        "mixed_precision": bool(mixed_precision),
+        "cached": bool(cached),
+    }
+
+
+class TransCheckpoint:
+    """Checkpoint of the transitions lumping of a single molecule.
+
+    Parameters
+    ----------
+    key : dict
+        See `get_checkpoint_key`.
+    file_index : int
+        Index of the .trans file of the last chunk added, in the sorted .trans files.
+    resume : tuple[int, int] or int or None
+        Position in that file right after the last chunk added, or the number of its
+        chunks added already (for the cached .trans files). None if no chunk has
+        been added yet.
+    keys, einstein_coeff_sums, einstein_coeff_errors, sizes : numpy.ndarray
+        The merged prelumps, see `exomol2lida.accumulators.PrelumpsAccumulator`.
+    """
+
+    file_name = ".checkpoint"
+    fields = ("keys", "einstein_coeff_sums", "einstein_coeff_errors", "sizes")
+
+    def __init__(
+        self,
+        key,
+        file_index,
+        resume,
+        keys,
+        einstein_coeff_sums,
+        einstein_coeff_errors,
+        sizes,
+    ):
+        self.key = key
+        self.file_index = int(file_index)
+        # the positions come back from the JSON as lists
+        self.resume = tuple(resume) if isinstance(resume, list) else resume
+        self.keys = np.asarray(keys, dtype="int64")
+        self.einstein_coeff_sums = np.asarray(einstein_coeff_sums, dtype="float64")
+        self.einstein_coeff_errors = np.asarray(einstein_coeff_errors, dtype="float64")
+        self.sizes = np.asarray(sizes, dtype="int64")
+
+    @classmethod
+    def get_path(cls, output_dir):
+        return Path(output_dir) / cls.file_name
+
+    @classmethod
+    def load(cls, output_dir, key):
+        """Load the checkpoint from the `output_dir`, if any matches the `key`.
+
+        Parameters
+        ----------
+        output_dir : str or Path
+        key : dict
+
+        Returns
+        -------
+        TransCheckpoint or None
+        """
+        path = cls.get_path(output_dir)
+        if not path.is_file():
+            return None
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["key"] != key:
+                return None
+            return cls(
+                key=key,
+                file_index=meta["file_index"],
+                resume=meta["resume"],
+                **{field: data[field] for field in cls.fields},
+            )
+
+    def save(self, output_dir):
+        """Atomically (over)write the checkpoint in the `output_dir`.
+
+        Parameters
+        ----------
+        output_dir : str or Path
+        """
+        path = self.get_path(output_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "key": self.key,
+            "file_index": self.file_index,
+            "resume": self.resume,
+        }
+        tmp_path = path.with_name(f"{self.file_name}.tmp-{os.getpid()}")
+        with open(tmp_path, "wb") as stream:
+            np.savez_compressed(
+                stream,
+                meta=json.dumps(meta),
+                **{field: getattr(self, field) for field in self.fields},
+            )
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def remove(cls, output_dir):
+        """Remove the checkpoint from the `output_dir`, if any.
+
+        Parameters
+        ----------
+        output_dir : str or Path
+        """
+        cls.get_path(output_dir).unlink(missing_ok=True)
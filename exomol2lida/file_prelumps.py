@@ -0,0 +1,140 @@
+"""
+Module with the persisted prelumps of the individual .trans files, allowing to
+re-evaluate the transitions lumping without reading any .trans files again.
+
+Reducing the .trans files into the transitions prelumps (the sums of the Einstein
+coefficients and the numbers of the transitions from each *original* initial state
+to each *lumped* final state) is by far the most expensive part of the processing,
+while everything after it (the Boltzmann weighting, the nu filtering, picking the
+strongest channels and the renormalization) only needs the prelumps. With the
+prelumps of each .trans file persisted separately, the lumping can be re-evaluated
+from the stored prelumps only, and a newly added .trans file only needs its own
+prelumps reduced.
+
+The prelumps of each .trans file are stored as a single compressed *.npz* file of
+the sorted packed (i, lumped_f) keys with their sums (and the errors of the sums) and
+sizes (see
+`exomol2lida.accumulators.PrelumpsAccumulator`), keyed by the .trans file (its path
+and content) and by everything its prelumps depend on (the chunk size and reader, and
+the states map).
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .cache import get_file_key
+
+
+def get_prelumps_key(common_key, trans_path):
+    """Get the key of the prelumps of a single .trans file.
+
+    Parameters
+    ----------
+    common_key : dict
+        Key of the settings shared by all the .trans files, such as from the
+        `exomol2lida.checkpoint.get_checkpoint_key` without its "trans_files".
+    trans_path : Path
+
+    Returns
+    -------
+    dict
+    """
+    return {**common_key, "trans_file": get_file_key(trans_path)}
+
+
+def get_prelumps_path(prelumps_dir, key):
+    """Get the path of the stored prelumps with the `key`.
+
+    Parameters
+    ----------
+    prelumps_dir : str or Path
+    key : dict
+
+    Returns
+    -------
+    Path
+    """
+    name = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return Path(prelumps_dir) / f"{name[:20]}.npz"
+
+
+def load_file_prelumps(prelumps_dir, key):
+    """Load the stored prelumps of a .trans file, if any match the `key`.
+
+    Parameters
+    ----------
+    prelumps_dir : str or Path
+    key : dict
+        See `get_prelumps_key`.
+
+    Returns
+    -------
+    tuple[numpy.ndarray] or None
+        The packed keys, the sums of the Einstein coefficients, the errors of the sums
+        and the prelump sizes.
+    """
+    path = get_prelumps_path(prelumps_dir, key)
+    if not path.is_file():
+        return None
+    with np.load(path) as data:
+        if json.loads(str(data["key"])) != key:
+            return None
+        return (
+            data["keys"],
+            data["einstein_coeff_sums"],
+            data["einstein_coeff_errors"],
+            data["sizes"],
+        )
+
+
+def save_file_prelumps(prelumps_dir, key, prelumps):
+    """Atomically save the prelumps of a .trans file.
+
+    Parameters
+    ----------
+    prelumps_dir : str or Path
+    key : dict
+        See `get_prelumps_key`.
+    prelumps : tuple[numpy.ndarray]
+        See `load_file_prelumps`.
+
+    Returns
+    -------
+    Path
+        Path of the stored prelumps.
+    """
+    path = get_prelumps_path(prelumps_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    keys, einstein_coeff_sums, einstein_coeff_errors, sizes = prelumps
+    tmp_path = path.with_name(f"{path.stem}.tmp-{os.getpid()}.npz")
+    np.savez_compressed(
+        tmp_path,
+        key=json.dumps(key),
+        keys=keys,
+        einstein_coeff_sums=einstein_coeff_sums,
+        einstein_coeff_errors=einstein_coeff_errors,
+        sizes=sizes,
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def remove_stale_prelumps(prelumps_dir, keys):
+    """Remove all the stored prelumps but the ones with the `keys`.
+
+    Parameters
+    ----------
+    prelumps_dir : str or Path
+    keys : list[dict]
+    """
+    prelumps_dir = Path(prelumps_dir)
+    if not prelumps_dir.is_dir():
+        return
+    keep = {get_prelumps_path(prelumps_dir, key) for key in keys}
+    for path in prelumps_dir.glob("*.npz"):
+        if path not in keep:
+            path.unlink(missing_ok=True)
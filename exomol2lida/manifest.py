@@ -0,0 +1,197 @@
+"""
+Module with the manifests of the processed outputs, allowing to reprocess only the
+molecules whose inputs have changed.
+
+Once a molecule has been processed, a manifest.json is written into its output
+directory, with the fingerprint of all the inputs the outputs were produced from: the
+raw input dict (the same as in the meta_data.json), the .def file version, the
+temperatures of the lifetimes, the number of the decay channels kept, and the size,
+modification time and content fingerprint of the .states file and of each of the
+.trans files used (see `exomol2lida.cache.get_file_key`). The outputs are up to date
+only if the manifest fingerprint is the same as the fingerprint of the current inputs.
+An output directory without a manifest has never been completely processed.
+"""
+
+import hashlib
+import json
+import os
+
+from exomole.exceptions import DefParseError
+
+from config.config import MIXED_PRECISION, NUM_CHANNELS, OUTPUT_DIR, TEMPERATURES
+
+from .cache import get_file_key
+from .exceptions import MoleculeInputError
+from .read_inputs import MoleculeInput
+from .utils import TEMP
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _file_fingerprint(path):
+    # keyed by the file name, so the EXOMOL_DATA_DIR might be moved around
+    key = get_file_key(path)
+    key["path"] = path.name
+    return key
+
+
+def get_input_fingerprint(
+    molecule_input, temperatures, num_channels, mixed_precision=False
+):
+    """Get the fingerprint of all the inputs of the molecule processing.
+
+    Parameters
+    ----------
+    molecule_input : MoleculeInput
+    temperatures : list[float]
+    num_channels : int
+    mixed_precision : bool, default=False
+
+    Returns
+    -------
+    dict
+        With the "input", "version", "temperatures", "num_channels",
+        "mixed_precision", "states_file" and "trans_files" parts.
+    """
+    fingerprint = {
+        "input": molecule_input.raw_input,
+        "version": molecule_input.version,
+        "temperatures": [float(temp) for temp in temperatures],
+        "num_channels": int(num_channels),
+        "mixed_precision": bool(mixed_precision),
+        "states_file": _file_fingerprint(molecule_input.states_path),
+        "trans_files": [
+            _file_fingerprint(path) for path in sorted(molecule_input.trans_paths)
+        ],
+    }
+    # normalized as if loaded from the json
+    return json.loads(json.dumps(fingerprint))
+
+
+def get_digest(fingerprint):
+    """Get a short digest of the fingerprint.
+
+    Parameters
+    ----------
+    fingerprint : dict
+
+    Returns
+    -------
+    str
+    """
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(output_dir):
+    """Load the manifest of the output directory.
+
+    Parameters
+    ----------
+    output_dir : Path
+
+    Returns
+    -------
+    dict or None
+        With the "digest" and "fingerprint", or None if there is no manifest.
+    """
+    try:
+        with open(output_dir / MANIFEST_FILE) as fp:
+            return json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(output_dir, fingerprint):
+    """Atomically write the manifest of the output directory.
+
+    Parameters
+    ----------
+    output_dir : Path
+    fingerprint : dict
+        See `get_input_fingerprint`.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"digest": get_digest(fingerprint), "fingerprint": fingerprint}
+    tmp_path = output_dir / f"{MANIFEST_FILE}.tmp"
+    with open(tmp_path, "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    os.replace(tmp_path, output_dir / MANIFEST_FILE)
+
+
+def remove_manifest(output_dir):
+    """Remove the manifest of the output directory, if any.
+
+    Parameters
+    ----------
+    output_dir : Path
+    """
+    (output_dir / MANIFEST_FILE).unlink(missing_ok=True)
+
+
+def get_changes(manifest, fingerprint):
+    """Get the parts of the inputs which have changed since the outputs were produced.
+
+    Parameters
+    ----------
+    manifest : dict or None
+        See `load_manifest`.
+    fingerprint : dict
+        Fingerprint of the current inputs, see `get_input_fingerprint`.
+
+    Returns
+    -------
+    list[str] or None
+        Names of the changed parts of the fingerprint (empty if the outputs are up to
+        date), or None if there is no manifest.
+    """
+    if manifest is None:
+        return None
+    if manifest["digest"] == get_digest(fingerprint):
+        return []
+    previous = manifest["fingerprint"]
+    return [part for part in fingerprint if previous.get(part) != fingerprint[part]]
+
+
+def scan_outputs(mol_formulas):
+    """Scan the outputs of the molecules against their current inputs.
+
+    Parameters
+    ----------
+    mol_formulas : iterable of str
+        Molecular formulas, must be among the keys in ``input.molecules.molecules``
+        dictionary.
+
+    Returns
+    -------
+    dict[str, str]
+        Status of each molecule: "UP TO DATE", "STALE: ..." (with the changed parts
+        of the inputs), "NOT PROCESSED", "INCOMPLETE" (outputs without any manifest),
+        or "SCAN FAILED: ...".
+    """
+    statuses = {}
+    for mol_formula in mol_formulas:
+        output_dir = OUTPUT_DIR / mol_formula
+        if not output_dir.is_dir() or not list(output_dir.iterdir()):
+            statuses[mol_formula] = "NOT PROCESSED"
+            continue
+        manifest = load_manifest(output_dir)
+        if manifest is None:
+            statuses[mol_formula] = "INCOMPLETE"
+            continue
+        try:
+            molecule_input = MoleculeInput(mol_formula)
+            fingerprint = get_input_fingerprint(
+                molecule_input,
+                TEMPERATURES or [TEMP],
+                molecule_input.num_channels or NUM_CHANNELS,
+                mixed_precision=MIXED_PRECISION,
+            )
+        except (MoleculeInputError, DefParseError, OSError) as e:
+            statuses[mol_formula] = f"SCAN FAILED: {type(e).__name__}: {e}"
+            continue
+        changes = get_changes(manifest, fingerprint)
+        if changes:
+            statuses[mol_formula] = f"STALE: {', '.join(changes)} changed"
+        else:
+            statuses[mol_formula] = "UP TO DATE"
+    return statuses
@@ -0,0 +1,414 @@
+"""
+Module with functionality for reducing the .trans files into transitions prelumps in
+parallel worker processes.
+
+The .trans files are reduced chunk by chunk into partial prelumps (see
+`exomol2lida.accumulators.surviving_transitions` and
+`exomol2lida.accumulators.reduce_prelumps`). With worker processes, each task is a
+whole .trans file, or a span of a large one (see
+`exomol2lida.trans_index.trans_spans`), so even a single large file is reduced by all
+the workers. Each worker adds up the partials of all the chunks of its task into a
+single store of prelumps (see `exomol2lida.accumulators.PrelumpsAccumulator`), which
+is handed back to the parent, and only a bounded number of tasks is in flight at any
+time, so the memory of the parent is bounded by a few stores. The prelumps sums do
+not depend on the order of the additions, so merging the stores gives exactly the same
+result as the serial reduction.
+
+The map between the original and lumped state ids is shared with the workers through
+shared memory, instead of being pickled into each of them, and the ids of the
+surviving original states (which allow the readers to skip the parts of the .trans
+files without any transitions between them) are derived from it.
+
+Several datasets lumped from the same .trans files (such as HCN and HNC) can be
+reduced in a single pass over the .trans files, each with its own states map.
+"""
+
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .accumulators import (
+    PrelumpsAccumulator,
+    reduce_prelumps,
+    shared_surviving_transitions,
+)
+from .trans_index import indexed_trans_columns
+
+# state of each worker process, populated by the pool initializer
+_worker = {}
+
+
+def _init_worker(
+    shm_name,
+    shape,
+    dtype,
+    nums_lumped,
+    unmapped_state,
+    chunk_size,
+    read_columns,
+    downward_only,
+):
+    # the workers share the resource tracker of the parent process, which owns the
+    # shared memory block and unlinks it
+    shm = SharedMemory(name=shm_name)
+    _worker.update(
+        shm=shm,
+        states_maps=np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+        nums_lumped=nums_lumped,
+        unmapped_state=unmapped_state,
+        chunk_size=chunk_size,
+        read_columns=read_columns,
+        downward_only=downward_only,
+    )
+
+
+def _surviving_state_ids(states_maps, unmapped_state):
+    """Get the sorted ids of the original states mapped by any of the `states_maps`.
+
+    Parameters
+    ----------
+    states_maps : list[numpy.ndarray]
+    unmapped_state : int
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    surviving = np.zeros(max(len(states_map) for states_map in states_maps), dtype=bool)
+    for states_map in states_maps:
+        surviving[: len(states_map)] |= states_map != unmapped_state
+    return np.flatnonzero(surviving)
+
+
+def _reduce_file(
+    trans_path,
+    map_ids,
+    start,
+    stop,
+    states_maps,
+    nums_lumped,
+    chunk_size,
+    read_columns,
+    unmapped_state,
+    downward_only,
+):
+    """Reduce all the chunks of a single .trans file (or of its span) for the selected
+    states maps.
+
+    Parameters
+    ----------
+    trans_path : Path
+    map_ids : list[int]
+        Indices of the states maps taking part in the .trans file.
+    start, stop : object
+        Positions to start the reading of the file from and to stop it at (None for
+        its beginning and its end), see `iter_reduced_trans_files`.
+    states_maps : numpy.ndarray or list[numpy.ndarray]
+        All the states maps.
+    nums_lumped : list[int]
+    chunk_size : int
+    read_columns : callable
+    unmapped_state : int
+    downward_only : bool
+
+    Yields
+    ------
+    position : object
+        Position right after the chunk.
+    partials : list[tuple[numpy.ndarray] or None]
+        Partial prelumps for each chunk of the file, in order, for all the states
+        maps (None for the maps not taking part).
+    """
+    file_maps = [states_maps[map_id] for map_id in map_ids]
+    state_ids = _surviving_state_ids(file_maps, unmapped_state)
+    for survivors, position in shared_surviving_transitions(
+        read_columns(trans_path, state_ids=state_ids, start=start, stop=stop),
+        chunk_size,
+        file_maps,
+        unmapped_state=unmapped_state,
+        downward_only=downward_only,
+    ):
+        chunk_partials = [None] * len(states_maps)
+        for map_id, map_survivors in zip(map_ids, survivors):
+            chunk_partials[map_id] = reduce_prelumps(
+                *map_survivors, num_lumped=nums_lumped[map_id]
+            )
+        yield position, chunk_partials
+
+
+def _reduce_trans_task(task):
+    """Reduce a single .trans file (or its span) in a worker process.
+
+    Parameters
+    ----------
+    task : tuple[Path, list[int], object, object]
+        The .trans file path, the indices of the states maps taking part, and the
+        positions to start the reading from and to stop it at.
+
+    Returns
+    -------
+    position : object
+        Position right after the last chunk reduced (the start position if none).
+    stores : list[tuple[numpy.ndarray] or None]
+        The prelumps of all the chunks of the task merged together (see
+        `exomol2lida.accumulators.PrelumpsAccumulator.get_store`), for all the
+        states maps (None for the maps not taking part, or without any prelumps).
+    """
+    trans_path, map_ids, start, stop = task
+    nums_lumped = _worker["nums_lumped"]
+    accumulators = {
+        map_id: PrelumpsAccumulator(num_lumped=nums_lumped[map_id])
+        for map_id in map_ids
+    }
+    position = start
+    for position, partials in _reduce_file(
+        trans_path,
+        map_ids,
+        start,
+        stop,
+        _worker["states_maps"],
+        nums_lumped,
+        _worker["chunk_size"],
+        _worker["read_columns"],
+        _worker["unmapped_state"],
+        _worker["downward_only"],
+    ):
+        for map_id in map_ids:
+            if partials[map_id] is not None:
+                accumulators[map_id].add_partial(partials[map_id])
+    stores = [None] * len(nums_lumped)
+    for map_id, accumulator in accumulators.items():
+        if accumulator.num_prelumps:
+            stores[map_id] = accumulator.get_store()
+    return position, stores
+
+
+def reduce_trans_files(
+    trans_paths,
+    states_map,
+    num_lumped,
+    chunk_size,
+    num_workers,
+    unmapped_state=-1,
+    read_columns=None,
+    downward_only=False,
+    get_spans=None,
+):
+    """Reduce the .trans files into partial prelumps in a pool of worker processes.
+
+    Parameters
+    ----------
+    trans_paths : list[Path]
+    states_map : numpy.ndarray
+        Dense map between the original and lumped state ids.
+    num_lumped : int
+        Number of the lumped states.
+    chunk_size : int
+        Chunk size for reading each of the .trans files.
+    num_workers : int
+    unmapped_state : int, default=-1
+    read_columns : callable, optional
+        Picklable callable returning the generator of the raw i, f and A_if arrays
+        of the blocks of the .trans file passed, each followed by the position the
+        reading can be resumed from right after the block, such as a partial of
+        `exomol2lida.trans_index.indexed_trans_columns`. It is also passed the
+        sorted ids of the surviving original states as the `state_ids` keyword
+        argument (to skip any parts of the file without transitions between them),
+        and the positions to start from and to stop at as the `start` and `stop`
+        keyword arguments (None for the beginning and the end of the file). Defaults
+        to the `exomol2lida.trans_index.indexed_trans_columns` with the "exomole"
+        reader.
+    downward_only : bool, default=False
+        If True, only the transitions to the lumped states with lower ids (lower
+        energies) than the lumped initial states are reduced, see
+        `exomol2lida.accumulators.compact_transitions`.
+    get_spans : callable, optional
+        Picklable callable returning the (start, stop) positions of the spans to
+        split the .trans file passed into, starting from the position passed as the
+        `start` keyword argument, such as a partial of
+        `exomol2lida.trans_index.trans_spans`. Each of the spans is reduced in a
+        separate task. If not given, the files are not split.
+
+    Yields
+    ------
+    partial : tuple[numpy.ndarray] or None
+        Partial prelumps for each chunk of each file (with `num_workers` over 1, the
+        prelumps of each file or its span merged together), in the order of the
+        sorted `trans_paths` and of the chunks within each file.
+    """
+    for partials in reduce_shared_trans_files(
+        [trans_paths],
+        [states_map],
+        [num_lumped],
+        chunk_size,
+        num_workers,
+        unmapped_state=unmapped_state,
+        read_columns=read_columns,
+        downward_only=downward_only,
+        get_spans=get_spans,
+    ):
+        yield partials[0]
+
+
+def reduce_shared_trans_files(
+    trans_paths,
+    states_maps,
+    nums_lumped,
+    chunk_size,
+    num_workers,
+    unmapped_state=-1,
+    read_columns=None,
+    downward_only=False,
+    get_spans=None,
+):
+    """Reduce the .trans files shared by several datasets into partial prelumps.
+
+    Each of the .trans files is read only once, and reduced for all the states maps
+    whose `trans_paths` contain it. With `num_workers` of 1, the files are reduced in
+    this process.
+
+    Parameters
+    ----------
+    trans_paths : list[list[Path]]
+        The .trans files of each of the datasets.
+    states_maps : list[numpy.ndarray]
+        Dense maps between the original and lumped state ids of each of the datasets.
+    nums_lumped : list[int]
+        Numbers of the lumped states of each of the datasets.
+    chunk_size : int
+        Chunk size for reading each of the .trans files.
+    num_workers : int
+    unmapped_state : int, default=-1
+    read_columns : callable, optional
+    downward_only : bool, default=False
+    get_spans : callable, optional
+        See `reduce_trans_files`.
+
+    Yields
+    ------
+    partials : list[tuple[numpy.ndarray] or None]
+        Partial prelumps for each chunk (or each task, with `num_workers` over 1) of
+        each file, in the order of the sorted union of the `trans_paths` and of the
+        chunks within each file, for each of the datasets (None for the datasets
+        without the file, or without any transitions surviving in the chunk).
+    """
+    for _, _, partials in iter_reduced_trans_files(
+        trans_paths,
+        states_maps,
+        nums_lumped,
+        chunk_size,
+        num_workers,
+        unmapped_state=unmapped_state,
+        read_columns=read_columns,
+        downward_only=downward_only,
+        get_spans=get_spans,
+    ):
+        yield partials
+
+
+def iter_reduced_trans_files(
+    trans_paths,
+    states_maps,
+    nums_lumped,
+    chunk_size,
+    num_workers,
+    unmapped_state=-1,
+    read_columns=None,
+    starts=None,
+    downward_only=False,
+    get_spans=None,
+):
+    """Reduce the .trans files into partial prelumps, tracking their positions.
+
+    The same as `reduce_shared_trans_files`, but each of the partials comes with the
+    .trans file it has been reduced from and the position in the file right after
+    it, and the reading of the files can be resumed from such positions.
+
+    Parameters
+    ----------
+    trans_paths : list[list[Path]]
+    states_maps : list[numpy.ndarray]
+    nums_lumped : list[int]
+    chunk_size : int
+    num_workers : int
+    unmapped_state : int, default=-1
+    read_columns : callable, optional
+        See `reduce_shared_trans_files`.
+    starts : dict[Path, object], optional
+        Positions to resume the reading of the .trans files from, as yielded
+        before. The other files are read from their beginnings.
+    downward_only : bool, default=False
+    get_spans : callable, optional
+        See `reduce_trans_files`.
+
+    Yields
+    ------
+    trans_path : Path
+    position : object
+        Position in the file right after the partials (None if not known).
+    partials : list[tuple[numpy.ndarray] or None]
+    """
+    if read_columns is None:
+        read_columns = partial(indexed_trans_columns, reader="exomole")
+    starts = starts or {}
+    tasks = []
+    for trans_path in sorted(set().union(*trans_paths)):
+        map_ids = [n for n, paths in enumerate(trans_paths) if trans_path in paths]
+        start = starts.get(trans_path)
+        spans = [(start, None)]
+        if num_workers > 1 and get_spans is not None:
+            spans = get_spans(trans_path, start=start)
+        tasks.extend((trans_path, map_ids, *span) for span in spans)
+    if num_workers <= 1:
+        for task in tasks:
+            for position, partials in _reduce_file(
+                *task,
+                states_maps,
+                nums_lumped,
+                chunk_size,
+                read_columns,
+                unmapped_state,
+                downward_only,
+            ):
+                yield task[0], position, partials
+        return
+    # the maps padded by the sentinel to the same length, so they can be stacked
+    # and shared with the workers
+    length = max(len(states_map) for states_map in states_maps)
+    shm = SharedMemory(create=True, size=max(len(states_maps) * length * 8, 1))
+    try:
+        stacked = np.ndarray((len(states_maps), length), dtype="int64", buffer=shm.buf)
+        stacked[:] = unmapped_state
+        for row, states_map in zip(stacked, states_maps):
+            row[: len(states_map)] = states_map
+        init_args = (
+            shm.name,
+            stacked.shape,
+            stacked.dtype.str,
+            list(nums_lumped),
+            unmapped_state,
+            chunk_size,
+            read_columns,
+            downward_only,
+        )
+        del stacked, row  # no exported pointers may be left when closing the shm
+        with Pool(num_workers, initializer=_init_worker, initargs=init_args) as pool:
+            # only a bounded number of the tasks is submitted ahead of the results
+            # yielded, so only a bounded number of the results is held at any time
+            in_flight = deque()
+            for task in tasks:
+                in_flight.append(
+                    (task[0], pool.apply_async(_reduce_trans_task, (task,)))
+                )
+                if len(in_flight) == 2 * num_workers:
+                    trans_path, result = in_flight.popleft()
+                    yield trans_path, *result.get()
+            while in_flight:
+                trans_path, result = in_flight.popleft()
+                yield trans_path, *result.get()
+    finally:
+        shm.close()
+        shm.unlink()
@@ -6,26 +6,142 @@ and its docstrings).
 """
 import json
 import math
+import shutil
+import time
 from datetime import datetime
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
 from pprint import pprint
 
 import numpy as np
 
 import pandas as pd
 from exomole.exceptions import DefParseError
-from exomole.read_data import states_chunks, trans_chunks
 from tqdm import tqdm
 
-from config.config import STATES_CHUNK_SIZE, TRANS_CHUNK_SIZE, OUTPUT_DIR
+from config.config import (
+    STATES_CHUNK_SIZE,
+    TRANS_CHUNK_SIZE,
+    NUM_WORKERS,
+    TRANS_SPAN_SIZE,
+    DECOMPRESSION_THREADS,
+    TRANS_READER,
+    CACHE_DIR,
+    CACHE_SIZE_LIMIT,
+    TRANS_INDEX_DIR,
+    CHECKPOINT_CHUNKS,
+    CHECKPOINT_INTERVAL,
+    PERSIST_PRELUMPS,
+    PERSIST_STATES,
+    TEMPERATURES,
+    NUM_CHANNELS,
+    DOWNWARD_ONLY,
+    MIXED_PRECISION,
+    OUTPUT_DIR,
+)
+from .accumulators import (
+    LumpedStatesAccumulator,
+    PrelumpsAccumulator,
+)
+from .cache import ColumnarCache, get_file_key
+from .channels import renormalize_channels
+from .checkpoint import TransCheckpoint, get_checkpoint_key
 from .exceptions import MoleculeInputError
+from .file_prelumps import (
+    get_prelumps_key,
+    get_prelumps_path,
+    load_file_prelumps,
+    remove_stale_prelumps,
+    save_file_prelumps,
+)
+from . import manifest
+from .parallel import iter_reduced_trans_files
+from . import read_data
+from . import trans_index
 from .postprocess_dataset import postprocess_molecule
 from .read_inputs import MoleculeInput
+from .states_artifact import StatesArtifact
 from .utils import EV_IN_CM
 from .utils import TEMP
 from .utils import BOLTZ
 from .utils import PLANCK
 from .utils import VELLGT
 
+
+def _cached_trans_columns(
+    trans_path,
+    input_cache,
+    read_chunks,
+    chunk_size,
+    columns,
+    settings=None,
+    state_ids=None,
+    start=None,
+    stop=None,
+):
+    """Generate the i, f and A_if arrays of a .trans file through the columnar cache.
+
+    Parameters
+    ----------
+    trans_path : Path
+    input_cache : ColumnarCache
+    read_chunks : callable
+        Callable returning the generator of chunks of the .trans files passed, used
+        if the file is not cached yet.
+    chunk_size : int
+    columns : list[str]
+        The .trans columns to be cached.
+    settings : dict, optional
+        Settings of the `read_chunks` keying the cached .trans file (see
+        `exomol2lida.cache.ColumnarCache.get_key`).
+    state_ids : numpy.ndarray, optional
+        Ignored, the cached .trans files are read in full.
+    start : int, optional
+        Number of the leading chunks to skip (served from the memory-mapped columns
+        without being parsed, once the file is cached).
+    stop : int, optional
+        Number of the chunks to stop the reading after.
+
+    Yields
+    ------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, int]
+        The i, f and A_if arrays of each chunk, and the number of the chunks up to
+        and including it.
+    """
+    chunks = input_cache.chunks(
+        trans_path,
+        partial(read_chunks, [trans_path]),
+        chunk_size,
+        columns=columns,
+        settings=settings,
+    )
+    for num_chunks, columns in enumerate(read_data.frame_columns(chunks), start=1):
+        if stop is not None and num_chunks > stop:
+            break
+        if start is None or num_chunks > start:
+            yield *columns, num_chunks
+
+
+def _single_precision_trans_columns(trans_path, read_columns, **kwargs):
+    """Generate the i, f and A_if arrays of a .trans file stored in single precision.
+
+    Parameters
+    ----------
+    trans_path : Path
+    read_columns : callable
+        Callable returning the generator of the i, f and A_if arrays of the .trans
+        file passed, along with any of the `kwargs`.
+
+    Returns
+    -------
+    generator of tuple[numpy.ndarray]
+        See `exomol2lida.read_data.single_precision_columns`.
+    """
+    return read_data.single_precision_columns(read_columns(trans_path, **kwargs))
+
+
 class DatasetProcessor:
     """Class for processing a single ExoMole dataset into the Lida data.
 
@@ -38,19 +154,47 @@ class DatasetProcessor:
     molecule : MoleculeInput or str
         If str passed, MoleculeInput is instantiated with data from the input file for
         the given ``molecule_formula = molecule`` passed.
+    resume : bool, default=False
+        If True, the output directory does not need to be empty, and the transitions
+        lumping continues from the checkpoint left in it by an interrupted processing
+        (if there is any matching one).
+    force : bool, default=False
+        If True, the output directory does not need to be empty, and all the outputs
+        in it are overwritten by the processing (its checkpoint is only kept if
+        resuming).
+    temperatures : list[float], optional
+        Temperatures in [K] of the Boltzmann weights of the lifetimes. Defaults to the
+        `TEMPERATURES` from the config, or to the `TEMP` if not configured. All the
+        temperatures are processed in a single pass over the dataset files.
 
     Attributes
     ----------
     resolved_quanta : list[str]
     lumped_states : pandas.DataFrame
     states_map_lumped_to_original : dict[int, set[int]]
+    states_array_original_to_lumped : numpy.ndarray
+        Dense map between the original and lumped state ids, indexed by the original
+        ids. The original states filtered out (or missing in the .states file) map
+        onto the `unmapped_state` sentinel.
     states_map_original_to_lumped : dict[int, int]
+        Lazily built dict view of the `states_array_original_to_lumped`.
+    temperatures : list[float]
+    states_boltzmann_weights : numpy.ndarray
+        Boltzmann weights ``g_tot * exp(-c2 * E / T)`` of the original states for
+        each of the `temperatures` T, of the shape (num_original, num_temperatures),
+        indexed by the original ids (zero for the states filtered out).
     lumped_transitions : pandas.DataFrame
+        The lumped transitions at the first of the `temperatures`, the `lumped_states`
+        get their lifetimes at the same temperature.
+    lumped_states_by_temp, lumped_transitions_by_temp : dict[float, pandas.DataFrame]
+        The lumped states and transitions at each of the `temperatures`.
 
     Methods
     -------
     lump_states
         Populates the `lumped_states` DataFrame and the states maps.
+    load_lumped_states
+        Populates the same from the persisted states artifact, if up to date.
     lump_transitions
         Populates the `lumped_transitions` DataFrame.
     process
@@ -67,15 +211,31 @@ class DatasetProcessor:
     FileExistsError
         If the molecule passed already has an entry in the OUTPUT_DIR, meaning that
         it already has been processed. To reprocess the data, the output/{mol_formula}
-        needs to first be manually removed.
+        needs to first be manually removed. Not raised when resuming or forcing.
     """
 
     states_chunk_size = STATES_CHUNK_SIZE
     trans_chunk_size = TRANS_CHUNK_SIZE
-    discarded_quanta_values = {"*"}
+    num_workers = NUM_WORKERS
+    trans_span_size = TRANS_SPAN_SIZE
+    decompression_threads = DECOMPRESSION_THREADS
+    trans_reader = TRANS_READER
+    cache_dir = CACHE_DIR
+    cache_size_limit = CACHE_SIZE_LIMIT
+    trans_index_dir = TRANS_INDEX_DIR
+    checkpoint_chunks = CHECKPOINT_CHUNKS
+    checkpoint_interval = CHECKPOINT_INTERVAL
+    persist_prelumps = PERSIST_PRELUMPS
+    persist_states = PERSIST_STATES
+    temperatures = TEMPERATURES
+    num_channels = NUM_CHANNELS
+    downward_only = DOWNWARD_ONLY
+    mixed_precision = MIXED_PRECISION
+    trans_columns = ["i", "f", "A_if"]
     include_original_lifetimes = None
+    unmapped_state = -1
 
-    def __init__(self, molecule):
+    def __init__(self, molecule, resume=False, force=False, temperatures=None):
         if isinstance(molecule, MoleculeInput):
             molecule_input = molecule
         else:
@@ -90,22 +250,150 @@ class DatasetProcessor:
         self.resolve_vib = molecule_input.resolve_vib
         self.only_with = molecule_input.only_with
         self.only_without = molecule_input.only_without
+        self.states_filter = molecule_input.states_filter
         self.energy_max = molecule_input.energy_max
 
         self.resolved_quanta = self.resolve_el + self.resolve_vib
+        if temperatures is not None:
+            self.temperatures = temperatures
+        self.temperatures = [float(temp) for temp in (self.temperatures or [TEMP])]
+        if molecule_input.num_channels is not None:
+            self.num_channels = molecule_input.num_channels
 
         self.lumped_states = None
         self.states_map_lumped_to_original = {}
-        self.states_map_original_to_lumped = {}
+        self.states_array_original_to_lumped = np.full(
+            1, self.unmapped_state, dtype="int64"
+        )
+        self._states_map_original_to_lumped = None
+        self.states_boltzmann_weights = np.zeros(
+            (1, len(self.temperatures)), dtype="float64"
+        )
         # if tau in states_header and self.include_original_lifetimes, populate this:
         self.states_map_lumped_to_tau = {}
 
         self.lumped_transitions = None
+        self.lumped_states_by_temp = None
+        self.lumped_transitions_by_temp = None
+
+        # accumulators, only populated during the lumping
+        self._states_accumulator = None
+        self._boltzmann_weights = None
+        self._prelumps = None
 
+        self.resume = resume
+        self.force = force
         self.output_dir = OUTPUT_DIR / self.formula
+        if resume or force:
+            return
         if self.output_dir.exists() and list(self.output_dir.iterdir()):
             raise FileExistsError(f"The directory {self.output_dir} is not empty!")
 
+    @property
+    def input_fingerprint(self):
+        """Get the fingerprint of all the inputs of the processing.
+
+        See `exomol2lida.manifest.get_input_fingerprint`.
+
+        Returns
+        -------
+        dict
+        """
+        return manifest.get_input_fingerprint(
+            self.molecule_input,
+            self.temperatures,
+            self.num_channels,
+            mixed_precision=self.mixed_precision,
+        )
+
+    @property
+    def is_up_to_date(self):
+        """Check if the outputs have been produced from the current inputs.
+
+        Returns
+        -------
+        bool
+        """
+        changes = manifest.get_changes(
+            manifest.load_manifest(self.output_dir), self.input_fingerprint
+        )
+        return changes is not None and not changes
+
+    @property
+    def states_map_original_to_lumped(self):
+        """Get the map between the original and the lumped state ids.
+
+        The dict is built lazily from the `states_array_original_to_lumped` only when
+        first requested, the processing itself only uses the array.
+
+        Returns
+        -------
+        dict[int, int]
+        """
+        if self._states_map_original_to_lumped is None:
+            original_ids = np.flatnonzero(
+                self.states_array_original_to_lumped != self.unmapped_state
+            )
+            self._states_map_original_to_lumped = dict(
+                zip(
+                    original_ids.tolist(),
+                    self.states_array_original_to_lumped[original_ids].tolist(),
+                )
+            )
+        return self._states_map_original_to_lumped
+
+    def map_original_to_lumped(self, original_ids):
+        """Map the original state ids onto the lumped state ids.
+
+        Parameters
+        ----------
+        original_ids : numpy.ndarray
+            Original (.states file) state ids.
+
+        Returns
+        -------
+        numpy.ndarray
+            The lumped state ids, with `unmapped_state` for all the original states
+            which do not belong to any lumped state.
+        """
+        # the last element of the array is always the sentinel, so clipping the ids
+        # maps all the states out of the range onto it
+        return self.states_array_original_to_lumped.take(original_ids, mode="clip")
+
+    @property
+    def input_cache(self):
+        """Get the columnar cache of the input files, if configured.
+
+        Returns
+        -------
+        ColumnarCache or None
+        """
+        if self.cache_dir is None:
+            return None
+        return ColumnarCache(self.cache_dir, self.cache_size_limit)
+
+    @property
+    def keep_original_lifetimes(self):
+        """True if the original lifetimes of the states are to be collected."""
+        return bool(self.include_original_lifetimes and "tau" in self.states_header)
+
+    @property
+    def states_usecols(self):
+        """Get the names of the .states columns needed for the processing.
+
+        These are "E", "g_tot", "J", the resolved quanta, the columns needed by the
+        `states_filter` and the "tau" column (if the original lifetimes are
+        collected), in the order of the `states_header`.
+
+        Returns
+        -------
+        list[str]
+        """
+        needed = {"E", "g_tot", "J", *self.resolved_quanta, *self.states_filter.columns}
+        if self.keep_original_lifetimes:
+            needed.add("tau")
+        return [col for col in self.states_header[1:] if col in needed]
+
     @property
     def states_chunks(self):
         """Get chunks of the dataset states file.
@@ -113,30 +401,66 @@ class DatasetProcessor:
         Generator of pandas.DataFrame chunks of the .states file, with
         (hopefully correctly) assigned columns, and indexed by states indices
         (the states indices are NOT present as a column, but as the dataframe index).
-        The columns of each chunk are as follows:
-        'E', 'g_tot', 'J' [, 'tau', 'g_J'], '<state1>' [, '<state2>', ..., '<stateN>']
+        Only the `states_usecols` are read, the columns of each chunk are therefore
+        'E', 'g_tot', 'J' [, 'tau'], '<state1>' [, '<state2>', ..., '<stateN>'],
+        in the order of the `states_header`.
+        Only the states accepted by the `states_filter` are yielded, the filter is
+        pushed down into the reader, so the rejected states are never typed.
 
-        All the values in the DataFrames are str, except of J, E and g_tot.
+        The J, E, g_tot (and tau) columns are float64, the vibrational quanta int32
+        and all the other quanta categoricals of str.
+        If the `cache_dir` is configured, the (unfiltered) chunks are served from the
+        columnar cache of the .states file, once it has been read for the first time,
+        and filtered afterwards.
 
         Yields
         -------
         states_chunk : pandas.DataFrame
             Generated chunks of the states file, each is a pd.DataFrame
         """
-        chunks_generator = states_chunks(
+        input_cache = self.input_cache
+        if input_cache is not None:
+            chunks_generator = input_cache.chunks(
+                self.states_path,
+                self._read_states_chunks,
+                self.states_chunk_size,
+                columns=self.states_usecols,
+                settings=self.states_reader_settings,
+            )
+            for chunk in chunks_generator:
+                yield chunk[self.states_filter(chunk)]
+        else:
+            yield from self._read_states_chunks(predicate=self.states_filter)
+
+    @property
+    def states_reader_settings(self):
+        """Get the settings of the .states reader the types and contents of the
+        chunks depend on.
+
+        These also key the cached .states file, so the cache entry is invalidated
+        whenever any of them changes.
+
+        Returns
+        -------
+        dict
+            Keyword arguments of `exomol2lida.read_data.typed_states_chunks`.
+        """
+        return {
+            "columns": list(self.states_header),
+            "usecols": self.states_usecols,
+            "int_columns": list(self.resolve_vib),
+            "numeric_columns": ["tau"] if self.keep_original_lifetimes else [],
+            "missing_values": sorted(self.states_filter.discarded_quanta_values),
+        }
+
+    def _read_states_chunks(self, predicate=None):
+        return read_data.typed_states_chunks(
             states_path=self.states_path,
             chunk_size=self.states_chunk_size,
-            columns=self.states_header,
+            num_threads=self.decompression_threads,
+            predicate=predicate,
+            **self.states_reader_settings,
         )
-        for chunk in chunks_generator:
-            chunk.loc[:, "J"] = chunk.loc[:, "J"].astype("float64")
-            chunk.loc[:, "E"] = chunk.loc[:, "E"].astype("float64")
-            chunk.loc[:, "g_tot"] = chunk.loc[:, "g_tot"].astype("float64")
-            if self.include_original_lifetimes and "tau" in self.states_header:
-                chunk.loc[:, "tau"] = pd.to_numeric(
-                    chunk.loc[:, "tau"], errors="coerce"
-                )
-            yield chunk.copy(deep=True)
 
     @property
     def trans_chunks(self):
@@ -146,18 +470,136 @@ class DatasetProcessor:
         The indices of the frame are irrelevant, the columns are as follows:
         'i', 'f', 'A_if' [, 'v_if'].
         The 'i' and 'f' columns correspond to the indices in the .states file.
+        If the `cache_dir` is configured, the chunks (without the unused 'v_if'
+        column) are served from the columnar cache of each .trans file, once it has
+        been read for the first time.
 
         Yields
         -------
         trans_chunk : pandas.DataFrame
             Generated chunks of the trans file, each is a pd.DataFrame
         """
-        for chunk in trans_chunks(
-            trans_paths=self.trans_paths, chunk_size=self.trans_chunk_size
-        ):
+        if not self.trans_paths:
+            # all the .trans files might have been skipped
+            return
+        input_cache = self.input_cache
+        if input_cache is not None:
+            # the cached .trans files need to be read in full
+            read_trans_chunks = self._get_read_trans_chunks()
+            chunks_generator = (
+                chunk
+                for trans_path in sorted(self.trans_paths)
+                for chunk in input_cache.chunks(
+                    trans_path,
+                    partial(read_trans_chunks, [trans_path]),
+                    self.trans_chunk_size,
+                    columns=self.trans_columns,
+                    settings={"reader": self.trans_reader},
+                )
+            )
+        else:
+            chunks_generator = self._get_read_trans_chunks()(self.trans_paths)
+        for chunk in chunks_generator:
             # print(f"loaded a chunk of a .trans file of size {len(chunk):,}")
             yield chunk.copy(deep=True)
 
+    @property
+    def block_index_dir(self):
+        """Get the directory of the block indices of the .trans files.
+
+        Returns
+        -------
+        Path or None
+            The `trans_index_dir` if configured, otherwise the "trans_index"
+            directory in the `cache_dir`, or None if neither is configured (and the
+            .trans files are not indexed).
+        """
+        if self.trans_index_dir is not None:
+            return Path(self.trans_index_dir)
+        if self.cache_dir is not None:
+            return Path(self.cache_dir) / "trans_index"
+        return None
+
+    def _get_read_trans_chunks(self):
+        """Get a picklable callable generating the chunks of the .trans files passed.
+
+        Returns
+        -------
+        callable
+        """
+        if self.block_index_dir is not None:
+            return partial(
+                trans_index.indexed_trans_chunks,
+                chunk_size=self.trans_chunk_size,
+                index_dir=self.block_index_dir,
+                num_threads=self.decompression_threads,
+                reader=self.trans_reader,
+            )
+        return partial(
+            read_data.read_trans_chunks,
+            chunk_size=self.trans_chunk_size,
+            reader=self.trans_reader,
+            num_threads=self.decompression_threads,
+        )
+
+    def _get_read_trans_columns(self):
+        """Get a picklable callable generating the raw i, f and A_if arrays of the
+        .trans file passed.
+
+        The arrays are served from the columnar cache, if configured, otherwise the
+        units of the .trans file (see `exomol2lida.trans_index`) are parsed by the
+        `trans_reader`, skipping the units of the indexed .trans files without any
+        transitions between the `state_ids` keyword argument of the callable. The
+        callable also takes the positions to start the reading from and to stop it at
+        as the `start` and `stop` keyword arguments (see
+        `exomol2lida.parallel.iter_reduced_trans_files`).
+        With the `mixed_precision`, the arrays are stored in single precision as soon
+        as each block (or chunk) is read.
+
+        Returns
+        -------
+        callable
+        """
+        if self.input_cache is not None:
+            # the cached .trans files need to be read in full
+            read_columns = partial(
+                _cached_trans_columns,
+                input_cache=self.input_cache,
+                read_chunks=self._get_read_trans_chunks(),
+                chunk_size=self.trans_chunk_size,
+                columns=self.trans_columns,
+                settings={"reader": self.trans_reader},
+            )
+        else:
+            read_columns = partial(
+                trans_index.indexed_trans_columns,
+                index_dir=self.block_index_dir,
+                num_threads=self.decompression_threads,
+                reader=self.trans_reader,
+            )
+        if self.mixed_precision:
+            return partial(_single_precision_trans_columns, read_columns=read_columns)
+        return read_columns
+
+    def _get_trans_spans(self):
+        """Get a picklable callable splitting the .trans file passed into spans,
+        each reduced by a separate worker task.
+
+        The cached .trans files are not split.
+
+        Returns
+        -------
+        callable or None
+            See `exomol2lida.parallel.reduce_trans_files`.
+        """
+        if self.input_cache is not None:
+            return None
+        return partial(
+            trans_index.trans_spans,
+            span_size=self.trans_span_size,
+            index_dir=self.block_index_dir,
+        )
+
     def lump_states(self):
         """Method to lump all the non-resolved states into composite states.
 
@@ -165,103 +607,54 @@ class DatasetProcessor:
         are created linking original to lumped state ids (indices in the original
         .states file and the `lumped_states` `DataFrame`).
         """
-        lumped_states = None
         num_states = self.molecule_input.def_parser.num_states
         total_iter = math.ceil(
             num_states / self.states_chunk_size if num_states else float("inf")
         )
+        self._start_states_lumping()
         for chunk in tqdm(
             self.states_chunks, total=total_iter, desc=f"{self.formula} states"
         ):
-            # initial filtering based on the input and `discarded_quanta_values`
-            mask = pd.Series(True, index=chunk.index)
-            for quantum, val in self.only_with.items():
-                mask = mask & (chunk.loc[mask, quantum] == val)
-            for quantum, val in self.only_without.items():
-                mask = mask & (chunk.loc[mask, quantum] != val)
-            for quantum in self.resolved_quanta:
-                for val in self.discarded_quanta_values:
-                    mask = mask & (chunk.loc[mask, quantum] != val)
-            # get rid of all the states with negative integer vibrational quanta
-            for quantum in self.resolve_vib:
-                mask = mask & (chunk.loc[mask, quantum].astype("int64") >= 0)
-            if self.energy_max is not None:
-                mask = mask & (chunk.loc[mask, "E"] <= self.energy_max)
-            chunk = chunk.loc[mask]
-            if not len(chunk):
-                # no states survived the filtering, go to the next iteration
-                continue
+            self._lump_states_chunk(chunk)
+        self._finish_states_lumping()
 
-            #ALEC add new column with boltzmann-weighted energy 
-            chunk.loc[:,"en_x_w1"] = chunk.loc[:,"g_tot"] * np.exp((-BOLTZ * chunk.loc[:,"E"]) / TEMP)
-            chunk.en_x_w1.astype("float64")
-            #ALEC chunk1 is copy of states_chunk to use for matching in transitions later
-            global chunk1
-            chunk1 = chunk[["J","en_x_w1"]]
-            # group the states chunk into a multi-indexed DataFrame of composite states
-            chunk_grouped = chunk.groupby(self.resolved_quanta)
-            
-            # process each multi-index into the final composite state and add the
-            # processed chunk to the lumped_states
-            lumped_states_chunk = chunk_grouped.apply(self._process_state_lump)
-            
-            if lumped_states is None:
-                # seed the lumped_states dataframe
-                lumped_states = pd.DataFrame(
-                    index=lumped_states_chunk.index,
-                    columns=lumped_states_chunk.columns,
-                    dtype="float64",
-                )
-                lumped_states.loc[:, "J_en"] = float("inf")
-
-            # ======================================================================== #
-            # the ugly code in this bloc only ensures that energy for each lump is
-            # calculated only from the lowest-J states, and I cannot know in which
-            # chunk this will appear.
-
-            # if in the current lumped_states_chunk there is either J
-            # or a new index, I need to reset those rows in the lumped_states and
-            # forget all the accumulated sum_w and sum_en_x_w...
-            # new index:
-            add_index = lumped_states_chunk.index.difference(lumped_states.index)
-            # index of lower Js:
-            index_intersection = lumped_states_chunk.index.intersection(
-                lumped_states.index
-            )
-            reset_mask = lumped_states_chunk.J_en.loc[index_intersection].lt(
-                lumped_states.J_en.loc[index_intersection]
-            )
-            reset_index = reset_mask.loc[reset_mask].index
-            # all indices to reset:
-            reset_index = reset_index.union(add_index, sort=False)
-            # looks like I need to create temp. dataframe with union of the indices
-            lumped_states_updated = pd.DataFrame(
-                index=lumped_states.index.union(reset_index, sort=False),
-                columns=lumped_states.columns,
-                dtype="float64",
-            )
-            lumped_states_updated.loc[lumped_states.index] = lumped_states
-            # and reset the values:
-            lumped_states_updated.loc[reset_index, "J_en"] = lumped_states_chunk.loc[
-                reset_index, "J_en"
-            ]
-            lumped_states_updated.loc[reset_index, ["sum_w", "sum_en_x_w"]] = [0, 0]
-            # now to update the sum_w and sum_en_x_w accumulates
-            index_intersection = lumped_states_updated.index.intersection(
-                lumped_states_chunk.index
-            )
-            update_mask = lumped_states_updated.J_en.loc[index_intersection].eq(
-                lumped_states_chunk.J_en.loc[index_intersection]
-            )
-            update_index = update_mask.loc[update_mask].index
-            lumped_states_updated.loc[
-                update_index, ["sum_w", "sum_en_x_w"]
-            ] = lumped_states_updated.loc[update_index, ["sum_w", "sum_en_x_w"]].add(
-                lumped_states_chunk.loc[update_index, ["sum_w", "sum_en_x_w"]]
-            )
-            # and get rid of the temp. dataframe
-            lumped_states = lumped_states_updated
-            # ======================================================================== #
+    def _start_states_lumping(self):
+        """Set up the accumulators of the states lumping, see `lump_states`."""
+        self._states_accumulator = LumpedStatesAccumulator(
+            self.resolved_quanta, keep_tau=self.keep_original_lifetimes
+        )
+        self._boltzmann_weights = []
+
+    def _lump_states_chunk(self, chunk):
+        """Reduce a chunk of the .states file into the accumulators.
+
+        Parameters
+        ----------
+        chunk : pandas.DataFrame
+            Chunk of the .states file, already filtered by the `states_filter`.
+        """
+        if not len(chunk):
+            # no states survived the filtering
+            return
+
+        # boltzmann weights of the original states, used to weight the
+        # lifetimes of the transitions prelumps later (for all the temperatures)
+        g_tot = chunk["g_tot"].to_numpy(dtype="float64")
+        energy = chunk["E"].to_numpy(dtype="float64")
+        weights = g_tot[:, np.newaxis] * np.exp(
+            (-BOLTZ * energy)[:, np.newaxis] / np.array(self.temperatures)
+        )
+        # reduce the chunk into the lumps and merge it into the accumulators (the
+        # weights are kept aligned with the states accumulated)
+        accepted = self._states_accumulator.update(chunk)
+        self._boltzmann_weights.append(weights[accepted])
+
+    def _finish_states_lumping(self):
+        """Build the lumped states and the states maps from the accumulators."""
+        keep_tau = self.keep_original_lifetimes
+        accumulator = self._states_accumulator
+        boltzmann_weights = self._boltzmann_weights
+        lumped_states = accumulator.get_lumped_states()
         # calculate energy as just average of lowest J states per each lump
         lumped_states["E"] = (lumped_states.sum_w / EV_IN_CM).round(5)
         # clean up the column names, remove temporary columns
@@ -270,36 +663,143 @@ class DatasetProcessor:
         # prepare a column for lifetimes:
         lumped_states["tau"] = float("inf")
         # add a column with lump size (number of original states in each lump):
-        lumped_states.loc[:, "lump_size"] = [
-            len(self.states_map_lumped_to_original[lumped_i])
-            for lumped_i in lumped_states.index
-        ]
-        lumped_states.sort_values(by="E", inplace=True)
+        lumped_states.loc[:, "lump_size"] = accumulator.lump_sizes
+        lumps_index = lumped_states.index  # ordered by the accumulator slots
+        # the ties in the rounded energies are broken by the resolved quanta, so the
+        # lumped ids do not depend on the order of the lumps in the accumulator
+        lumped_states.sort_values(
+            by=["E", *self.resolved_quanta], kind="stable", inplace=True
+        )
         # flatten the lumped_states multiindex into columns and reset index
         # each lumped state will get it's own integer index
-        lumped_index_orig = list(lumped_states.index)
+        slots = lumps_index.get_indexer(lumped_states.index)
         lumped_states.reset_index(inplace=True)
-        lumped_index_update_map = dict(zip(lumped_index_orig, lumped_states.index))
-        # states_map_lumped_to_original was created (by _process_state_lump helper)
-        # with the original multi-index, now I need to update it so it is
-        # index-to-set[index] (int-to-set[int]).
+        slot_to_lumped = np.empty(len(slots), dtype="int64")
+        slot_to_lumped[slots] = lumped_states.index
+        # populate the maps between the lumped indices and the original indices
+        state_ids = accumulator.state_ids
         self.states_map_lumped_to_original = {
-            lumped_index_update_map[key]: val
-            for key, val in self.states_map_lumped_to_original.items()
+            int(slot_to_lumped[slot]): set(original_indices.tolist())
+            for slot, original_indices in enumerate(
+                accumulator.group_by_slot(state_ids)
+            )
         }
-        # similarly: populate forward map from the original index to the lumped index:
-        for lumped_i, original_indices in self.states_map_lumped_to_original.items():
-            self.states_map_original_to_lumped.update(
-                {i: lumped_i for i in original_indices}
+        num_original = max(
+            self.molecule_input.def_parser.num_states or 0,
+            int(state_ids.max(initial=0)),
+        )
+        # one extra element past the highest id to serve as a sentinel for clipping
+        self.states_array_original_to_lumped = np.full(
+            num_original + 2, self.unmapped_state, dtype="int64"
+        )
+        self.states_array_original_to_lumped[state_ids] = slot_to_lumped[
+            accumulator.state_slots
+        ]
+        self._states_map_original_to_lumped = None
+        # boltzmann weights for the whole dataset, indexed the same way as the map
+        self.states_boltzmann_weights = np.zeros(
+            (len(self.states_array_original_to_lumped), len(self.temperatures)),
+            dtype="float64",
+        )
+        if boltzmann_weights:
+            self.states_boltzmann_weights[state_ids] = np.concatenate(
+                boltzmann_weights
             )
-        # and reindex the map between lump ids and original lifetimes, where appropriate
-        if self.include_original_lifetimes and "tau" in self.states_header:
+        # and the map between lump ids and original lifetimes, where appropriate
+        if keep_tau:
             self.states_map_lumped_to_tau = {
-                lumped_index_update_map[key]: val
-                for key, val in self.states_map_lumped_to_tau.items()
+                int(slot_to_lumped[slot]): tau.tolist()
+                for slot, tau in enumerate(
+                    accumulator.group_by_slot(accumulator.state_tau)
+                )
             }
         # and save the result as an instance attribute
         self.lumped_states = lumped_states
+        self._states_accumulator = self._boltzmann_weights = None
+
+    @property
+    def states_artifact_dir(self):
+        """Get the directory of the persisted states lumping results.
+
+        Returns
+        -------
+        Path
+        """
+        return self.output_dir / ".states"
+
+    @property
+    def states_artifact_key(self):
+        """Get the key of the states lumping results.
+
+        Identifies the .states file and all the settings the states lumping depends
+        on.
+
+        Returns
+        -------
+        dict
+        """
+        key = {
+            "states_file": get_file_key(self.states_path),
+            "states_header": self.states_header,
+            "resolve_el": self.resolve_el,
+            "resolve_vib": self.resolve_vib,
+            "only_with": self.only_with,
+            "only_without": self.only_without,
+            "energy_max": self.energy_max,
+            "keep_tau": self.keep_original_lifetimes,
+            "temperatures": self.temperatures,
+            "num_states": self.molecule_input.def_parser.num_states,
+            "unmapped_state": self.unmapped_state,
+        }
+        # normalized as if loaded from the json
+        return json.loads(json.dumps(key))
+
+    def load_lumped_states(self):
+        """Populate the results of the states lumping from the persisted artifact.
+
+        Only loaded if the artifact in the output directory has been saved by the
+        `save_lumped_states` from the same .states file and with the same settings.
+        The results are the same as if populated by the `lump_states`, only the
+        states map and the Boltzmann weights are memory-mapped read-only arrays.
+
+        Returns
+        -------
+        bool
+            True if loaded.
+        """
+        artifact = StatesArtifact.load(
+            self.states_artifact_dir, self.states_artifact_key
+        )
+        if artifact is None:
+            return False
+        self.lumped_states = artifact.lumped_states
+        self.states_array_original_to_lumped = artifact.states_map
+        self._states_map_original_to_lumped = None
+        self.states_boltzmann_weights = artifact.boltzmann_weights
+        original_ids = self.surviving_state_ids
+        lumped_ids = artifact.states_map[original_ids]
+        order = np.argsort(lumped_ids, kind="stable")
+        bounds = np.flatnonzero(np.diff(lumped_ids[order])) + 1
+        self.states_map_lumped_to_original = {
+            int(lumped_ids[group[0]]): set(original_ids[group].tolist())
+            for group in np.split(order, bounds)
+            if len(group)
+        }
+        if artifact.lumped_to_tau is not None:
+            self.states_map_lumped_to_tau = artifact.lumped_to_tau
+        return True
+
+    def save_lumped_states(self):
+        """Persist the results of the states lumping, see `load_lumped_states`."""
+        StatesArtifact(
+            key=self.states_artifact_key,
+            lumped_states=self.lumped_states,
+            states_map=self.states_array_original_to_lumped,
+            boltzmann_weights=self.states_boltzmann_weights,
+            lumped_to_tau=(
+                self.states_map_lumped_to_tau if self.keep_original_lifetimes else None
+            ),
+        ).save(self.states_artifact_dir)
 
     def lump_transitions(self):
         """Method to lump all the transitions into composites only from and to resolved
@@ -308,186 +808,407 @@ class DatasetProcessor:
         All the composite transitions are saved in `self.lumped_transitions`
         DataFrame.
         """
-        # rolling sums of A_if for each transitions prelump (original_i -> lumped_f)
-        prelumps_einstein_coeff_sums = pd.Series(dtype="float64")
-        # rolling prelump sizes for each transitions prelump (original_i -> lumped_f)
-        prelumps_sizes = pd.Series(dtype="float64")
-
+        self._start_transitions_lumping()
         num_trans = self.molecule_input.def_parser.num_transitions
         total_iter = (
             math.ceil(num_trans / self.trans_chunk_size) if num_trans else float("inf")
         )
-        for chunk in tqdm(
-            self.trans_chunks, total=total_iter, desc=f"{self.formula} transitions"
+        # after iteration over the chunks, I need sums of einstein coefficients
+        # for transitions from the *original* initial index to the *lumped* final
+        # index. All the transitions from or to a non-existing lumped state and
+        # within the same lumped state are discarded as soon as each block of the
+        # .trans files is parsed, and only the survivors are reduced.
+        # With the .trans files indexed (and not cached), even whole blocks of the
+        # .trans files without transitions between the surviving states are skipped.
+        # With the downward_only, also the transitions to the higher lumped states are
+        # discarded straight away.
+        trans_paths = sorted(self.trans_paths)
+        read_columns = self._get_read_trans_columns()
+        if self.persist_prelumps:
+            partials = self._file_partials(trans_paths, read_columns)
+            total_iter = len(trans_paths)
+        else:
+            partials = self._checkpointed_partials(trans_paths, read_columns)
+        for chunk_prelumps in tqdm(
+            partials, total=total_iter, desc=f"{self.formula} transitions"
         ):
-            # add columns mapping initial and final states onto the lumped states
-            chunk["lumped_i"] = chunk.i.transform(
-                lambda i: self.states_map_original_to_lumped.get(i, None)
+            self._lump_transitions_partial(chunk_prelumps)
+        self._finish_transitions_lumping()
+        TransCheckpoint.remove(self.output_dir)
+
+    def _checkpointed_partials(self, trans_paths, read_columns):
+        """Generate the partial prelumps of the chunks of the .trans files.
+
+        The partials of the chunks are added one after another, with the accumulator
+        checkpointed every so often (each partial is added by the caller before the
+        next one is requested), so an interrupted lumping can be resumed.
+
+        Parameters
+        ----------
+        trans_paths : list[Path]
+            The sorted .trans files.
+        read_columns : callable
+            See `_get_read_trans_columns`.
+
+        Yields
+        ------
+        tuple[numpy.ndarray] or None
+        """
+        checkpoint = self._load_checkpoint(trans_paths)
+        starts = {}
+        if checkpoint.resume is not None:
+            current_path = trans_paths[checkpoint.file_index]
+            print(
+                f"{self.formula}: resuming from the checkpoint in {current_path.name}"
             )
-            chunk["lumped_f"] = chunk.f.transform(
-                lambda f: self.states_map_original_to_lumped.get(f, None)
+            self._prelumps.load_store(
+                *(getattr(checkpoint, field) for field in TransCheckpoint.fields)
             )
-            pd.set_option('display.max_rows', 10000)
-
-            # get rid of all the transitions from or to a non-existing lumped state
-            chunk.dropna(axis="rows", inplace=True)
-            # get rid of all the transitions within the same lumped state
-            chunk = chunk.loc[chunk.lumped_i != chunk.lumped_f]
-            if not len(chunk):
-                # no transitions survived the filtering, go to the next iteration
+            # the reading of the file seeks straight past the chunks added already
+            starts[current_path] = checkpoint.resume
+        partials = iter_reduced_trans_files(
+            trans_paths=[trans_paths[checkpoint.file_index :]],
+            states_maps=[self.states_array_original_to_lumped],
+            nums_lumped=[len(self.lumped_states)],
+            chunk_size=self.trans_chunk_size,
+            num_workers=self.num_workers,
+            unmapped_state=self.unmapped_state,
+            read_columns=read_columns,
+            starts=starts,
+            downward_only=self.downward_only,
+            get_spans=self._get_trans_spans(),
+        )
+        last_saved = (0, time.monotonic())  # chunks added and time at the last save
+        for num_added, (trans_path, position, (chunk_prelumps,)) in enumerate(
+            partials, start=1
+        ):
+            yield chunk_prelumps
+            if position is None:
+                # nothing read from the file, the checkpoint still holds
                 continue
-            # now I can convert the lumped index values into int ("lumped_i" column
-            # will be lost during the first grouping, so not worrying about it.)
-            with pd.option_context("mode.chained_assignment", None):
-                # just so suppress the SettingWithCopyWarning
-                chunk.loc[:, "lumped_f"] = chunk.lumped_f.astype("int64")
-            # after iteration over the chunks, I need sums of einstein coefficients
-            # for transitions from the *original* initial index to the *lumped* final
-            # index
-            chunk_groupby = chunk.groupby(["i", "lumped_f"])
-            
-            current_prelumps_einstein_coeff_sums = (
-                chunk_groupby["A_if"].sum().astype("float64")
-            )
-            current_prelumps_sizes = chunk_groupby["A_if"].count().astype("float64")
+            checkpoint.file_index = trans_paths.index(trans_path)
+            checkpoint.resume = position
+            if self._checkpoint_due(num_added - last_saved[0], last_saved[1]):
+                self._save_checkpoint(checkpoint)
+                last_saved = (num_added, time.monotonic())
+
+    @property
+    def prelumps_dir(self):
+        """Get the directory of the persisted prelumps of the .trans files.
+
+        Returns
+        -------
+        Path
+        """
+        return self.output_dir / ".prelumps"
+
+    def _get_prelumps_keys(self, trans_paths):
+        """Get the keys of the persisted prelumps of the .trans files.
+
+        Parameters
+        ----------
+        trans_paths : list[Path]
+
+        Returns
+        -------
+        list[dict]
+            See `exomol2lida.file_prelumps.get_prelumps_key`.
+        """
+        common_key = get_checkpoint_key(
+            [],
+            chunk_size=self.trans_chunk_size,
+            trans_reader=self.trans_reader,
+            states_map=self.states_array_original_to_lumped,
+            num_lumped=len(self.lumped_states),
+            unmapped_state=self.unmapped_state,
+            downward_only=self.downward_only,
+            mixed_precision=self.mixed_precision,
+        )
+        del common_key["trans_files"]
+        return [get_prelumps_key(common_key, path) for path in trans_paths]
+
+    def _file_partials(self, trans_paths, read_columns):
+        """Generate the prelumps of each of the .trans files, persisting them.
 
-            if not len(prelumps_einstein_coeff_sums):
-                # seed both the rolling prelump series:
-                prelumps_einstein_coeff_sums = current_prelumps_einstein_coeff_sums
-                prelumps_sizes = current_prelumps_sizes
+        The prelumps of the .trans files persisted already (see
+        `exomol2lida.file_prelumps`) are loaded, only the remaining .trans files are
+        reduced (and their prelumps persisted). The chunks of each .trans file are
+        reduced into the prelumps of the file first, and the prelumps sums do not
+        depend on the order of the additions (see
+        `exomol2lida.accumulators.PrelumpsAccumulator`), so the lumping outputs are
+        the same as of lumping the chunks directly.
+
+        Parameters
+        ----------
+        trans_paths : list[Path]
+            The sorted .trans files.
+        read_columns : callable
+            See `_get_read_trans_columns`.
+
+        Yields
+        ------
+        tuple[numpy.ndarray] or None
+            The prelumps of each of the `trans_paths`, in order.
+        """
+        num_lumped = len(self.lumped_states)
+        keys = self._get_prelumps_keys(trans_paths)
+        missing = [
+            path
+            for path, key in zip(trans_paths, keys)
+            if not get_prelumps_path(self.prelumps_dir, key).is_file()
+        ]
+        if len(missing) < len(trans_paths):
+            print(
+                f"{self.formula}: loading the prelumps of "
+                f"{len(trans_paths) - len(missing)} .trans files"
+            )
+        reduced = groupby(
+            iter_reduced_trans_files(
+                trans_paths=[missing],
+                states_maps=[self.states_array_original_to_lumped],
+                nums_lumped=[num_lumped],
+                chunk_size=self.trans_chunk_size,
+                num_workers=self.num_workers,
+                unmapped_state=self.unmapped_state,
+                read_columns=read_columns,
+                downward_only=self.downward_only,
+                get_spans=self._get_trans_spans(),
+            ),
+            key=itemgetter(0),
+        )
+        next_reduced = next(reduced, None)
+        for trans_path, key in zip(trans_paths, keys):
+            if trans_path not in missing:
+                prelumps = load_file_prelumps(self.prelumps_dir, key)
             else:
-                # just add to the rolling sums
-                prelumps_einstein_coeff_sums = prelumps_einstein_coeff_sums.add(
-                    current_prelumps_einstein_coeff_sums, fill_value=0
-                )
-                prelumps_sizes = prelumps_sizes.add(
-                    current_prelumps_sizes, fill_value=0
-                )
+                accumulator = PrelumpsAccumulator(num_lumped=num_lumped)
+                # the files without any chunks do not come up at all
+                if next_reduced is not None and next_reduced[0] == trans_path:
+                    for _, _, (chunk_prelumps,) in next_reduced[1]:
+                        if chunk_prelumps is not None:
+                            accumulator.add_partial(chunk_prelumps)
+                    next_reduced = next(reduced, None)
+                prelumps = accumulator.get_store()
+                save_file_prelumps(self.prelumps_dir, key, prelumps)
+            yield prelumps if len(prelumps[0]) else None
+        remove_stale_prelumps(self.prelumps_dir, keys)
+
+    @property
+    def surviving_state_ids(self):
+        """Get the sorted ids of all the original states mapped onto lumped states.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return np.flatnonzero(
+            self.states_array_original_to_lumped != self.unmapped_state
+        )
+
+    def _start_transitions_lumping(self):
+        """Set up the accumulator of the transitions lumping, see
+        `lump_transitions`."""
+        # rolling sums of A_if and sizes for each transitions prelump
+        # (original_i -> lumped_f)
+        self._prelumps = PrelumpsAccumulator(num_lumped=len(self.lumped_states))
+        if self.downward_only:
+            # the early downward filtering relies on the lumped ids ordered by energy
+            assert self.lumped_states["E"].is_monotonic_increasing, "defense"
+
+        if self.molecule_input.trans_paths_skipped:
+            print(
+                f"{self.formula}: skipped "
+                f"{len(self.molecule_input.trans_paths_skipped)} .trans files "
+                f"({self.molecule_input.trans_bytes_skipped / 1e9:.2f} GB) with "
+                f"transitions only above the energy_max"
+            )
+
+    def _load_checkpoint(self, trans_paths):
+        """Get the checkpoint to continue the transitions lumping from.
+
+        Parameters
+        ----------
+        trans_paths : list[Path]
+            The sorted .trans files.
+
+        Returns
+        -------
+        TransCheckpoint
+            The matching checkpoint from the output directory if resuming, otherwise
+            (or if there is none) an empty checkpoint at the very beginning.
+        """
+        key = get_checkpoint_key(
+            trans_paths,
+            chunk_size=self.trans_chunk_size,
+            trans_reader=self.trans_reader,
+            states_map=self.states_array_original_to_lumped,
+            num_lumped=len(self.lumped_states),
+            unmapped_state=self.unmapped_state,
+            downward_only=self.downward_only,
+            mixed_precision=self.mixed_precision,
+            cached=self.input_cache is not None,
+        )
+        checkpoint = None
+        if self.resume:
+            checkpoint = TransCheckpoint.load(self.output_dir, key)
+        if checkpoint is None:
+            empty = np.empty(0)
+            return TransCheckpoint(key, 0, None, empty, empty, empty, empty)
+        return checkpoint
+
+    def _checkpoint_due(self, num_chunks, last_time):
+        """Check if a checkpoint is due, `num_chunks` added since the last one."""
+        if self.checkpoint_chunks is not None and num_chunks >= self.checkpoint_chunks:
+            return True
+        return (
+            self.checkpoint_interval is not None
+            and time.monotonic() - last_time >= self.checkpoint_interval
+        )
+
+    def _save_checkpoint(self, checkpoint):
+        """Save the accumulated prelumps with the position of the last chunk added.
+
+        Parameters
+        ----------
+        checkpoint : TransCheckpoint
+            With the position updated already.
+        """
+        for field, array in zip(TransCheckpoint.fields, self._prelumps.get_store()):
+            setattr(checkpoint, field, array)
+        checkpoint.save(self.output_dir)
+
+    def _lump_transitions_partial(self, chunk_prelumps):
+        """Merge the prelumps reduced from a chunk of the .trans files.
+
+        Parameters
+        ----------
+        chunk_prelumps : tuple[numpy.ndarray] or None
+            See `exomol2lida.accumulators.reduce_prelumps`.
+        """
+        if chunk_prelumps is None:
+            # no transitions survived the filtering
+            return
+        self._prelumps.add_partial(chunk_prelumps)
+
+    def _finish_transitions_lumping(self):
+        """Build the lumped transitions and the lifetimes from the accumulator."""
+        prelumps = self._prelumps
+        self._prelumps = None
         # dataframe with partial lifetimes of individual pre-lumps
         # (between i_orig and f_lumped)
+        prelumps_i, prelumps_f, prelumps_einstein_coeff_sums, _ = (
+            prelumps.get_prelumps()
+        )
         prelumped_transitions = pd.DataFrame(
             {
+                "i": prelumps_i,
+                "lumped_f": prelumps_f,
                 "tau_i_orig_f_lumped": 1 / prelumps_einstein_coeff_sums,
-                "prelump_size": prelumps_sizes,
             }
         )
-        #ALEC reset index of states and transitions so able to match them
-        chunk1.reset_index(inplace=True)
-        prelumped_transitions.reset_index(inplace=True)
-        #ALEC match transitions with Boltzmann-weighted values 
-        prelumped_transitions_w_states = prelumped_transitions.merge(chunk1, left_on='i', right_on='index', how='left')[['i','lumped_f','tau_i_orig_f_lumped','prelump_size','en_x_w1']]
-        prelumped_transitions_w_states['tau_i_orig_f_lumped_w'] = prelumped_transitions_w_states.tau_i_orig_f_lumped * prelumped_transitions_w_states.en_x_w1
-        prelumped_transitions = prelumped_transitions_w_states
-        
+        # match transitions with Boltzmann-weighted values of the initial states
+        # (a column for each of the temperatures)
+        temps = range(len(self.temperatures))
+        weights_cols = [f"en_x_w1_{n}" for n in temps]
+        weighted_cols = [f"tau_i_orig_f_lumped_w_{n}" for n in temps]
+        weights = self.states_boltzmann_weights[prelumped_transitions.i.to_numpy()]
+        prelumped_transitions[weights_cols] = weights
+        prelumped_transitions[weighted_cols] = (
+            prelumped_transitions.tau_i_orig_f_lumped.to_numpy()[:, np.newaxis]
+            * weights
+        )
+
         # re-add the i_lumped and combine the pre-lumps into the final composite
         # transitions
-        prelumped_transitions["lumped_i"] = prelumped_transitions.i.transform(
-            lambda i: self.states_map_original_to_lumped[i]
+        prelumped_transitions["lumped_i"] = self.map_original_to_lumped(
+            prelumped_transitions.i.to_numpy()
         )
         prelumped_transitions_groupby = prelumped_transitions.groupby(
             ["lumped_i", "lumped_f"]
         )
+        weighted_sums = prelumped_transitions_groupby[weighted_cols].sum()
+        weights_sums = prelumped_transitions_groupby[weights_cols].sum()
+        tau_if = weighted_sums.to_numpy() / weights_sums.to_numpy()
+        lumped_i = weighted_sums.index.get_level_values(0).to_numpy(dtype="int64")
+        lumped_f = weighted_sums.index.get_level_values(1).to_numpy(dtype="int64")
+        del prelumped_transitions, prelumped_transitions_groupby, weighted_sums
+
+        # the lumped state ids are dense (the positions in the lumped states), so the
+        # lumped states attributes are gathered by the ids instead of merged
+        assert self.lumped_states.index.equals(
+            pd.RangeIndex(len(self.lumped_states))
+        ), "defense"
+        energies = self.lumped_states["E"].to_numpy()
+        # calculate nu (energy of final lumped state minus energy of initial
+        # lumped state) and remove nu values that are positive
+        downward = energies[lumped_f] - energies[lumped_i] < 0.0
+        lumped_i, lumped_f, tau_if = (
+            lumped_i[downward],
+            lumped_f[downward],
+            tau_if[downward],
+        )
+
+        # the lifetimes of the lumped states are populated for each temperature
+        lumped_states_by_temp = [self.lumped_states] + [
+            self.lumped_states.copy() for _ in temps[1:]
+        ]
+        lumped_transitions_by_temp = [
+            self._finish_temperature(
+                lumped_i,
+                lumped_f,
+                tau_if[:, n],
+                lumped_states_by_temp[n],
+                self.num_channels,
+            )
+            for n in temps
+        ]
+        self.lumped_transitions = lumped_transitions_by_temp[0]
+        self.lumped_states_by_temp = dict(
+            zip(self.temperatures, lumped_states_by_temp)
+        )
+        self.lumped_transitions_by_temp = dict(
+            zip(self.temperatures, lumped_transitions_by_temp)
+        )
 
-        # create the lumped_transitions dataframe
-        tau_if = prelumped_transitions_groupby["tau_i_orig_f_lumped_w"].sum() / prelumped_transitions_groupby["en_x_w1"].sum()
-        lump_size = prelumped_transitions_groupby["prelump_size"].sum()
-        lumped_transitions = pd.DataFrame()
-        lumped_transitions["tau_if"] = tau_if
-        lumped_transitions["lump_size"] = lump_size.astype("int64")
-        lumped_transitions.reset_index(inplace=True)
-        lumped_transitions.columns = ["i", "f", "tau_if", "lump_size"]
-
-        #ALEC creating lumped_states_match to match energies with lumped_transitions
-        lumped_states_match = self.lumped_states[["E"]]
-        lumped_states_match.reset_index(inplace=True)
-        #ALEC matching energies to the initial and final states of the lumped transitions so that we can filter on nu, i.e. keep negative nu values only
-        lumped_transitions_nu = lumped_transitions.merge(lumped_states_match, left_on='i', right_on='index', how='left')[["i", "f", "tau_if", "E"]]
-        lumped_transitions_nu = lumped_transitions_nu.rename(columns={"E":"E_i"})   
-        lumped_transitions_nu = lumped_transitions_nu.merge(lumped_states_match, left_on='f', right_on='index', how='left')[["i", "f", "tau_if", "E_i", "E"]]
-        lumped_transitions_nu = lumped_transitions_nu.rename(columns={"E":"E_f"})
-        #ALEC calculate nu (energy of final lumped state minus energy of initial lumped state)
-        lumped_transitions_nu.loc[:, "nu"] = lumped_transitions_nu["E_f"] - lumped_transitions_nu["E_i"]
-        #ALEC remove nu values that are positive
-        lumped_transitions_nu = lumped_transitions_nu[lumped_transitions_nu["nu"] < 0.0]
-        lumped_transitions_nu.drop(columns=["E_i", "E_f", "nu"], inplace=True)
-        #ALEC set lumped_transitions to work with rest of code
-        lumped_transitions = lumped_transitions_nu
-
-        # populate the total lifetimes for the composite states
-        transitions_copy = lumped_transitions.copy(deep=True)
-        transitions_copy.loc[:, "tau_if_inverse"] = 1 / transitions_copy["tau_if"]
-        tau_i_inverse = transitions_copy.groupby("i")["tau_if_inverse"].sum()
-        assert set(tau_i_inverse.index).issubset(self.lumped_states.index), "defense"
-        self.lumped_states.loc[tau_i_inverse.index, "tau"] = 1 / tau_i_inverse
-
-        #ALEC dataframe with only five partial lifetimes per vibrational state 
-        lumped_transitions_five = lumped_transitions.sort_values(["i","tau_if"],ascending=[True,False]).groupby("i").tail(5)
-        #ALEC compute state lifetimes based on only five partial lifetimes
-        transitions_copy_five = lumped_transitions_five.copy(deep=True)
-        transitions_copy_five.loc[:, "tau_if_inverse"] = 1 / transitions_copy_five["tau_if"]
-        tau_i_inverse_five = transitions_copy_five.groupby("i")["tau_if_inverse"].sum()
-        assert set(tau_i_inverse_five.index).issubset(self.lumped_states.index), "defense"
-        self.lumped_states.loc[tau_i_inverse_five.index, "tau_five"] = 1 / tau_i_inverse_five
-
-        #ALEC determine renormalization constants
-        self.lumped_states.loc[:, "renorm"] = self.lumped_states["tau"] / self.lumped_states["tau_five"]
-
-        #ALEC match renormalization constants with the dataframe containing only five partial lifetimes
-        lumped_states_match_five = self.lumped_states[["renorm"]]
-        lumped_states_match_five.reset_index(inplace=True)
-        lumped_transitions_renorm = lumped_transitions_five.merge(lumped_states_match_five, left_on='i', right_on='index', how='left')[["i", "f", "tau_if", "renorm"]]
-
-        #ALEC compute renormalized partial lifetimes and replace original tau_if values with renormalized ones
-        lumped_transitions_renorm.loc[:,"tau_if_renorm"] = lumped_transitions_renorm["tau_if"] * lumped_transitions_renorm["renorm"]
-        lumped_transitions_renorm["tau_if"]=lumped_transitions_renorm["tau_if_renorm"]
-        lumped_transitions_renorm.drop(columns=["renorm", "tau_if_renorm"], inplace=True)
-        #ALEC set self.lumped_transitions so that it works smoothly with Martin's implementation
-        self.lumped_transitions = lumped_transitions_renorm
-
-    def _process_state_lump(self, df):
-        """A helper function for processing to-be-lumped states.
-
-        This method is applied on a DataFrame of a group (lump) of states which all
-        share the same values of the resolved quanta.
-
-        Takes a dataframe filled with original states within one to-be composited state
-        and does all the processing (like averaging energy, recording the J_ref for
-        energy - lowest J, etc.). As the lumps are coming in states chunks, all
-        needs to be done incrementally. This method is designed only as a helper method
-        and only to be supplied to the `apply` method on a *grouped* pandas.DataFrame.
+    @staticmethod
+    def _finish_temperature(lumped_i, lumped_f, tau_if, lumped_states, num_channels):
+        """Build the lumped transitions and the lifetimes at a single temperature.
 
         Parameters
         ----------
-        df : pandas.DataFrame
+        lumped_i, lumped_f : numpy.ndarray
+            Initial and final lumped state ids of the (downward) lumped transitions,
+            sorted by the initial and final ids.
+        tau_if : numpy.ndarray
+            Boltzmann-weighted partial lifetimes of the lumped transitions.
+        lumped_states : pandas.DataFrame
+            Gets its "tau", "tau_five" and "renorm" columns populated.
+        num_channels : int
+            Number of the fastest channels kept for each lumped state (the
+            "tau_five" column holds the lifetimes from these channels only).
 
         Returns
         -------
-        pandas.Series
+        pandas.DataFrame
+            The lumped transitions with the renormalized partial lifetimes.
         """
-        # first record the lump into the states_map dict:
-        if len(self.resolved_quanta) == 1:
-            lumped_state = df.iloc[0].loc[self.resolved_quanta[0]]  # str
-        else:
-            lumped_state = tuple(df.iloc[0].loc[self.resolved_quanta])  # tuple[str]
-        # lumped_state tuple will also be the new MultiIndex value after grouping
-        if lumped_state not in self.states_map_lumped_to_original:
-            self.states_map_lumped_to_original[lumped_state] = set()
-        self.states_map_lumped_to_original[lumped_state].update(df.index)
-        # now the original lifetimes, if relevant:
-        if self.include_original_lifetimes and "tau" in self.states_header:
-            if lumped_state not in self.states_map_lumped_to_tau:
-                self.states_map_lumped_to_tau[lumped_state] = []
-            self.states_map_lumped_to_tau[lumped_state].extend(df.tau)
-        # now calculate the lumped state attributes:
-        #ALEC this block is more-or-less redundant, only sum_w is needed for energy
-        j_min = df.J.min()
-        sub_df = df.loc[df.J == j_min]
-        sum_w = sub_df.E.mean()
-        sum_en_x_w = df.g_tot.sum()
-        return pd.Series(
-            [j_min, sum_w, sum_en_x_w],
-            index=["J_en", "sum_w", "sum_en_x_w"],
-            dtype="float64",
+        # populate the total lifetimes for the composite states and keep only their
+        # fastest channels, with the partial lifetimes renormalized, so the kept
+        # channels add up to the total lifetimes
+        states, states_tau, states_tau_kept, kept, tau_if_renorm = (
+            renormalize_channels(lumped_i, tau_if, num_channels)
+        )
+        # the lifetimes are scattered into arrays indexed by the lumped state ids
+        tau = lumped_states["tau"].to_numpy(dtype="float64", copy=True)
+        tau[states] = states_tau
+        tau_five = np.full(len(lumped_states), np.nan)
+        tau_five[states] = states_tau_kept
+        lumped_states["tau"] = tau
+        lumped_states["tau_five"] = tau_five
+        # determine renormalization constants
+        lumped_states["renorm"] = tau / tau_five
+        return pd.DataFrame(
+            {"i": lumped_i[kept], "f": lumped_f[kept], "tau_if": tau_if_renorm}
         )
 
     @staticmethod
@@ -496,6 +1217,33 @@ class DatasetProcessor:
             stream.write("data = \\\n")
             pprint(data, width=88, compact=True, stream=stream)
 
+    def _prepare_output_dir(self):
+        """Remove the manifest (and all the outputs if forcing) before processing.
+
+        The checkpoint of the transitions lumping is only kept if resuming, the states
+        artifact and the persisted prelumps are always kept (they are only ever loaded
+        if up to date).
+        """
+        manifest.remove_manifest(self.output_dir)
+        if not self.force or not self.output_dir.is_dir():
+            return
+        for path in self.output_dir.iterdir():
+            if self.resume and path.name == TransCheckpoint.file_name:
+                continue
+            if path in (self.states_artifact_dir, self.prelumps_dir):
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+
+    def _log_manifest(self):
+        """Log the fingerprint of the inputs the outputs have been produced from.
+
+        Only logged once all the outputs are complete, see `exomol2lida.manifest`.
+        """
+        manifest.save_manifest(self.output_dir, self.input_fingerprint)
+
     def _log_dataset_metadata(self):
         """Log all the relevant metadata for the current processing session.
 
@@ -557,16 +1305,24 @@ class DatasetProcessor:
 
         If the `self.lump_states` method has not yet been run, this method will
         not log anything silently.
-        The data are logged into the output folder in the .csv format.
+        The data are logged into the output folder in the .csv format. With several
+        `temperatures`, also the data at each of them are logged into the
+        states_data_{T}K.csv files.
         """
         if self.lumped_states is None:
             return
         self.output_dir.mkdir(parents=True, exist_ok=True)
         data_cols = [col for col in ["tau", "E"] if col in self.lumped_states.columns]
-        with open(self.output_dir / "states_data.csv", "w") as fp:
-            self.lumped_states[data_cols].to_csv(
-                fp, header=True, index=True, index_label="i"
-            )
+        frames = self.lumped_states_by_temp or {
+            temp: self.lumped_states for temp in self.temperatures
+        }
+        for file_name, lumped_states in self._temperature_outputs(
+            "states_data", self.lumped_states, frames
+        ):
+            with open(self.output_dir / file_name, "w") as fp:
+                lumped_states[data_cols].to_csv(
+                    fp, header=True, index=True, index_label="i"
+                )
 
     def _log_transitions_data(self):
         """Log all the relevant lumped transitions data for the current processing
@@ -577,13 +1333,40 @@ class DatasetProcessor:
         The data are logged into the output folder in the .csv format. The output file
         has the following header: ['i', 'f', 'tau_if'], where ``'i'`` and ``'f'``
         columns values correspond to the index column of the logged states .csv files.
+        With several `temperatures`, also the data at each of them are logged into the
+        transitions_data_{T}K.csv files.
         """
         if self.lumped_transitions is None:
             return
         self.output_dir.mkdir(parents=True, exist_ok=True)
         cols = ["i", "f", "tau_if"]
-        with open(self.output_dir / "transitions_data.csv", "w") as fp:
-            self.lumped_transitions[cols].to_csv(fp, header=True, index=False)
+        for file_name, lumped_transitions in self._temperature_outputs(
+            "transitions_data", self.lumped_transitions, self.lumped_transitions_by_temp
+        ):
+            with open(self.output_dir / file_name, "w") as fp:
+                lumped_transitions[cols].to_csv(fp, header=True, index=False)
+
+    def _temperature_outputs(self, name, frame, frames_by_temp):
+        """Get the file names and frames of an output at all the temperatures.
+
+        Parameters
+        ----------
+        name : str
+        frame : pandas.DataFrame
+            The output at the first of the `temperatures`.
+        frames_by_temp : dict[float, pandas.DataFrame]
+
+        Returns
+        -------
+        list[tuple[str, pandas.DataFrame]]
+        """
+        outputs = [(f"{name}.csv", frame)]
+        if len(self.temperatures) > 1:
+            outputs.extend(
+                (f"{name}_{temp:g}K.csv", frames_by_temp[temp])
+                for temp in self.temperatures
+            )
+        return outputs
 
     def process(self, include_original_lifetimes=False):
         """Lump states and transitions and log all the outputs into the relevant
@@ -596,8 +1379,12 @@ class DatasetProcessor:
             of lifetimes of the original states belonging to each composite state.
         """
         self.include_original_lifetimes = include_original_lifetimes
-        # lump and log the states:
-        self.lump_states()
+        self._prepare_output_dir()
+        # lump (or load the persisted results) and log the states:
+        if not (self.persist_states and self.load_lumped_states()):
+            self.lump_states()
+            if self.persist_states:
+                self.save_lumped_states()
         self._log_dataset_metadata()
         self._log_states_metadata()
         self._log_states_data()
@@ -607,6 +1394,7 @@ class DatasetProcessor:
         self._log_dataset_metadata()  # updated timestamp
         self._log_states_data()
         self._log_transitions_data()
+        self._log_manifest()
 
 
 def process_molecule(
@@ -614,6 +1402,9 @@ def process_molecule(
     include_original_lifetimes=False,
     postprocess=False,
     raise_exceptions=True,
+    resume=False,
+    incremental=False,
+    force=False,
 ):
     """A top-level function for processing the exomol dataset belonging to a single
     molecule.
@@ -637,6 +1428,15 @@ def process_molecule(
         If False, any exceptions raised by the `DataProcessor` constructor or its
         `process` method will be caught and printed to stdout, instead of halting the
         program.
+    resume : bool, default=False
+        If True, an interrupted processing of the molecule is resumed from its last
+        checkpoint (see `DatasetProcessor`).
+    incremental : bool, default=False
+        If True, the molecule is only (re)processed if its outputs have not been
+        produced from its current inputs (see `exomol2lida.manifest`), overwriting
+        any outdated outputs.
+    force : bool, default=False
+        If True, any existing outputs of the molecule are overwritten.
 
     Raises
     ------
@@ -644,17 +1444,29 @@ def process_molecule(
     DefParseError
     FileExistsError
     """
-    if raise_exceptions:
-        mol_processor = DatasetProcessor(mol_formula)
+
+    def process():
+        mol_processor = DatasetProcessor(
+            mol_formula, resume=resume, force=(force or incremental)
+        )
+        if incremental and mol_processor.is_up_to_date:
+            print(f"{mol_formula}: UP TO DATE")
+            return False
         mol_processor.process(include_original_lifetimes=include_original_lifetimes)
+        return True
+
+    if raise_exceptions:
+        processed = process()
     else:
+        processed = True
         try:
-            mol_processor = DatasetProcessor(mol_formula)
-            mol_processor.process(include_original_lifetimes=include_original_lifetimes)
+            processed = process()
         except (MoleculeInputError, DefParseError) as e:
             print(f"{mol_formula}: PROCESSING ABORTED: {type(e).__name__}: {e}")
         except FileExistsError as e:
             print(f"{mol_formula}: PROCESSED ALREADY: {type(e).__name__}: {e}")
+    if not processed:
+        return
     if postprocess:
         postprocess_molecule(mol_formula, raise_exceptions=raise_exceptions)
     else:
@@ -0,0 +1,917 @@
+"""
+Module with alternative readers of the ExoMol .states and .trans files.
+
+The `states_chunks` and `trans_chunks` functions are drop-in replacements for their
+counterparts in the `exomole.read_data` module, yielding the very same chunks, but the
+*.bz2* files are decompressed by blocks in a pool of threads (see
+`ParallelBZ2Reader`), rather than by a single-threaded bz2 stream.
+
+The bz2 format is block-structured: each compressed block starts with a 48-bit magic
+number and carries its own CRC, and the blocks are not byte-aligned. The block
+boundaries are therefore located by scanning the compressed file for the magic
+numbers at all eight bit offsets, and each block is re-wrapped into a stand-alone
+single-block bz2 stream, which can be decompressed independently of all the others.
+The magic numbers might also appear in the compressed data by pure chance: a false
+block magic is told by its block failing to decompress (the block is then joined with
+the following one), a false end-of-stream magic by not being followed by the end of
+the file or by the next stream.
+
+The `fixed_width_trans_chunks` function is an alternative .trans reader, parsing the
+raw bytes of the fixed-width .trans rows with NumPy slicing into compact columns,
+without ever parsing the (unused) "v_if" column. The `read_trans_chunks` function
+dispatches between all the .trans readers.
+"""
+
+import bz2
+import io
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from exomole import read_data as exomole_read_data
+from exomole.exceptions import StatesParseError, TransParseError
+from exomole.utils import get_num_columns
+
+BLOCK_MAGIC = 0x314159265359
+EOS_MAGIC = 0x177245385090
+# upper bound of the size in bytes of a single compressed bz2 block
+MAX_BLOCK_SIZE = 1 << 21
+
+# all the available .trans readers, see `read_trans_chunks`
+TRANS_READERS = ("exomole", "numpy")
+# size of the raw byte blocks parsed at once by the `fixed_width_trans_chunks`
+TRANS_BLOCK_SIZE = 1 << 26
+
+
+def _find_bit_pattern(buffer, pattern, num_bits=48, start=0, end=None):
+    """Find all the bit offsets of the `pattern` in the `buffer`, at any bit alignment.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+    pattern : int
+    num_bits : int, default=48
+    start, end : int, optional
+        Byte range of the `buffer` to search in (all of it by default).
+
+    Returns
+    -------
+    list[int]
+        Bit offsets (counted from the most significant bit of the first byte).
+    """
+    end = len(buffer) if end is None else end
+    offsets = []
+    for shift in range(8):
+        num_bytes = (shift + num_bits + 7) // 8
+        trailing = 8 * num_bytes - num_bits - shift
+        value = (pattern << trailing).to_bytes(num_bytes, "big")
+        mask = (((1 << num_bits) - 1) << trailing).to_bytes(num_bytes, "big")
+        # search for the fully determined bytes, check the partial ones afterwards
+        full = [n for n in range(num_bytes) if mask[n] == 0xFF]
+        needle = value[full[0] : full[-1] + 1]
+        partial = [n for n in range(num_bytes) if mask[n] != 0xFF]
+        pos = buffer.find(needle, start + full[0], end)
+        while pos != -1:
+            match = pos - full[0]
+            if match >= start and match + num_bytes <= end:
+                if all(buffer[match + n] & mask[n] == value[n] for n in partial):
+                    offsets.append(8 * match + shift)
+            pos = buffer.find(needle, pos + 1, end)
+    return sorted(offsets)
+
+
+def _is_stream_end(buffer, offset):
+    """Check if the end-of-stream magic at the bit `offset` really ends a stream.
+
+    The end-of-stream magic is followed by the stream CRC and the padding to a whole
+    byte, and then by the end of the file or the header of the next stream. The
+    magic might also appear in the compressed data by pure chance.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+    offset : int
+
+    Returns
+    -------
+    bool
+    """
+    byte_end = -(-(offset + 80) // 8)
+    if byte_end >= len(buffer):
+        return byte_end == len(buffer)
+    header = bytes(buffer[byte_end : byte_end + 4])
+    return len(header) == 4 and header[:3] == b"BZh" and header[3] in b"123456789"
+
+
+def find_bz2_blocks(buffer, start=0, end=None):
+    """Find the bit ranges of all the compressed blocks in a bz2 file.
+
+    Each block spans from its block magic to the next block magic or the
+    end-of-stream magic. Concatenated (multi-stream) files are supported. Only the
+    end-of-stream magics followed by the end of the file or by the next stream (see
+    `_is_stream_end`) are taken as block boundaries.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+        The content of the whole bz2 file.
+    start, end : int, optional
+        Byte range of the `buffer` to find the blocks starting in (all of it by
+        default). Only up to `MAX_BLOCK_SIZE` bytes past the `end` are searched for
+        the end of the last block.
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        (start, end) bit offsets of all the blocks, in order.
+    """
+    search_end = len(buffer) if end is None else min(end + MAX_BLOCK_SIZE, len(buffer))
+    block_starts = _find_bit_pattern(buffer, BLOCK_MAGIC, start=start, end=search_end)
+    stream_ends = [
+        offset
+        for offset in _find_bit_pattern(buffer, EOS_MAGIC, start=start, end=search_end)
+        if _is_stream_end(buffer, offset)
+    ]
+    boundaries = sorted(set(block_starts).union(stream_ends))
+    block_starts = set(block_starts)
+    blocks = []
+    for block_start, block_end in zip(boundaries, boundaries[1:]):
+        if block_start in block_starts and (end is None or block_start < 8 * end):
+            blocks.append((block_start, block_end))
+    if search_end == len(buffer) and boundaries and boundaries[-1] in block_starts:
+        raise ValueError("Truncated bz2 file: the last block is not terminated.")
+    return blocks
+
+
+def _block_as_stream(buffer, start, end):
+    """Re-wrap a single compressed block into a stand-alone bz2 stream.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+    start, end : int
+        Bit offsets of the block.
+
+    Returns
+    -------
+    bytes
+    """
+    byte_start, byte_end = start // 8, (end + 7) // 8
+    num_bits = end - start
+    bits = int.from_bytes(buffer[byte_start:byte_end], "big") >> (8 * byte_end - end)
+    bits &= (1 << num_bits) - 1
+    # the block CRC follows right after the 48-bit block magic; with a single block,
+    # the combined stream CRC equals the block CRC
+    block_crc = (bits >> (num_bits - 80)) & 0xFFFFFFFF
+    bits = (((bits << 48) | EOS_MAGIC) << 32) | block_crc
+    num_bits += 80
+    padding = -num_bits % 8
+    return b"BZh9" + (bits << padding).to_bytes((num_bits + padding) // 8, "big")
+
+
+def _decompress_block(buffer, start, end):
+    try:
+        return bz2.decompress(_block_as_stream(buffer, start, end))
+    except (OSError, ValueError):
+        # the magic number might appear in the compressed data by pure chance
+        return None
+
+
+def ordered_map(func, items, num_threads):
+    """Map the `func` over the `items` in a pool of threads, yielding the results in
+    order, with only a bounded number of results held in memory at any time.
+
+    Parameters
+    ----------
+    func : callable
+    items : list
+    num_threads : int
+
+    Yields
+    ------
+    object
+    """
+    if num_threads <= 1:
+        yield from map(func, items)
+        return
+    window = 2 * num_threads
+    with ThreadPoolExecutor(num_threads) as executor:
+        futures = [executor.submit(func, item) for item in items[:window]]
+        for n in range(len(items)):
+            result = futures[n].result()
+            futures[n] = None
+            if n + window < len(items):
+                futures.append(executor.submit(func, items[n + window]))
+            yield result
+
+
+def _first_unit(buffer, blocks, name):
+    """Find the first of the `blocks` starting an independently decompressible unit,
+    skipping the block magics which appeared in the compressed data by pure chance
+    (within a block starting before all the `blocks`)."""
+    for n, (start, _) in enumerate(blocks):
+        for _, end in blocks[n:]:
+            if end - start > 8 * MAX_BLOCK_SIZE:
+                break
+            if _decompress_block(buffer, start, end) is not None:
+                return n
+    if blocks:
+        raise OSError(f"Invalid bz2 data in {name}")
+    return 0
+
+
+def iter_bz2_units(buffer, num_threads, name="bz2 file", start=0, stop=None):
+    """Decompress all the blocks of a bz2 file in a pool of threads.
+
+    Whenever a block fails to decompress (as its magic number appeared in the
+    compressed data by pure chance), it is joined with the following block. The
+    yielded units are therefore independently decompressible.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+        The content of the whole bz2 file.
+    num_threads : int
+    name : str, optional
+        Name of the file for the error message.
+    start : int, default=0
+        Bit offset to start from, the units are decompressed from the first one
+        starting at or after it.
+    stop : int, optional
+        Bit offset to stop at, the units are decompressed up to (and including) the
+        first one starting at or after it. Only the part of the file up to a few
+        blocks past the `stop` is searched for the blocks.
+
+    Yields
+    ------
+    tuple[int, int, bytes]
+        The (start, end) bit offsets of each unit and its decompressed data.
+    """
+    # the unit across the stop and the one following it end within two blocks
+    end = None if stop is None else -(-stop // 8) + 2 * MAX_BLOCK_SIZE
+    blocks = [
+        block for block in find_bz2_blocks(buffer, start // 8, end) if block[0] >= start
+    ]
+    if start:
+        # the start does not need to be a block boundary
+        blocks = blocks[_first_unit(buffer, blocks, name) :]
+    decompressed = ordered_map(
+        lambda block: _decompress_block(buffer, *block), blocks, num_threads
+    )
+    n = 0
+    for data in decompressed:
+        unit_start, unit_end = blocks[n]
+        while data is None:
+            # false block boundary, join the block with the following one
+            n += 1
+            if n == len(blocks):
+                raise OSError(f"Invalid bz2 data in {name}")
+            next(decompressed)
+            unit_end = blocks[n][1]
+            data = _decompress_block(buffer, unit_start, unit_end)
+        n += 1
+        yield unit_start, unit_end, data
+        if stop is not None and unit_start >= stop:
+            return
+
+
+class ParallelBZ2Reader(io.RawIOBase):
+    """Read-only binary file object decompressing a bz2 file by blocks in threads.
+
+    The blocks are decompressed in a pool of threads (the `bz2` module releases the
+    GIL), and served in order, only a bounded number of blocks is held in memory at
+    any time.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path to the *.bz2* file.
+    num_threads : int
+    """
+
+    def __init__(self, path, num_threads):
+        super().__init__()
+        self.path = Path(path)
+        self.num_threads = num_threads
+        self._file = open(self.path, "rb")
+        if self.path.stat().st_size:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b""
+        self._blocks = self._iter_blocks()
+        self._current = memoryview(b"")
+
+    def _iter_blocks(self):
+        units = iter_bz2_units(self._buffer, self.num_threads, self.path.name)
+        for _, _, data in units:
+            yield data
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not len(self._current):
+            try:
+                self._current = memoryview(next(self._blocks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._blocks.close()
+            self._current = memoryview(b"")
+            if isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+            self._file.close()
+        super().close()
+
+
+def _read_csv_chunks(file_path, chunk_size, num_threads, **kwargs):
+    """Generate `pandas.DataFrame` chunks of an ExoMol data file, the same way as
+    the `exomole.utils.load_dataframe_chunks` does.
+    """
+    read_csv_kwargs = dict(
+        sep=r"\s+",
+        header=None,
+        chunksize=chunk_size,
+        iterator=True,
+        low_memory=False,
+        **kwargs,
+    )
+    if str(file_path).endswith("bz2") and num_threads > 1:
+        with io.BufferedReader(
+            ParallelBZ2Reader(file_path, num_threads), buffer_size=1 << 20
+        ) as stream:
+            yield from pd.read_csv(stream, **read_csv_kwargs)
+    else:
+        yield from pd.read_csv(file_path, **read_csv_kwargs)
+
+
+def states_chunks(states_path, columns, chunk_size=1_000_000, num_threads=4):
+    """Get a generator of chunks of the dataset .states file.
+
+    Drop-in replacement for `exomole.read_data.states_chunks`, decompressing the
+    *.bz2* file in `num_threads` threads.
+
+    Parameters
+    ----------
+    states_path : str or Path
+    columns : list[str]
+        Column names for all the columns in the .states file including the (first)
+        index column named "i".
+    chunk_size : int, default=1_000_000
+    num_threads : int, default=4
+
+    Yields
+    ------
+    states_chunk : pandas.DataFrame
+        Indexed by the (int64) state ids, with all the columns of str dtype.
+
+    Raises
+    ------
+    StatesParseError
+        If ``columns[0]`` is not "i" or if ``len(columns)`` is inconsistent with the
+        number of columns in the .states file.
+    """
+    _check_states_columns(states_path, columns)
+    for chunk in _read_csv_chunks(
+        states_path,
+        chunk_size,
+        num_threads,
+        index_col=0,
+        names=columns[1:],
+        dtype=str,
+    ):
+        chunk.index = chunk.index.astype("int64")
+        yield chunk
+
+
+def _check_states_columns(states_path, columns):
+    if columns[0] != "i":
+        raise StatesParseError("The first column of any .states file needs to be 'i'.")
+    num_cols = get_num_columns(states_path)
+    if num_cols != len(columns):
+        raise StatesParseError(
+            f"{Path(states_path).name} has {num_cols} columns, but column names "
+            f"{columns} were passed."
+        )
+
+
+def _categories_to_numbers(values, categories, dtype, fill_value):
+    """Convert a categorical into a numerical array by converting only its
+    categories, with the `fill_value` for the missing values."""
+    numbers = np.append(np.asarray(categories).astype(dtype), fill_value).astype(dtype)
+    # the missing values have the code of -1, pointing at the fill value
+    return numbers[values.cat.codes.to_numpy()]
+
+
+def typed_states_chunks(
+    states_path,
+    columns,
+    usecols,
+    int_columns=(),
+    numeric_columns=(),
+    chunk_size=1_000_000,
+    num_threads=1,
+    missing_values=("*",),
+    predicate=None,
+):
+    """Get a generator of chunks of the dataset .states file, with typed columns.
+
+    Only the `usecols` are parsed: "E", "g_tot" and "J" as float64 (correctly
+    rounded, the same as casting from str), the `int_columns` as int32, the
+    `numeric_columns` as float64 (with NaN wherever not numeric) and all the other
+    columns as categoricals of str. The integer and numeric columns are parsed as
+    categoricals first and only their categories are converted.
+    If the `predicate` is passed, it is evaluated right after each chunk has been
+    tokenized, and only the accepted rows are typed and yielded.
+
+    Parameters
+    ----------
+    states_path : str or Path
+    columns : list[str]
+        Column names for all the columns in the .states file including the (first)
+        index column named "i".
+    usecols : list[str]
+        Names of the columns to parse (the "i" column is always parsed as index).
+    int_columns : iterable of str
+        Columns with integer values (such as the vibrational quanta). The
+        `missing_values` in these columns are parsed as -1.
+    numeric_columns : iterable of str
+        Columns with float values, possibly with some non-numeric placeholders.
+    chunk_size : int, default=1_000_000
+    num_threads : int, default=1
+        Number of threads decompressing the *.bz2* file by blocks.
+    missing_values : iterable of str, default=("*",)
+    predicate : callable, optional
+        Callable taking the tokenized chunk (with all the `usecols` other than "E",
+        "g_tot" and "J" as categoricals of str) and returning the boolean mask of the
+        rows to keep, such as the `exomol2lida.read_inputs.StatesFilter`.
+
+    Yields
+    ------
+    states_chunk : pandas.DataFrame
+        Indexed by the (int64) state ids, with the `usecols` in the .states file
+        order.
+
+    Raises
+    ------
+    StatesParseError
+        If ``columns[0]`` is not "i", if ``len(columns)`` is inconsistent with the
+        number of columns in the .states file, or if any of the `int_columns` values
+        is not an integer.
+    """
+    _check_states_columns(states_path, columns)
+    float_columns = {"E", "g_tot", "J"}
+    dtype = {
+        col: "float64" if col in float_columns else "category"
+        for col in usecols
+        if col != "i"
+    }
+    for chunk in _read_csv_chunks(
+        states_path,
+        chunk_size,
+        num_threads,
+        names=columns,
+        usecols=["i"] + [col for col in usecols if col != "i"],
+        index_col="i",
+        dtype=dtype,
+        float_precision="round_trip",
+    ):
+        if predicate is not None:
+            chunk = chunk[predicate(chunk)]
+        chunk.index = chunk.index.astype("int64")
+        for col in int_columns:
+            categories = chunk[col].cat.categories.to_numpy(dtype=object)
+            categories[np.isin(categories, list(missing_values))] = "-1"
+            try:
+                chunk[col] = _categories_to_numbers(
+                    chunk[col], categories, "int32", -1
+                )
+            except (ValueError, OverflowError) as e:
+                raise StatesParseError(
+                    f"Non-integer values of {col} in {Path(states_path).name}: {e}"
+                )
+        for col in numeric_columns:
+            categories = pd.to_numeric(chunk[col].cat.categories, errors="coerce")
+            chunk[col] = _categories_to_numbers(
+                chunk[col], categories, "float64", np.nan
+            )
+        yield chunk
+
+
+def trans_chunks(trans_paths, chunk_size=10_000_000, num_threads=4):
+    """Get a generator of chunks of all the dataset .trans files.
+
+    Drop-in replacement for `exomole.read_data.trans_chunks`, decompressing the
+    *.bz2* files in `num_threads` threads.
+
+    Parameters
+    ----------
+    trans_paths : iterable of (str or Path)
+    chunk_size : int, default=10_000_000
+    num_threads : int, default=4
+
+    Yields
+    ------
+    trans_chunk : pandas.DataFrame
+        With the columns "i", "f", "A_if" [, "v_if"].
+
+    Raises
+    ------
+    TransParseError
+        If the first .trans file has number of columns other than 3 or 4.
+    """
+    trans_paths = sorted(trans_paths)
+    num_cols = get_num_columns(trans_paths[0])
+    if num_cols not in {3, 4}:
+        raise TransParseError(
+            f"Unexpected number of columns in {Path(trans_paths[0]).name}: {num_cols}"
+        )
+    columns = ["i", "f", "A_if", "v_if"][:num_cols]
+    for file_path in trans_paths:
+        yield from _read_csv_chunks(file_path, chunk_size, num_threads, names=columns)
+
+
+def _open_binary(file_path, num_threads):
+    """Open a (possibly *.bz2*) data file as a binary stream of its decompressed
+    content."""
+    if str(file_path).endswith("bz2"):
+        if num_threads > 1:
+            return io.BufferedReader(
+                ParallelBZ2Reader(file_path, num_threads), buffer_size=1 << 20
+            )
+        return bz2.open(file_path, "rb")
+    return open(file_path, "rb")
+
+
+def _line_blocks(stream, block_size):
+    """Generate blocks of (roughly) `block_size` bytes of whole lines from the stream,
+    each block ending with a newline."""
+    carry = b""
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        data = carry + data
+        end = data.rfind(b"\n") + 1
+        carry = data[end:]
+        if end:
+            yield data[:end]
+    if carry.strip():
+        yield carry + b"\n"
+
+
+def _fixed_width_fields(rows):
+    """Find the fields of the right-aligned fixed-width rows.
+
+    Parameters
+    ----------
+    rows : numpy.ndarray
+        2D uint8 array of the characters of the rows, each ending with a newline.
+
+    Returns
+    -------
+    list[tuple[int, int]] or None
+        (start, end) character offsets of all the fields (including their leading
+        padding), or None if the rows are not right-aligned fixed-width records.
+    """
+    if not np.all(rows[:, -1] == ord("\n")):
+        return None
+    is_token = ~np.isin(rows[0, :-1], [ord(" "), ord("\r")])
+    ends = np.flatnonzero(is_token & ~np.append(is_token[1:], False)) + 1
+    fields = list(zip(np.append(0, ends[:-1]), ends))
+    for _, end in fields:
+        # the last character of each field is not padding in any of the rows and it
+        # is followed by a separator in all of them
+        if np.any(rows[:, end - 1] == ord(" ")):
+            return None
+        separators = rows[:, end]
+        if not np.all(
+            (separators == ord(" "))
+            | (separators == ord("\n"))
+            | (separators == ord("\r"))
+        ):
+            return None
+    return fields
+
+
+def _parse_uint32(chars):
+    """Parse right-aligned unsigned integers from a 2D uint8 array of their characters
+    (one row per integer, left-padded by spaces).
+
+    Returns None if any of the characters is neither a digit nor a space.
+    """
+    # digit by digit, over contiguous arrays of all the rows
+    digits = np.array(chars.T, order="C")
+    padding = digits == ord(" ")
+    digits -= np.uint8(ord("0"))
+    digits[padding] = 0
+    if digits.size and digits.max() > 9:
+        return None
+    values = np.zeros(chars.shape[0], dtype="uint32")
+    for column in digits:
+        values *= 10
+        values += column
+    return values
+
+
+def _parse_trans_block(block, num_cols):
+    """Parse a block of whole .trans lines into the i, f and A_if arrays.
+
+    Fixed-width rows are parsed by slicing the fields out of the 2D array of their
+    characters, any other rows by the pandas parser, in both cases without the
+    "v_if" column.
+
+    Returns
+    -------
+    tuple[numpy.ndarray]
+        The uint32 i, uint32 f and float64 A_if arrays.
+    """
+    row_length = block.find(b"\n") + 1
+    if len(block) % row_length == 0:
+        rows = np.frombuffer(block, dtype="uint8").reshape(-1, row_length)
+        fields = _fixed_width_fields(rows)
+        if fields is not None and len(fields) == num_cols:
+            (i_start, i_end), (f_start, f_end), (a_start, a_end) = fields[:3]
+            i = _parse_uint32(rows[:, i_start:i_end])
+            f = _parse_uint32(rows[:, f_start:f_end])
+            a_if = np.ascontiguousarray(rows[:, a_start:a_end]).view(
+                f"S{a_end - a_start}"
+            )
+            try:
+                a_if = a_if.ravel().astype("float64")
+            except ValueError:
+                a_if = None
+            if i is not None and f is not None and a_if is not None:
+                return i, f, a_if
+    return _pandas_trans_block(block, num_cols)
+
+
+def _pandas_trans_block(block, num_cols):
+    """Parse a block of whole .trans lines by the pandas parser, the same way as the
+    `exomole.read_data.trans_chunks` does, only without the "v_if" column."""
+    trans = pd.read_csv(
+        io.BytesIO(block),
+        sep=r"\s+",
+        header=None,
+        names=["i", "f", "A_if", "v_if"][:num_cols],
+        usecols=["i", "f", "A_if"],
+        dtype={"i": "uint32", "f": "uint32", "A_if": "float64"},
+    )
+    return trans.i.to_numpy(), trans.f.to_numpy(), trans.A_if.to_numpy()
+
+
+def parse_trans_lines(lines, file_name="the .trans file", reader="numpy"):
+    """Parse whole .trans lines into the i, f and A_if arrays.
+
+    Parameters
+    ----------
+    lines : bytes
+        Whole lines of a .trans file, each ending with a newline.
+    file_name : str, optional
+        Name of the .trans file for the error message.
+    reader : {"exomole", "numpy"}, default="numpy"
+        "exomole" for the pandas parser (with the very same values as by the
+        `exomole.read_data.trans_chunks`), "numpy" for the fixed-width parser of the
+        `fixed_width_trans_chunks`.
+
+    Returns
+    -------
+    tuple[numpy.ndarray]
+        The uint32 i, uint32 f and float64 A_if arrays.
+
+    Raises
+    ------
+    TransParseError
+        If the lines have number of columns other than 3 or 4.
+    ValueError
+        If the `reader` is not one of the `TRANS_READERS`.
+    """
+    if reader not in TRANS_READERS:
+        raise ValueError(
+            f"Unknown .trans reader {reader!r}, expected one of {TRANS_READERS}"
+        )
+    num_cols = len(lines[: lines.find(b"\n")].split())
+    if num_cols not in {3, 4}:
+        raise TransParseError(
+            f"Unexpected number of columns in {file_name}: {num_cols}"
+        )
+    if reader == "exomole":
+        return _pandas_trans_block(lines, num_cols)
+    return _parse_trans_block(lines, num_cols)
+
+
+def trans_frames(parsed_columns, chunk_size):
+    """Assemble the parsed .trans columns into chunks of exactly `chunk_size` rows
+    (except of the last one).
+
+    Parameters
+    ----------
+    parsed_columns : iterable of tuple[numpy.ndarray]
+        The i, f and A_if arrays of consecutive parts of a .trans file.
+    chunk_size : int
+
+    Yields
+    ------
+    trans_chunk : pandas.DataFrame
+        With the columns "i", "f" and "A_if", indexed by the row numbers.
+    """
+    pending, num_pending, start = [], 0, 0
+    for columns in parsed_columns:
+        pending.append(columns)
+        num_pending += len(columns[0])
+        if num_pending < chunk_size:
+            continue
+        i, f, a_if = (np.concatenate(column) for column in zip(*pending))
+        num_full = num_pending - num_pending % chunk_size
+        for n in range(0, num_full, chunk_size):
+            yield pd.DataFrame(
+                {
+                    "i": i[n : n + chunk_size],
+                    "f": f[n : n + chunk_size],
+                    "A_if": a_if[n : n + chunk_size],
+                },
+                index=pd.RangeIndex(start, start + chunk_size),
+            )
+            start += chunk_size
+        pending = [(i[num_full:].copy(), f[num_full:].copy(), a_if[num_full:].copy())]
+        num_pending -= num_full
+    if num_pending:
+        i, f, a_if = (np.concatenate(column) for column in zip(*pending))
+        yield pd.DataFrame(
+            {"i": i, "f": f, "A_if": a_if},
+            index=pd.RangeIndex(start, start + num_pending),
+        )
+
+
+def fixed_width_trans_columns(file_path, num_threads=1, block_size=TRANS_BLOCK_SIZE):
+    """Generate the i, f and A_if arrays of consecutive blocks of a single .trans
+    file, parsed as by the `fixed_width_trans_chunks`, without building any frames.
+
+    Parameters
+    ----------
+    file_path : str or Path
+    num_threads : int, default=1
+        Number of threads decompressing the *.bz2* file by blocks.
+    block_size : int, default=TRANS_BLOCK_SIZE
+        Approximate size in bytes of the blocks parsed at once.
+
+    Yields
+    ------
+    tuple[numpy.ndarray]
+        The uint32 i, uint32 f and float64 A_if arrays.
+    """
+    with _open_binary(file_path, num_threads) as stream:
+        for block in _line_blocks(stream, block_size):
+            yield parse_trans_lines(block, Path(file_path).name)
+
+
+def frame_columns(trans_chunks):
+    """Generate the i, f and A_if arrays of the .trans chunks, without copying."""
+    for chunk in trans_chunks:
+        yield chunk.i.to_numpy(), chunk.f.to_numpy(), chunk.A_if.to_numpy()
+
+
+def single_precision_columns(column_blocks):
+    """Generate the i, f and A_if arrays of the `column_blocks` in compact dtypes.
+
+    The state ids are stored as uint32 (as parsed by the "numpy" reader already) and
+    the A_if rounded to float32, each within 2**-24 relative of the float64 value (as
+    long as it is within the normal float32 range, above about 1.2e-38).
+
+    Parameters
+    ----------
+    column_blocks : iterable of tuple
+        The i, f and A_if arrays, such as from the `read_trans_columns`, possibly
+        followed by any other items (passed through as they are).
+
+    Yields
+    ------
+    tuple
+        The uint32 i, uint32 f and float32 A_if arrays, followed by any other items
+        of the block.
+    """
+    for i, f, a_if, *other in column_blocks:
+        yield (
+            i.astype("uint32", copy=False),
+            f.astype("uint32", copy=False),
+            a_if.astype("float32"),
+            *other,
+        )
+
+
+def _fixed_width_file_chunks(file_path, chunk_size, num_threads, block_size):
+    yield from trans_frames(
+        fixed_width_trans_columns(file_path, num_threads, block_size), chunk_size
+    )
+
+
+def fixed_width_trans_chunks(
+    trans_paths, chunk_size=10_000_000, num_threads=1, block_size=TRANS_BLOCK_SIZE
+):
+    """Get a generator of chunks of all the dataset .trans files, parsed with NumPy.
+
+    The decompressed content of each .trans file is parsed by blocks of raw bytes.
+    Blocks of fixed-width rows are sliced into the columns directly, the integers
+    parsed digit by digit and the floats straight from their bytes (correctly
+    rounded). Blocks of rows which are not fixed-width fall back onto the pandas
+    parser. The "v_if" column is never parsed and no object-dtype arrays are built.
+    The chunk boundaries are the same as with `exomole.read_data.trans_chunks`.
+
+    Parameters
+    ----------
+    trans_paths : iterable of (str or Path)
+    chunk_size : int, default=10_000_000
+    num_threads : int, default=1
+        Number of threads decompressing each *.bz2* file by blocks.
+    block_size : int, default=TRANS_BLOCK_SIZE
+        Approximate size in bytes of the blocks parsed at once.
+
+    Yields
+    ------
+    trans_chunk : pandas.DataFrame
+        With the uint32 columns "i", "f" and the float64 column "A_if".
+
+    Raises
+    ------
+    TransParseError
+        If any of the .trans files has number of columns other than 3 or 4.
+    """
+    for file_path in sorted(trans_paths):
+        yield from _fixed_width_file_chunks(
+            file_path, chunk_size, num_threads, block_size
+        )
+
+
+def read_trans_chunks(trans_paths, chunk_size, reader="exomole", num_threads=1):
+    """Get a generator of chunks of all the dataset .trans files by the chosen reader.
+
+    Parameters
+    ----------
+    trans_paths : iterable of (str or Path)
+    chunk_size : int
+    reader : {"exomole", "numpy"}, default="exomole"
+        "exomole" for `exomole.read_data.trans_chunks` (or `trans_chunks` of this
+        module, if decompressing in multiple threads), "numpy" for the
+        `fixed_width_trans_chunks`.
+    num_threads : int, default=1
+        Number of threads decompressing each *.bz2* file by blocks.
+
+    Returns
+    -------
+    generator of pandas.DataFrame
+
+    Raises
+    ------
+    ValueError
+        If the `reader` is not one of the `TRANS_READERS`.
+    """
+    if reader == "numpy":
+        return fixed_width_trans_chunks(
+            trans_paths, chunk_size=chunk_size, num_threads=num_threads
+        )
+    if reader == "exomole":
+        if num_threads > 1:
+            return trans_chunks(
+                trans_paths, chunk_size=chunk_size, num_threads=num_threads
+            )
+        return exomole_read_data.trans_chunks(trans_paths, chunk_size=chunk_size)
+    raise ValueError(
+        f"Unknown .trans reader {reader!r}, expected one of {TRANS_READERS}"
+    )
+
+
+def read_trans_columns(trans_path, chunk_size, reader="exomole", num_threads=1):
+    """Get a generator of the i, f and A_if arrays of a single .trans file by the
+    chosen reader.
+
+    With the "numpy" reader, the arrays come straight from the parsed blocks, without
+    any frames built. With the "exomole" reader, they are the columns of the chunks.
+
+    Parameters
+    ----------
+    trans_path : str or Path
+    chunk_size : int
+        Chunk size of the "exomole" reader.
+    reader : {"exomole", "numpy"}, default="exomole"
+    num_threads : int, default=1
+        Number of threads decompressing the *.bz2* file by blocks.
+
+    Returns
+    -------
+    generator of tuple[numpy.ndarray]
+    """
+    if reader == "numpy":
+        return fixed_width_trans_columns(trans_path, num_threads=num_threads)
+    return frame_columns(
+        read_trans_chunks(
+            [trans_path], chunk_size, reader=reader, num_threads=num_threads
+        )
+    )
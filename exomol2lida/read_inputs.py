@@ -13,6 +13,7 @@ The ``molecules.data`` is expected to hold the following entries:
   "energy_max": number (optional), in [eV],
   "only_with": dict[str, str] (optional),
   "only_without": dict[str, str] (optional),
+  "num_channels": int (optional),
 }
 
 `molecule_formula`: Identifier for the Lida database, does not have to correspond
@@ -40,6 +41,8 @@ The ``molecules.data`` is expected to hold the following entries:
     the VO .states contains some values ``"0"`` in the ``States`` column, probably
     indicating unassigned states. These will be ignored by setting
     ``"only_without": {"State": "0"}``
+`num_channels`: Optional number of the fastest decay channels kept for each lumped
+    state, overriding the `NUM_CHANNELS` from the config.
 
 A `MoleculeInput` class instantiated without exceptions signals data without
 inconsistencies and ready to be processed into the Lida data product. All the possible
@@ -49,8 +52,11 @@ each `molecule_formula` saved as instance attributes, as well as couple of addit
 attributes, such as `self.def_path`, `self.states_path` and `self.trans_paths`.
 """
 
+import re
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 from exomole.read_def import DefParser, DefParseError
 from exomole.utils import get_num_columns
 
@@ -58,6 +64,190 @@ from config.config import EXOMOL_DATA_DIR
 from .exceptions import MoleculeInputError
 from .utils import EV_IN_CM
 
+# wavenumber range [cm-1] in the names of the split .trans files, such as
+# "1H-12C-14N__Harris__00000-00100.trans.bz2"
+TRANS_RANGE_PATTERN = re.compile(r"__(\d+)-(\d+)\.trans(\.bz2)?$")
+
+
+def get_trans_wavenumber_range(trans_path):
+    """Get the wavenumber range of the transitions from the .trans file name.
+
+    Parameters
+    ----------
+    trans_path : str or Path
+
+    Returns
+    -------
+    tuple[float, float] or None
+        The (lower, upper) bounds in [cm-1], or None if the file name does not
+        specify the range.
+    """
+    match = TRANS_RANGE_PATTERN.search(Path(trans_path).name)
+    if match is None:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def prune_trans_paths(trans_paths, energy_max):
+    """Split the .trans files into those which need to be read and those which
+    cannot contribute any transitions between the states below the `energy_max`.
+
+    With all the state energies non-negative (relative to the ground state), no
+    transition between two states with energies below the `energy_max` can have its
+    wavenumber above the `energy_max`. Any .trans file with the lower bound of the
+    wavenumber range in its name above the `energy_max` can therefore be skipped.
+
+    Parameters
+    ----------
+    trans_paths : list[Path]
+    energy_max : float
+        In [cm-1].
+
+    Returns
+    -------
+    tuple[list[Path], list[Path]]
+        The .trans paths to read and the .trans paths to skip.
+    """
+    kept, skipped = [], []
+    for trans_path in trans_paths:
+        wavenumber_range = get_trans_wavenumber_range(trans_path)
+        if wavenumber_range is not None and wavenumber_range[0] > energy_max:
+            skipped.append(trans_path)
+        else:
+            kept.append(trans_path)
+    return kept, skipped
+
+
+class StatesFilter:
+    """Vectorized predicate selecting the .states rows to be lumped.
+
+    Compiles all the filtering rules for the .states file into a single predicate:
+    the `only_with` and `only_without` values, the discarded values of the resolved
+    quanta, non-negative integer vibrational quanta and the maximal energy.
+    Calling the instance on a .states chunk returns the boolean mask of the accepted
+    rows. The rules are evaluated column by column, for categorical columns only on
+    their categories, and combined into the mask in a single pass.
+
+    The columns might hold str values (as categoricals or not) or numerical values
+    (such as the float J or int vibrational quanta), the values of the rules are
+    compared accordingly.
+
+    Parameters
+    ----------
+    only_with : dict[str, str], optional
+    only_without : dict[str, str], optional
+    resolve_el : list[str], optional
+    resolve_vib : list[str], optional
+        All the states with vibrational quanta other than non-negative integers are
+        rejected.
+    discarded_quanta_values : iterable of str, default=("*",)
+        Values of any resolved quanta for which the states are rejected. The states
+        with any resolved quanta missing (NaN or NA) are always rejected.
+    energy_max : float, default=inf
+        In [cm-1].
+
+    Attributes
+    ----------
+    columns : list[str]
+        All the .states columns needed to evaluate the predicate.
+    """
+
+    def __init__(
+        self,
+        only_with=None,
+        only_without=None,
+        resolve_el=(),
+        resolve_vib=(),
+        discarded_quanta_values=("*",),
+        energy_max=float("inf"),
+    ):
+        self.discarded_quanta_values = set(discarded_quanta_values)
+        self.energy_max = energy_max
+        # all the rules per column, as (kind, value) pairs
+        self._rules = {}
+        for quantum, val in (only_with or {}).items():
+            self._rules.setdefault(quantum, []).append(("with", val))
+        for quantum, val in (only_without or {}).items():
+            self._rules.setdefault(quantum, []).append(("without", val))
+        for quantum in list(resolve_el) + list(resolve_vib):
+            self._rules.setdefault(quantum, []).append(
+                ("discarded", list(self.discarded_quanta_values))
+            )
+        for quantum in resolve_vib:
+            self._rules[quantum].append(("vib", None))
+        self.columns = ["E"] + list(self._rules)
+
+    @staticmethod
+    def _as_number(val):
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            return None
+
+    def _accept(self, rules, values):
+        """Evaluate the `rules` on an array of the `values` of a single column."""
+        numeric = values.dtype.kind in "iuf"
+        accept = np.ones(len(values), dtype=bool)
+        for kind, val in rules:
+            if kind in {"with", "without"}:
+                if numeric:
+                    val = self._as_number(val)
+                    equal = (
+                        values == val
+                        if val is not None
+                        else np.zeros(len(values), dtype=bool)
+                    )
+                else:
+                    equal = values == val
+                accept &= equal if kind == "with" else ~equal
+            elif kind == "discarded":
+                # the states with the resolved quanta missing cannot be lumped
+                accept &= ~pd.isna(values)
+                if not numeric:
+                    accept &= ~np.isin(values, val)
+            elif kind == "vib":
+                if not numeric:
+                    values = pd.to_numeric(values, errors="coerce")
+                    numeric = True
+                accept &= values >= 0
+        return accept
+
+    def column_mask(self, column, values):
+        """Get the mask of the `values` of a single column accepted by the predicate.
+
+        Parameters
+        ----------
+        column : str
+        values : pandas.Series
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        rules = self._rules.get(column, [])
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # evaluate only the categories, the missing values have the code of -1
+            categories = np.append(values.cat.categories.to_numpy(dtype=object), None)
+            return self._accept(rules, categories)[values.cat.codes.to_numpy()]
+        return self._accept(rules, values.to_numpy())
+
+    def __call__(self, states_chunk):
+        """Get the mask of the rows of the `states_chunk` accepted by the predicate.
+
+        Parameters
+        ----------
+        states_chunk : pandas.DataFrame
+            With (at least) all the `columns`.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        mask = states_chunk["E"].to_numpy(dtype="float64") <= self.energy_max
+        for column in self._rules:
+            mask &= self.column_mask(column, states_chunk[column])
+        return mask
+
 
 class MoleculeInput:
     """Class representing Molecule Inputs.
@@ -89,9 +279,19 @@ class MoleculeInput:
     energy_max : float
         This is in [cm-1], converted from the input file.
     only_with : dict[str, str]
+    only_without : dict[str, str]
+    num_channels : int, optional
+    states_filter : StatesFilter
+        The compiled predicate selecting the .states rows to be lumped.
     def_path : Path
     states_path : Path
     trans_paths : list[Path]
+        Only the .trans files which might contribute transitions below the
+        `energy_max`, see `prune_trans_paths`.
+    trans_paths_skipped : list[Path]
+        The .trans files skipped as they only hold transitions above the `energy_max`.
+    trans_bytes_skipped : int
+        The total size of the skipped .trans files.
     def_parser : DefParser
     def_parser_raised : Exception, optional
     version : int
@@ -107,6 +307,8 @@ class MoleculeInput:
         file cannot be parsed, this error is raised.
     """
 
+    discarded_quanta_values = {"*"}
+
     def __init__(self, molecule_formula, **kwargs):
         self.formula = molecule_formula
         self.raw_input = None
@@ -126,6 +328,7 @@ class MoleculeInput:
         self.energy_max = float("inf")
         self.only_with = {}
         self.only_without = {}
+        self.num_channels = None
 
         # populate the attributes:
         if not len(kwargs):
@@ -147,6 +350,12 @@ class MoleculeInput:
                 f"Input data for {molecule_formula} missing one of the 'resolve_el', "
                 f"'resolve_vib' attributes."
             )
+        if self.num_channels is not None and (
+            not isinstance(self.num_channels, int) or self.num_channels < 1
+        ):
+            raise MoleculeInputError(
+                f"Invalid 'num_channels' for {molecule_formula}: {self.num_channels}"
+            )
 
         mol_root = EXOMOL_DATA_DIR / self.mol_slug
         if not mol_root.is_dir():
@@ -276,6 +485,24 @@ class MoleculeInput:
             )
             raise MoleculeInputError(msg)
 
+        # skip the .trans files with transitions only above the energy_max
+        self.trans_paths, self.trans_paths_skipped = prune_trans_paths(
+            self.trans_paths, self.energy_max
+        )
+        self.trans_bytes_skipped = sum(
+            path.stat().st_size for path in self.trans_paths_skipped
+        )
+
+        # compile all the .states filtering rules into a single predicate
+        self.states_filter = StatesFilter(
+            only_with=self.only_with,
+            only_without=self.only_without,
+            resolve_el=self.resolve_el,
+            resolve_vib=self.resolve_vib,
+            discarded_quanta_values=self.discarded_quanta_values,
+            energy_max=self.energy_max,
+        )
+
 
 def get_all_inputs(bypass_exceptions=False, verbose=True):
     """Get the `MoleculeInput` instances for all formulas specified in the input
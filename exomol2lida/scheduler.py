@@ -0,0 +1,305 @@
+"""
+Module with a parallel, size-aware scheduler processing many molecules at once.
+
+Each *job* processes either a single molecule, or a group of molecules lumped from the
+same ExoMol dataset (see `exomol2lida.shared_dataset`), in its own worker process.
+The jobs are started longest-first (by the total size of their .trans files and the
+number of their transitions), so the small molecules fill the gaps left by the huge
+ones instead of waiting behind them. A job is only started if its estimated memory
+fits into the memory budget left by the jobs running already, unless no other job is
+running. Any errors are isolated per job, and a summary table of the status, wall time
+and peak RSS of each job is printed at the end.
+"""
+
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+from exomole.exceptions import DefParseError
+
+from config.config import MEMORY_BUDGET
+from .exceptions import MoleculeInputError
+from .postprocess_dataset import postprocess_molecule
+from .process_dataset import DatasetProcessor
+from .read_data import TRANS_BLOCK_SIZE
+from .shared_dataset import SharedDatasetProcessor, group_processors
+
+# rough memory footprints used for the job memory estimates (in bytes): per original
+# state (dense maps, weights and the accumulated states), per row of a .states chunk
+# and per row of a .trans chunk (see the chunk sizes in the config)
+STATE_BYTES = 64
+STATES_ROW_BYTES = 200
+TRANS_ROW_BYTES = 100
+
+
+class Job:
+    """A single job of the scheduler, processing one or more molecules.
+
+    Parameters
+    ----------
+    processors : list[DatasetProcessor]
+        Processors of the molecules lumped from the same dataset.
+
+    Attributes
+    ----------
+    formulas : list[str]
+    name : str
+    cost : tuple[int, int]
+        Total size of the .trans files in bytes and the number of the transitions.
+    memory : int
+        Estimated peak memory of the job in bytes.
+    """
+
+    def __init__(self, processors):
+        self.formulas = [processor.formula for processor in processors]
+        self.name = "+".join(self.formulas)
+        trans_paths = set().union(*(processor.trans_paths for processor in processors))
+        lead = processors[0]
+        def_parser = lead.molecule_input.def_parser
+        self.cost = (
+            sum(path.stat().st_size for path in trans_paths),
+            def_parser.num_transitions or 0,
+        )
+        self.memory = estimate_memory(processors)
+
+
+def estimate_memory(processors):
+    """Estimate the peak memory of processing the molecules from the same dataset.
+
+    Only a rough estimate from the number of the states and the chunk sizes, which
+    needs to be compared against the `MEMORY_BUDGET` only.
+
+    Parameters
+    ----------
+    processors : list[DatasetProcessor]
+
+    Returns
+    -------
+    int
+        In bytes.
+    """
+    lead = processors[0]
+    num_states = lead.molecule_input.def_parser.num_states or 0
+    states_memory = (
+        len(processors) * num_states * STATE_BYTES
+        + lead.states_chunk_size * STATES_ROW_BYTES
+    )
+    trans_memory = max(lead.num_workers, 1) * (
+        lead.trans_chunk_size * TRANS_ROW_BYTES + 2 * TRANS_BLOCK_SIZE
+    )
+    return int(states_memory + trans_memory)
+
+
+def _peak_rss():
+    """Get the peak resident set size of this process in bytes."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in kilobytes on linux, in bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def run_job(
+    formulas,
+    include_original_lifetimes=False,
+    postprocess=False,
+    resume=False,
+    force=False,
+):
+    """Process the molecules of a single job, isolating any errors.
+
+    Parameters
+    ----------
+    formulas : list[str]
+        Formulas of the molecules lumped from the same dataset.
+    include_original_lifetimes : bool, default=False
+    postprocess : bool, default=False
+    resume : bool, default=False
+    force : bool, default=False
+        See `exomol2lida.process_dataset.process_molecule`.
+
+    Returns
+    -------
+    status : str
+        "OK", or the error message.
+    wall_time : float
+        In seconds.
+    peak_rss : int
+        Peak resident set size of the process running the job, in bytes.
+    """
+    start = time.perf_counter()
+    try:
+        processors = [
+            DatasetProcessor(formula, resume=resume, force=force)
+            for formula in formulas
+        ]
+        if len(processors) == 1:
+            processor = processors[0]
+        else:
+            processor = SharedDatasetProcessor(processors)
+        processor.process(include_original_lifetimes=include_original_lifetimes)
+        if postprocess:
+            for formula in formulas:
+                postprocess_molecule(formula, raise_exceptions=True)
+        status = "OK"
+    except (MoleculeInputError, DefParseError) as e:
+        status = f"PROCESSING ABORTED: {type(e).__name__}: {e}"
+    except FileExistsError as e:
+        status = f"PROCESSED ALREADY: {type(e).__name__}: {e}"
+    except Exception as e:
+        status = f"FAILED: {type(e).__name__}: {e}"
+    return status, time.perf_counter() - start, _peak_rss()
+
+
+def run_jobs(jobs, target, num_jobs, memory_budget, get_executor=ProcessPoolExecutor):
+    """Run the jobs longest-first, within the number of jobs and the memory budget.
+
+    Whenever a job finishes, the longest of the pending jobs which fit into the memory
+    budget left are started. A job which does not fit even into the whole budget is
+    only started once no other job is running.
+
+    Parameters
+    ----------
+    jobs : list[Job]
+    target : callable
+        Picklable callable taking the formulas of a job and returning its results.
+    num_jobs : int
+        Maximal number of the jobs running at once.
+    memory_budget : int or float
+        In bytes.
+    get_executor : callable, optional
+        Callable taking the number of workers (1) and returning a
+        `concurrent.futures.Executor`. Defaults to a pool of processes. Each job is run
+        by its own executor, so if its worker process dies (such as if killed when
+        out of memory), only that job fails, while the jobs running alongside it
+        carry on (and the peak RSS is measured per job).
+
+    Returns
+    -------
+    dict[str, object]
+        The results of the `target` for each job name, in the order of completion.
+        The jobs whose worker processes failed get results of
+        ``("FAILED: ...", None, None)``.
+    """
+    pending = sorted(jobs, key=lambda job: job.cost, reverse=True)
+    running = {}  # the job and its executor for each future
+    results = {}
+    try:
+        while pending or running:
+            memory_used = sum(job.memory for job, _ in running.values())
+            for job in list(pending):
+                if len(running) >= num_jobs:
+                    break
+                if running and memory_used + job.memory > memory_budget:
+                    continue
+                executor = get_executor(1)
+                running[executor.submit(target, job.formulas)] = (job, executor)
+                memory_used += job.memory
+                pending.remove(job)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, executor = running.pop(future)
+                executor.shutdown()
+                try:
+                    results[job.name] = future.result()
+                except Exception as e:
+                    status = f"FAILED: {type(e).__name__}: {e}"
+                    results[job.name] = (status, None, None)
+    finally:
+        for _, executor in running.values():
+            executor.shutdown()
+    return results
+
+
+def format_summary(results):
+    """Format the summary table of the results of the jobs.
+
+    Parameters
+    ----------
+    results : dict[str, tuple[str, float or None, int or None]]
+        Status, wall time in seconds and peak RSS in bytes for each job name.
+
+    Returns
+    -------
+    str
+    """
+    name_width = max([len("molecule")] + [len(name) for name in results])
+    lines = [
+        f"{'molecule':<{name_width}}  {'wall time':>10}  {'peak RSS':>10}  status",
+    ]
+    for name, (status, wall_time, peak_rss) in results.items():
+        wall_time = "-" if wall_time is None else f"{wall_time:.1f} s"
+        peak_rss = "-" if peak_rss is None else f"{peak_rss / 1e6:.0f} MB"
+        lines.append(f"{name:<{name_width}}  {wall_time:>10}  {peak_rss:>10}  {status}")
+    return "\n".join(lines)
+
+
+def schedule_molecules(
+    mol_formulas,
+    num_jobs,
+    include_original_lifetimes=False,
+    postprocess=False,
+    separately=False,
+    memory_budget=None,
+    resume=False,
+    incremental=False,
+    force=False,
+):
+    """A top-level function processing the molecules in parallel jobs.
+
+    Parameters
+    ----------
+    mol_formulas : iterable of str
+        Molecular formulas, must be among the keys in ``input.molecules.molecules``
+        dictionary.
+    num_jobs : int
+        Maximal number of the jobs running at once.
+    include_original_lifetimes : bool, default=False
+    postprocess : bool, default=False
+        See `exomol2lida.process_dataset.process_molecule`.
+    separately : bool, default=False
+        If True, each molecule is processed in its own job, otherwise the molecules
+        lumped from the same dataset are processed in a single job.
+    memory_budget : int or float, optional
+        Defaults to the `MEMORY_BUDGET` from the config.
+    resume : bool, default=False
+        If True, the interrupted processing of each molecule is resumed from its last
+        checkpoint, see `exomol2lida.process_dataset.process_molecule`. Only the
+        molecules processed separately are checkpointed, so this implies `separately`.
+    incremental : bool, default=False
+    force : bool, default=False
+        See `exomol2lida.process_dataset.process_molecule`. The molecules up to date
+        are not scheduled at all if `incremental`.
+
+    Returns
+    -------
+    dict[str, tuple[str, float or None, int or None]]
+        Status, wall time in seconds and peak RSS in bytes for each job name (and for
+        each molecule which could not be scheduled).
+    """
+    if memory_budget is None:
+        memory_budget = MEMORY_BUDGET
+    groups, errors = group_processors(
+        mol_formulas,
+        raise_exceptions=False,
+        resume=resume,
+        incremental=incremental,
+        force=force,
+    )
+    if separately or resume:
+        groups = [[processor] for processors in groups for processor in processors]
+    jobs = [Job(processors) for processors in groups]
+    target = partial(
+        run_job,
+        include_original_lifetimes=include_original_lifetimes,
+        postprocess=postprocess,
+        resume=resume,
+        force=(force or incremental),
+    )
+    results = run_jobs(jobs, target, num_jobs, memory_budget)
+    for mol_formula, error in errors.items():
+        results[mol_formula] = (error, None, None)
+    print()
+    print(format_summary(results))
+    return results
+
@@ -0,0 +1,445 @@
+"""
+Module with functionality for processing several molecules lumped from the same ExoMol
+dataset in a single pass over the dataset files.
+
+Several entries in the input/molecules.py might point at the same ExoMol dataset and
+only differ in their filtering (such as HCN and HNC, both lumped from the
+HCN/1H-12C-14N/Harris dataset). The `SharedDatasetProcessor` reads and decompresses
+the .states and .trans files only once for all of them, while each molecule keeps its
+own `DatasetProcessor` with its own maps and accumulators, and writes its own outputs
+into its own output/<formula> directory.
+"""
+
+import math
+
+import numpy as np
+from exomole.exceptions import DefParseError
+from tqdm import tqdm
+
+from . import read_data
+from .accumulators import PrelumpsAccumulator
+from .exceptions import MoleculeInputError
+from .file_prelumps import load_file_prelumps, remove_stale_prelumps, save_file_prelumps
+from .parallel import iter_reduced_trans_files
+from .postprocess_dataset import postprocess_molecule
+from .process_dataset import DatasetProcessor
+
+
+class SharedDatasetProcessor:
+    """Class for processing several molecules from the same ExoMol dataset at once.
+
+    The chunk sizes, the number of workers and threads, the .trans reader and the
+    caching are all taken from the first of the `processors`.
+
+    Parameters
+    ----------
+    processors : list[DatasetProcessor]
+        Processors of all the molecules, which need to share the same .states file
+        and states header.
+
+    Raises
+    ------
+    MoleculeInputError
+        If the processors do not share the same .states file and states header.
+    """
+
+    def __init__(self, processors):
+        self.processors = list(processors)
+        self.lead = self.processors[0]
+        for processor in self.processors[1:]:
+            if (
+                processor.states_path != self.lead.states_path
+                or processor.states_header != self.lead.states_header
+            ):
+                raise MoleculeInputError(
+                    f"{processor.formula} and {self.lead.formula} do not share the "
+                    f"same .states file and states header!"
+                )
+        self.formula = "+".join(processor.formula for processor in self.processors)
+
+    @property
+    def states_usecols(self):
+        """Get the names of the .states columns needed by any of the processors.
+
+        Returns
+        -------
+        list[str]
+        """
+        needed = set().union(
+            *(processor.states_usecols for processor in self.processors)
+        )
+        return [col for col in self.lead.states_header[1:] if col in needed]
+
+    def _states_filter(self, chunk):
+        """Mask of the states accepted by any of the processors."""
+        return np.logical_or.reduce(
+            [processor.states_filter(chunk) for processor in self.processors]
+        )
+
+    @property
+    def states_reader_settings(self):
+        """Get the settings of the shared .states reader.
+
+        See `DatasetProcessor.states_reader_settings`.
+
+        Returns
+        -------
+        dict
+        """
+        processors = self.processors
+        keep_tau = any(processor.keep_original_lifetimes for processor in processors)
+        return {
+            "columns": list(self.lead.states_header),
+            "usecols": self.states_usecols,
+            "int_columns": sorted(
+                {col for processor in processors for col in processor.resolve_vib}
+            ),
+            "numeric_columns": ["tau"] if keep_tau else [],
+            "missing_values": sorted(self.lead.states_filter.discarded_quanta_values),
+        }
+
+    def _read_states_chunks(self, predicate=None):
+        lead = self.lead
+        return read_data.typed_states_chunks(
+            states_path=lead.states_path,
+            chunk_size=lead.states_chunk_size,
+            num_threads=lead.decompression_threads,
+            predicate=predicate,
+            **self.states_reader_settings,
+        )
+
+    @property
+    def states_chunks(self):
+        """Get chunks of the shared .states file, with the states accepted by any of
+        the processors.
+
+        See `DatasetProcessor.states_chunks`, the chunks need to be filtered by the
+        `states_filter` of each processor still.
+
+        Yields
+        ------
+        states_chunk : pandas.DataFrame
+        """
+        input_cache = self.lead.input_cache
+        if input_cache is not None:
+            chunks_generator = input_cache.chunks(
+                self.lead.states_path,
+                self._read_states_chunks,
+                self.lead.states_chunk_size,
+                columns=self.states_usecols,
+                settings=self.states_reader_settings,
+            )
+            for chunk in chunks_generator:
+                yield chunk[self._states_filter(chunk)]
+        else:
+            yield from self._read_states_chunks(predicate=self._states_filter)
+
+    def lump_states(self):
+        """Lump the states of all the processors in a single pass over the .states
+        file.
+
+        See `DatasetProcessor.lump_states`.
+        """
+        num_states = self.lead.molecule_input.def_parser.num_states
+        total_iter = math.ceil(
+            num_states / self.lead.states_chunk_size if num_states else float("inf")
+        )
+        for processor in self.processors:
+            processor._start_states_lumping()
+        for chunk in tqdm(
+            self.states_chunks, total=total_iter, desc=f"{self.formula} states"
+        ):
+            for processor in self.processors:
+                processor._lump_states_chunk(chunk[processor.states_filter(chunk)])
+        for processor in self.processors:
+            processor._finish_states_lumping()
+
+    def lump_transitions(self):
+        """Lump the transitions of all the processors in a single pass over the
+        .trans files.
+
+        Each of the .trans files is only reduced for the processors which have not
+        skipped it. The processors with the `persist_prelumps` load the prelumps of
+        the .trans files persisted already (which are then not reduced for them), and
+        persist the prelumps of the other files, see `DatasetProcessor._file_partials`.
+        See `DatasetProcessor.lump_transitions`.
+        """
+        lead = self.lead
+        trans_paths = []
+        all_keys = []  # of the persisted prelumps of all the .trans files
+        prelumps_keys = []  # of the .trans files still to be persisted
+        for processor in self.processors:
+            processor._start_transitions_lumping()
+            paths = sorted(processor.trans_paths)
+            keys, missing = [], {}
+            if processor.persist_prelumps:
+                keys = processor._get_prelumps_keys(paths)
+                for path, key in zip(paths, keys):
+                    prelumps = load_file_prelumps(processor.prelumps_dir, key)
+                    if prelumps is None:
+                        missing[path] = key
+                    elif len(prelumps[0]):
+                        processor._lump_transitions_partial(prelumps)
+                if len(missing) < len(paths):
+                    print(
+                        f"{processor.formula}: loading the prelumps of "
+                        f"{len(paths) - len(missing)} .trans files"
+                    )
+                paths = list(missing)
+            trans_paths.append(paths)
+            all_keys.append(keys)
+            prelumps_keys.append(missing)
+        num_trans = lead.molecule_input.def_parser.num_transitions
+        total_iter = (
+            math.ceil(num_trans / lead.trans_chunk_size) if num_trans else float("inf")
+        )
+        partials = iter_reduced_trans_files(
+            trans_paths=trans_paths,
+            states_maps=[
+                processor.states_array_original_to_lumped
+                for processor in self.processors
+            ],
+            nums_lumped=[len(processor.lumped_states) for processor in self.processors],
+            chunk_size=lead.trans_chunk_size,
+            num_workers=lead.num_workers,
+            unmapped_state=lead.unmapped_state,
+            read_columns=lead._get_read_trans_columns(),
+            downward_only=lead.downward_only,
+            get_spans=lead._get_trans_spans(),
+        )
+        current_path, accumulators = None, []
+        for trans_path, _, chunk_partials in tqdm(
+            partials, total=total_iter, desc=f"{self.formula} transitions"
+        ):
+            if trans_path != current_path:
+                self._persist_prelumps(current_path, accumulators, prelumps_keys)
+                current_path = trans_path
+                accumulators = self._file_accumulators(trans_path, prelumps_keys)
+            for processor, accumulator, chunk_prelumps in zip(
+                self.processors, accumulators, chunk_partials
+            ):
+                if accumulator is None:
+                    processor._lump_transitions_partial(chunk_prelumps)
+                elif chunk_prelumps is not None:
+                    accumulator.add_partial(chunk_prelumps)
+        self._persist_prelumps(current_path, accumulators, prelumps_keys)
+        # the files without any chunks do not come up at all
+        for trans_path in sorted(set().union(*prelumps_keys)):
+            self._persist_prelumps(
+                trans_path,
+                self._file_accumulators(trans_path, prelumps_keys),
+                prelumps_keys,
+            )
+        for processor, keys in zip(self.processors, all_keys):
+            if processor.persist_prelumps:
+                remove_stale_prelumps(processor.prelumps_dir, keys)
+            processor._finish_transitions_lumping()
+
+    def _file_accumulators(self, trans_path, prelumps_keys):
+        """Get the accumulators of the prelumps of a .trans file to be persisted.
+
+        Parameters
+        ----------
+        trans_path : Path
+        prelumps_keys : list[dict[Path, dict]]
+            The keys of the .trans files still to be persisted, per processor.
+
+        Returns
+        -------
+        list[PrelumpsAccumulator or None]
+            Per processor, None for the processors not persisting the file.
+        """
+        return [
+            PrelumpsAccumulator(num_lumped=len(processor.lumped_states))
+            if trans_path in keys
+            else None
+            for processor, keys in zip(self.processors, prelumps_keys)
+        ]
+
+    def _persist_prelumps(self, trans_path, accumulators, prelumps_keys):
+        """Persist the prelumps of a .trans file and merge them into the processors.
+
+        Parameters
+        ----------
+        trans_path : Path or None
+        accumulators : list[PrelumpsAccumulator or None]
+            See `_file_accumulators`.
+        prelumps_keys : list[dict[Path, dict]]
+            The keys of the .trans files still to be persisted, per processor, the
+            keys of the `trans_path` are removed.
+        """
+        for processor, accumulator, keys in zip(
+            self.processors, accumulators, prelumps_keys
+        ):
+            if accumulator is None:
+                continue
+            prelumps = accumulator.get_store()
+            save_file_prelumps(processor.prelumps_dir, keys.pop(trans_path), prelumps)
+            if len(prelumps[0]):
+                processor._lump_transitions_partial(prelumps)
+
+    def process(self, include_original_lifetimes=False):
+        """Lump states and transitions of all the processors and log all their outputs.
+
+        See `DatasetProcessor.process`.
+
+        Parameters
+        ----------
+        include_original_lifetimes : bool, default=False
+        """
+        for processor in self.processors:
+            processor.include_original_lifetimes = include_original_lifetimes
+            processor._prepare_output_dir()
+        # the shared states pass is only skipped if all the processors have their
+        # persisted states lumping results
+        if not all(
+            [
+                processor.persist_states and processor.load_lumped_states()
+                for processor in self.processors
+            ]
+        ):
+            self.lump_states()
+            for processor in self.processors:
+                if processor.persist_states:
+                    processor.save_lumped_states()
+        for processor in self.processors:
+            processor._log_dataset_metadata()
+            processor._log_states_metadata()
+            processor._log_states_data()
+        self.lump_transitions()
+        for processor in self.processors:
+            processor._log_dataset_metadata()  # updated timestamp
+            processor._log_states_data()
+            processor._log_transitions_data()
+            processor._log_manifest()
+
+
+def group_processors(
+    mol_formulas, raise_exceptions=True, resume=False, incremental=False, force=False
+):
+    """Instantiate the processors of the molecules and group them by their datasets.
+
+    Parameters
+    ----------
+    mol_formulas : iterable of str
+        Molecular formulas, must be among the keys in ``input.molecules.molecules``
+        dictionary.
+    raise_exceptions : bool, default=True
+        If False, the molecules whose processors cannot be instantiated are left out
+        of the groups, and their errors are returned instead of being raised.
+    resume : bool, default=False
+    incremental : bool, default=False
+    force : bool, default=False
+        See `exomol2lida.process_dataset.process_molecule`. The molecules up to date
+        are left out of the groups if `incremental`.
+
+    Returns
+    -------
+    groups : list[list[DatasetProcessor]]
+        Processors of the molecules lumped from the same dataset (the same mol_slug,
+        iso_slug, dataset_name and states header).
+    errors : dict[str, str]
+        Statuses of the molecules left out, such as "UP TO DATE" or the error messages
+        like "PROCESSING ABORTED: MoleculeInputError: ...".
+
+    Raises
+    ------
+    MoleculeInputError
+    DefParseError
+    FileExistsError
+    """
+    groups, errors = {}, {}
+    for mol_formula in mol_formulas:
+        try:
+            processor = DatasetProcessor(
+                mol_formula, resume=resume, force=(force or incremental)
+            )
+            if incremental and processor.is_up_to_date:
+                errors[mol_formula] = "UP TO DATE"
+                continue
+        except (MoleculeInputError, DefParseError) as e:
+            if raise_exceptions:
+                raise
+            errors[mol_formula] = f"PROCESSING ABORTED: {type(e).__name__}: {e}"
+            continue
+        except FileExistsError as e:
+            if raise_exceptions:
+                raise
+            errors[mol_formula] = f"PROCESSED ALREADY: {type(e).__name__}: {e}"
+            continue
+        mol_input = processor.molecule_input
+        key = (
+            mol_input.mol_slug,
+            mol_input.iso_slug,
+            mol_input.dataset_name,
+            tuple(processor.states_header),
+        )
+        groups.setdefault(key, []).append(processor)
+    return list(groups.values()), errors
+
+
+def process_molecules(
+    mol_formulas,
+    include_original_lifetimes=False,
+    postprocess=False,
+    raise_exceptions=True,
+    incremental=False,
+    force=False,
+):
+    """A top-level function for processing the exomol datasets of several molecules.
+
+    The molecules lumped from the same dataset (the same mol_slug, iso_slug and
+    dataset_name) are processed together by the `SharedDatasetProcessor`, in a single
+    pass over the dataset files. The outputs are the same as with processing each of
+    the molecules by the `process_molecule`.
+
+    Parameters
+    ----------
+    mol_formulas : iterable of str
+        Molecular formulas, must be among the keys in ``input.molecules.molecules``
+        dictionary.
+    include_original_lifetimes : bool, default=False
+    postprocess : bool, default=False
+    raise_exceptions : bool, default=True
+    incremental : bool, default=False
+    force : bool, default=False
+        See `exomol2lida.process_dataset.process_molecule`.
+
+    Raises
+    ------
+    MoleculeInputError
+    DefParseError
+    FileExistsError
+    """
+    groups, errors = group_processors(
+        mol_formulas,
+        raise_exceptions=raise_exceptions,
+        incremental=incremental,
+        force=force,
+    )
+    for mol_formula, error in errors.items():
+        print(f"{mol_formula}: {error}")
+
+    for processors in groups:
+        if len(processors) == 1:
+            shared_processor = processors[0]
+        else:
+            shared_processor = SharedDatasetProcessor(processors)
+        try:
+            shared_processor.process(
+                include_original_lifetimes=include_original_lifetimes
+            )
+        except (MoleculeInputError, DefParseError) as e:
+            if raise_exceptions:
+                raise
+            print(
+                f"{shared_processor.formula}: PROCESSING ABORTED: "
+                f"{type(e).__name__}: {e}"
+            )
+        for processor in processors:
+            if postprocess:
+                postprocess_molecule(
+                    processor.formula, raise_exceptions=raise_exceptions
+                )
+            else:
+                print()
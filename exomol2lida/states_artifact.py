@@ -0,0 +1,153 @@
+"""
+Module with the persisted results of the states lumping, allowing to rerun only the
+transitions lumping without re-reading and re-lumping the .states file.
+
+The artifact is a directory of raw *.npy* arrays and a meta.json: the lumped states
+columns (the string columns as integer codes into the categories in the meta.json),
+the dense map between the original and lumped state ids, the Boltzmann weights of the
+original states, and the original lifetimes of the lumped states (if collected). The
+large arrays indexed by the original state ids are memory-mapped when loaded. The map
+between the lumped and original ids is not stored, as it is rebuilt from the dense map.
+
+The artifact is keyed by the .states file (its path and content) and by all the
+settings the states lumping depends on, and it is only loaded if its key matches.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class StatesArtifact:
+    """Persisted results of the states lumping of a single molecule.
+
+    Parameters
+    ----------
+    key : dict
+        Identifies the .states file and the settings of the states lumping.
+    lumped_states : pandas.DataFrame
+    states_map : numpy.ndarray
+        Dense map between the original and lumped state ids.
+    boltzmann_weights : numpy.ndarray
+        Boltzmann weights of the original states, indexed by the original ids.
+    lumped_to_tau : dict[int, list[float]], optional
+        Original lifetimes of the states in each lumped state.
+    """
+
+    meta_file = "meta.json"
+
+    def __init__(
+        self, key, lumped_states, states_map, boltzmann_weights, lumped_to_tau=None
+    ):
+        self.key = key
+        self.lumped_states = lumped_states
+        self.states_map = states_map
+        self.boltzmann_weights = boltzmann_weights
+        self.lumped_to_tau = lumped_to_tau
+
+    @classmethod
+    def load(cls, artifact_dir, key):
+        """Load the artifact from the `artifact_dir`, if it matches the `key`.
+
+        Parameters
+        ----------
+        artifact_dir : str or Path
+        key : dict
+
+        Returns
+        -------
+        StatesArtifact or None
+        """
+        artifact_dir = Path(artifact_dir)
+        try:
+            with open(artifact_dir / cls.meta_file) as fp:
+                meta = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if meta["key"] != key:
+            return None
+
+        def load_array(name, mmap_mode=None):
+            return np.load(artifact_dir / f"{name}.npy", mmap_mode=mmap_mode)
+
+        data = {}
+        for n, col in enumerate(meta["columns"]):
+            values = load_array(f"column_{n}")
+            if "categories" in col:
+                # the missing values have the code of -1, pointing at NaN
+                categories = np.array(col["categories"] + [np.nan], dtype=object)
+                values = categories[values]
+            data[col["name"]] = values
+        lumped_states = pd.DataFrame(data, index=pd.RangeIndex(meta["num_lumped"]))
+        lumped_to_tau = None
+        if meta["tau_keys"] is not None:
+            tau_values = load_array("tau_values").tolist()
+            tau_offsets = np.cumsum([0] + meta["tau_counts"]).tolist()
+            lumped_to_tau = {
+                lumped_id: tau_values[start:end]
+                for lumped_id, start, end in zip(
+                    meta["tau_keys"], tau_offsets[:-1], tau_offsets[1:]
+                )
+            }
+        return cls(
+            key=key,
+            lumped_states=lumped_states,
+            states_map=load_array("states_map", mmap_mode="r"),
+            boltzmann_weights=load_array("boltzmann_weights", mmap_mode="r"),
+            lumped_to_tau=lumped_to_tau,
+        )
+
+    def save(self, artifact_dir):
+        """Save the artifact into the `artifact_dir`, replacing any previous one.
+
+        The artifact is written into a temporary directory first, and only moved in
+        place once complete.
+
+        Parameters
+        ----------
+        artifact_dir : str or Path
+        """
+        artifact_dir = Path(artifact_dir)
+        tmp_dir = artifact_dir.with_name(f"{artifact_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        try:
+            meta = {
+                "key": self.key,
+                "num_lumped": len(self.lumped_states),
+                "columns": [],
+                "tau_keys": None,
+                "tau_counts": None,
+            }
+            for n, (name, values) in enumerate(self.lumped_states.items()):
+                col = {"name": name}
+                if values.dtype == object:
+                    # string columns are stored as codes into categories
+                    codes, categories = pd.factorize(values.to_numpy())
+                    col["categories"] = categories.tolist()
+                    values = codes.astype("int32")
+                else:
+                    values = values.to_numpy()
+                np.save(tmp_dir / f"column_{n}.npy", values)
+                meta["columns"].append(col)
+            np.save(tmp_dir / "states_map.npy", np.asarray(self.states_map))
+            np.save(
+                tmp_dir / "boltzmann_weights.npy", np.asarray(self.boltzmann_weights)
+            )
+            if self.lumped_to_tau is not None:
+                meta["tau_keys"] = list(self.lumped_to_tau)
+                meta["tau_counts"] = [len(tau) for tau in self.lumped_to_tau.values()]
+                tau_values = [t for tau in self.lumped_to_tau.values() for t in tau]
+                np.save(
+                    tmp_dir / "tau_values.npy", np.array(tau_values, dtype="float64")
+                )
+            with open(tmp_dir / self.meta_file, "w") as fp:
+                json.dump(meta, fp, indent=2)
+            shutil.rmtree(artifact_dir, ignore_errors=True)
+            os.replace(tmp_dir, artifact_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
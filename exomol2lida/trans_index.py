@@ -0,0 +1,533 @@
+"""
+Module with the sidecar block index of the .trans files, allowing to skip the parts of
+the .trans files without any transitions between the states which survived filtering.
+
+Each .trans file is split into *units*, which can be read independently of each
+other: the compressed blocks of *.bz2* files (see
+`exomol2lida.read_data.iter_bz2_units`) or fixed-size byte ranges of uncompressed
+files. The lines of a .trans file are not aligned with the units, each line belongs to
+the unit it starts in, and the `heads` of the units record the lengths of the
+fragments of the lines started in the preceding units. For each unit, the index
+records its offsets and the number of its lines with the minimal and maximal initial
+and final state ids.
+
+Any transition between two states, one of which has been filtered out, is discarded
+during the transitions lumping. A unit without any surviving state id within the
+range of its initial state ids or within the range of its final state ids can
+therefore be skipped without being decompressed or parsed, without any effect on the
+lumping outputs.
+
+The index is built lazily on the first full read of each .trans file and stored in a
+directory of indices, keyed by the .trans file path and its content. The lines of
+consecutive units are parsed in blocks by either of the .trans readers (see
+`exomol2lida.read_data.parse_trans_lines`), with or without any index.
+
+Each parsed block comes with the *position* the reading of the file can be resumed
+from right after the block: the offset of the following unit and its head. Resuming
+from a position seeks straight to its unit, without decompressing or parsing any of
+the preceding units. A position can also be any offset with an unknown (None) head:
+the reading then starts with the first unit starting at or after the offset, and
+without the line ending in it (up to its first newline), which belongs to the reading
+stopped at such a position instead. The large .trans files can therefore be split
+into *spans* (see `trans_spans`) read independently of each other.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .cache import get_file_key
+from .read_data import (
+    TRANS_BLOCK_SIZE,
+    _decompress_block,
+    iter_bz2_units,
+    ordered_map,
+    parse_trans_lines,
+    trans_frames,
+)
+
+# size of the units of the uncompressed .trans files
+UNIT_SIZE = 1 << 24
+
+
+class TransBlockIndex:
+    """Block index of a single .trans file.
+
+    Parameters
+    ----------
+    starts, ends : numpy.ndarray
+        Offsets of the units: bit offsets for the *.bz2* files, byte offsets
+        otherwise.
+    heads : numpy.ndarray
+        Numbers of the (decompressed) bytes at the beginning of each unit belonging to
+        the line started in the preceding unit.
+    num_rows : numpy.ndarray
+        Numbers of the lines started in each unit.
+    min_i, max_i, min_f, max_f : numpy.ndarray
+        Ranges of the initial and final state ids of the lines started in each unit.
+    """
+
+    fields = ("starts", "ends", "heads", "num_rows", "min_i", "max_i", "min_f", "max_f")
+
+    def __init__(self, starts, ends, heads, num_rows, min_i, max_i, min_f, max_f):
+        self.starts = np.asarray(starts, dtype="int64")
+        self.ends = np.asarray(ends, dtype="int64")
+        self.heads = np.asarray(heads, dtype="int64")
+        self.num_rows = np.asarray(num_rows, dtype="int64")
+        self.min_i = np.asarray(min_i, dtype="int64")
+        self.max_i = np.asarray(max_i, dtype="int64")
+        self.min_f = np.asarray(min_f, dtype="int64")
+        self.max_f = np.asarray(max_f, dtype="int64")
+
+    def __len__(self):
+        return len(self.starts)
+
+    @staticmethod
+    def get_path(index_dir, trans_path):
+        """Get the path of the index of the .trans file in the `index_dir`.
+
+        Parameters
+        ----------
+        index_dir : str or Path
+        trans_path : str or Path
+
+        Returns
+        -------
+        tuple[Path, dict]
+            The index path and the key of the .trans file.
+        """
+        key = get_file_key(trans_path)
+        name = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return Path(index_dir) / f"{name[:20]}.npz", key
+
+    @classmethod
+    def load(cls, index_dir, trans_path):
+        """Load the index of the .trans file, if it has been built already.
+
+        Parameters
+        ----------
+        index_dir : str or Path
+        trans_path : str or Path
+
+        Returns
+        -------
+        TransBlockIndex or None
+        """
+        index_path, key = cls.get_path(index_dir, trans_path)
+        if not index_path.is_file():
+            return None
+        with np.load(index_path) as data:
+            if json.loads(str(data["key"])) != key:
+                return None
+            return cls(**{field: data[field] for field in cls.fields})
+
+    def save(self, index_dir, trans_path):
+        """Save the index of the .trans file into the `index_dir`.
+
+        Parameters
+        ----------
+        index_dir : str or Path
+        trans_path : str or Path
+        """
+        index_path, key = self.get_path(index_dir, trans_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_name(f"{index_path.stem}.tmp-{os.getpid()}.npz")
+        np.savez(
+            tmp_path,
+            key=json.dumps(key),
+            **{field: getattr(self, field) for field in self.fields},
+        )
+        os.replace(tmp_path, index_path)
+
+    def select(self, state_ids):
+        """Select the units with any transitions between the `state_ids`.
+
+        Parameters
+        ----------
+        state_ids : numpy.ndarray
+            Sorted ids of all the surviving original states.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean mask of the units which need to be read.
+        """
+
+        def any_within(low, high):
+            return np.searchsorted(state_ids, high, side="right") > np.searchsorted(
+                state_ids, low, side="left"
+            )
+
+        return any_within(self.min_i, self.max_i) & any_within(self.min_f, self.max_f)
+
+
+class _UnitsReader:
+    """Reader of the units of a single .trans file."""
+
+    def __init__(self, trans_path, num_threads):
+        self.trans_path = Path(trans_path)
+        self.num_threads = num_threads
+        self.compressed = str(trans_path).endswith("bz2")
+        self._file = open(self.trans_path, "rb")
+        if self.trans_path.stat().st_size:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def all_units(self, start=0, stop=None):
+        """Generate (start, end, data) of all the units of the file from the first
+        unit starting at or after the `start` offset, up to (and including) the first
+        unit starting at or after the `stop` offset."""
+        if self.compressed:
+            yield from iter_bz2_units(
+                self._buffer,
+                self.num_threads,
+                self.trans_path.name,
+                start=start,
+                stop=stop,
+            )
+            return
+        first = -(-start // UNIT_SIZE) * UNIT_SIZE
+        for unit_start in range(first, len(self._buffer), UNIT_SIZE):
+            end = min(unit_start + UNIT_SIZE, len(self._buffer))
+            yield unit_start, end, self._buffer[unit_start:end]
+            if stop is not None and unit_start >= stop:
+                return
+
+    def units(self, starts, ends):
+        """Generate the data of the units with the given offsets."""
+        if self.compressed:
+            return ordered_map(
+                lambda unit: _decompress_block(self._buffer, *unit),
+                # python ints, the bit arithmetics overflows with the numpy ones
+                list(zip(starts.tolist(), ends.tolist())),
+                self.num_threads,
+            )
+        return (self._buffer[start:end] for start, end in zip(starts, ends))
+
+
+def _first_line_end(data):
+    """Get the length of the data up to (and including) its first newline."""
+    newline = data.find(b"\n")
+    return len(data) if newline == -1 else newline + 1
+
+
+def _get_head(data, previous_data):
+    """Get the length of the fragment of the line started in the previous unit."""
+    if previous_data is None or previous_data.endswith(b"\n"):
+        return 0
+    return _first_line_end(data)
+
+
+def _all_unit_lines(units, start=(0, 0), stop=None):
+    """Generate the offsets, the head and the whole lines started in each unit from
+    the `start` position up to the `stop` position (see `indexed_trans_columns`),
+    along with the position of the following unit."""
+    offset, head = start
+    stop_offset = None if stop is None else stop[0]
+    previous = None  # (start, end, head, data) of the previous unit
+    for unit_start, end, data in units.all_units(offset, stop_offset):
+        at_stop = stop_offset is not None and unit_start >= stop_offset
+        if previous is None:
+            if head is None:
+                head = _first_line_end(data)
+        else:
+            # the unknown head at the stop the same as at the start of the next span
+            at_unknown = at_stop and stop[1] is None
+            head = _first_line_end(data) if at_unknown else _get_head(data, previous[3])
+            p_start, p_end, p_head, p_data = previous
+            lines = p_data[p_head:] + data[:head]
+            yield p_start, p_end, p_head, lines, (unit_start, head)
+        if at_stop:
+            return
+        previous = (unit_start, end, head, data)
+    if previous is not None:
+        p_start, p_end, p_head, p_data = previous
+        yield p_start, p_end, p_head, p_data[p_head:], (p_end, 0)
+
+
+def _selected_unit_lines(units, index, selected, heads):
+    """Generate the whole lines started in each of the selected units, using the
+    index (with the `heads` in place of its heads, None for the unknown ones), along
+    with the position of the following unit."""
+    # each selected unit needs also the head of the following unit
+    needed = selected.copy()
+    needed[1:] |= selected[:-1]
+    needed = np.flatnonzero(needed)
+
+    def get_head(n, data):
+        return _first_line_end(data) if heads[n] is None else heads[n]
+
+    def following(n):
+        if n + 1 < len(index):
+            return int(index.starts[n + 1]), heads[n + 1]
+        return int(index.ends[n]), 0
+
+    previous = None  # (n, data, head) of the previous needed unit
+    for n, data in zip(needed, units.units(index.starts[needed], index.ends[needed])):
+        head = get_head(n, data)
+        if previous is not None and selected[previous[0]]:
+            tail = data[:head] if previous[0] + 1 == n else b""
+            position = following(previous[0])
+            if position[1] is None and previous[0] + 1 == n:
+                position = position[0], head
+            yield previous[1][previous[2] :] + tail, position
+        previous = (n, data, head)
+    if previous is not None and selected[previous[0]]:
+        yield previous[1][previous[2] :], following(previous[0])
+
+
+def _parse_unit_lines(lines, file_name, reader):
+    if not lines.strip():
+        empty = np.empty(0, dtype="uint32")
+        return empty, empty, np.empty(0, dtype="float64")
+    return parse_trans_lines(lines, file_name, reader)
+
+
+def _parse_batch(batch, file_name, reader):
+    """Parse the lines of several consecutive units at once.
+
+    Returns
+    -------
+    columns : tuple[numpy.ndarray]
+        The i, f and A_if arrays of all the units.
+    num_rows : list[int]
+        Numbers of the rows of each of the units.
+    """
+    num_rows = [lines.count(b"\n") for lines in batch]
+    columns = _parse_unit_lines(b"".join(batch), file_name, reader)
+    if len(columns[0]) != sum(num_rows):
+        # some of the lines are blank, parse the units one by one
+        parsed = [_parse_unit_lines(lines, file_name, reader) for lines in batch]
+        columns = tuple(np.concatenate(column) for column in zip(*parsed))
+        num_rows = [len(unit_columns[0]) for unit_columns in parsed]
+    return columns, num_rows
+
+
+def _parsed_batches(units_lines, file_name, reader):
+    """Parse the whole lines of consecutive units in batches of roughly
+    `TRANS_BLOCK_SIZE` bytes.
+
+    Parameters
+    ----------
+    units_lines : iterable of tuple[bytes, tuple[int, int]]
+        The whole lines of each unit and the position of the following unit.
+    file_name : str
+    reader : str
+
+    Yields
+    ------
+    columns : tuple[numpy.ndarray]
+    num_rows : list[int]
+        See `_parse_batch`.
+    position : tuple[int, int]
+        Position of the unit following the batch.
+    """
+    batch, batch_size = [], 0
+    for lines, position in units_lines:
+        if lines and not lines.endswith(b"\n"):
+            lines += b"\n"
+        batch.append(lines)
+        batch_size += len(lines)
+        if batch_size >= TRANS_BLOCK_SIZE:
+            yield *_parse_batch(batch, file_name, reader), position
+            batch, batch_size = [], 0
+    if batch:
+        yield *_parse_batch(batch, file_name, reader), position
+
+
+def _indexing_columns(units, index_dir, reader):
+    """Parse all the units of the file, building and saving its index on the way."""
+    stats = {field: [] for field in TransBlockIndex.fields}
+
+    def units_lines():
+        for start, end, head, lines, position in _all_unit_lines(units):
+            stats["starts"].append(start)
+            stats["ends"].append(end)
+            stats["heads"].append(head)
+            yield lines, position
+
+    for (i, f, a_if), num_rows, position in _parsed_batches(
+        units_lines(), units.trans_path.name, reader
+    ):
+        row = 0
+        for unit_rows in num_rows:
+            _add_unit_ranges(stats, i[row : row + unit_rows], f[row : row + unit_rows])
+            row += unit_rows
+        yield i, f, a_if, position
+    TransBlockIndex(**stats).save(index_dir, units.trans_path)
+
+
+def _add_unit_ranges(stats, i, f):
+    stats["num_rows"].append(len(i))
+    if len(i):
+        stats["min_i"].append(i.min())
+        stats["max_i"].append(i.max())
+        stats["min_f"].append(f.min())
+        stats["max_f"].append(f.max())
+    else:
+        # an empty range, never selected
+        stats["min_i"].append(1)
+        stats["max_i"].append(0)
+        stats["min_f"].append(1)
+        stats["max_f"].append(0)
+
+
+def indexed_trans_chunks(
+    trans_paths,
+    chunk_size,
+    index_dir=None,
+    state_ids=None,
+    num_threads=1,
+    reader="numpy",
+):
+    """Get a generator of chunks of all the dataset .trans files, skipping the units
+    without any transitions between the `state_ids`.
+
+    The .trans files without an index in the `index_dir` are read fully, and their
+    indices are built and saved. The lines of consecutive units are parsed in blocks
+    by the `reader`, the same way as by the
+    `exomol2lida.read_data.read_trans_chunks`.
+
+    Parameters
+    ----------
+    trans_paths : iterable of (str or Path)
+    chunk_size : int
+    index_dir : str or Path, optional
+        Directory of the indices. If not given, the .trans files are read fully
+        without being indexed.
+    state_ids : numpy.ndarray, optional
+        Sorted ids of all the surviving original states. If not given, nothing is
+        skipped.
+    num_threads : int, default=1
+        Number of threads decompressing each *.bz2* file by blocks.
+    reader : {"exomole", "numpy"}, default="numpy"
+        See `exomol2lida.read_data.parse_trans_lines`.
+
+    Yields
+    ------
+    trans_chunk : pandas.DataFrame
+        With the uint32 columns "i", "f" and the float64 column "A_if".
+    """
+    for trans_path in sorted(trans_paths):
+        blocks = indexed_trans_columns(
+            trans_path, index_dir, state_ids, num_threads, reader=reader
+        )
+        yield from trans_frames((block[:3] for block in blocks), chunk_size)
+
+
+def indexed_trans_columns(
+    trans_path,
+    index_dir=None,
+    state_ids=None,
+    num_threads=1,
+    reader="numpy",
+    start=None,
+    stop=None,
+):
+    """Generate the i, f and A_if arrays of the blocks of a single .trans file,
+    skipping the units without any transitions between the `state_ids`.
+
+    See `indexed_trans_chunks`, no frames are built here.
+
+    Parameters
+    ----------
+    trans_path : str or Path
+    index_dir : str or Path, optional
+    state_ids : numpy.ndarray, optional
+    num_threads : int, default=1
+    reader : {"exomole", "numpy"}, default="numpy"
+    start : tuple[int, int or None], optional
+        Position to start the reading from, such as yielded with any of the blocks
+        before, or the start of a span. If not given, the file is read from its
+        beginning (and its index is built, if missing and not stopping early).
+    stop : tuple[int, None], optional
+        Position to stop the reading at, such as the stop of a span. If not given,
+        the file is read up to its end.
+
+    Yields
+    ------
+    tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, tuple[int, int or None]]
+        The uint32 i, uint32 f and float64 A_if arrays, and the position right after
+        the block.
+    """
+    index = None if index_dir is None else TransBlockIndex.load(index_dir, trans_path)
+    with _UnitsReader(trans_path, num_threads) as units:
+        if index_dir is not None and index is None and start is stop is None:
+            yield from _indexing_columns(units, index_dir, reader)
+            return
+        if index is None:
+            units_lines = (
+                (lines, position)
+                for *_, lines, position in _all_unit_lines(
+                    units, start or (0, 0), stop
+                )
+            )
+        else:
+            selected = np.ones(len(index), dtype=bool)
+            if state_ids is not None:
+                selected = index.select(state_ids)
+            heads = index.heads.tolist() + [0]
+            if start is not None:
+                first = np.searchsorted(index.starts, start[0])
+                selected[:first] = False
+                heads[first] = start[1]
+            if stop is not None:
+                last = np.searchsorted(index.starts, stop[0])
+                selected[last:] = False
+                heads[last] = stop[1]
+            units_lines = _selected_unit_lines(units, index, selected, heads)
+        for (i, f, a_if), _, position in _parsed_batches(
+            units_lines, units.trans_path.name, reader
+        ):
+            yield i, f, a_if, position
+
+
+def trans_spans(trans_path, span_size, start=None, index_dir=None):
+    """Split a .trans file into spans, which can be read independently of each other.
+
+    Parameters
+    ----------
+    trans_path : str or Path
+    span_size : int
+        Approximate size of the spans in bytes of the (compressed) file.
+    start : tuple[int, int or None], optional
+        Position to start the first span from (the beginning of the file if not
+        given).
+    index_dir : str or Path, optional
+        Directory of the indices. The .trans files to be indexed (without any index
+        in the `index_dir` yet) are not split, so they are read in full, and their
+        indices are built.
+
+    Returns
+    -------
+    list[tuple]
+        The start and stop positions of the spans (see `indexed_trans_columns`).
+    """
+    trans_path = Path(trans_path)
+    if (
+        start is None
+        and index_dir is not None
+        and TransBlockIndex.load(index_dir, trans_path) is None
+    ):
+        return [(None, None)]
+    # bit offsets in the *.bz2* files
+    scale = 8 if str(trans_path).endswith("bz2") else 1
+    first = 0 if start is None else start[0] // scale
+    boundaries = [
+        (offset * scale, None)
+        for offset in range(first + span_size, trans_path.stat().st_size, span_size)
+    ]
+    return list(zip([start, *boundaries], [*boundaries, None]))
@@ -1,25 +1,77 @@
 import sys
 from functools import partial
 
+from exomol2lida.manifest import scan_outputs
 from exomol2lida.process_dataset import process_molecule
+from exomol2lida.scheduler import schedule_molecules
+from exomol2lida.shared_dataset import process_molecules
 
 if __name__ == "__main__":
     mol_formula = sys.argv[1]
     args = sys.argv[2:]
-    allowed_args = {"--include-tau", "--postprocess"}
+    num_jobs = None
+    if "--jobs" in args:
+        # process the molecules in parallel jobs: --jobs N
+        n = args.index("--jobs")
+        num_jobs = int(args[n + 1])
+        del args[n : n + 2]
+    allowed_args = {
+        "--include-tau",
+        "--postprocess",
+        "--separately",
+        "--resume",
+        "--incremental",
+        "--force",
+        "--scan",
+    }
     assert set(args).issubset(allowed_args)
+    incremental = "--incremental" in args
+    force = "--force" in args
 
     proc_mol = partial(
         process_molecule,
         include_original_lifetimes=("--include-lifetimes" in args),
         postprocess=("--postprocess" in args),
         raise_exceptions=False,
+        resume=("--resume" in args),
+        incremental=incremental,
+        force=force,
     )
 
     if mol_formula.lower() == "all":
         from input.molecules import molecules as mol_formulas
+    else:
+        mol_formulas = [mol_formula]
 
-        for mf in mol_formulas:
-            proc_mol(mf)
+    if "--scan" in args:
+        # only report if the outputs are up to date with the current inputs
+        for mf, status in scan_outputs(mol_formulas).items():
+            print(f"{mf}: {status}")
+    elif mol_formula.lower() == "all":
+        if num_jobs is not None:
+            schedule_molecules(
+                mol_formulas,
+                num_jobs,
+                include_original_lifetimes=("--include-lifetimes" in args),
+                postprocess=("--postprocess" in args),
+                separately=("--separately" in args),
+                resume=("--resume" in args),
+                incremental=incremental,
+                force=force,
+            )
+        elif "--separately" in args or "--resume" in args:
+            # only the molecules processed one by one are checkpointed
+            for mf in mol_formulas:
+                proc_mol(mf)
+        else:
+            # the molecules sharing the same dataset are processed in a single pass
+            process_molecules(
+                mol_formulas,
+                include_original_lifetimes=("--include-lifetimes" in args),
+                postprocess=("--postprocess" in args),
+                raise_exceptions=False,
+                incremental=incremental,
+                force=force,
+            )
     else:
         proc_mol(mol_formula)
@@ -1,14 +1,19 @@
 """
 These are integration tests ensuring that the chunk_sizes and number of .trans files
-do not have any effect on the states and transitions lumping outputs.
+do not have any effect on the states and transitions lumping outputs, nor do any of
+the processing settings, checked against the expected outputs in the test resources.
 """
 
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pytest
 
+from exomol2lida import trans_index
 from exomol2lida.read_inputs import MoleculeInput
 from exomol2lida.process_dataset import DatasetProcessor
+from exomol2lida.shared_dataset import SharedDatasetProcessor
 
 test_resources_dir = Path(__file__).parent / "resources"
 
@@ -43,6 +48,13 @@ states_path = test_resources_dir / "dummy_data.states.bz2"
 trans_paths_full = [test_resources_dir / "dummy_data.trans.bz2"]
 trans_paths_split = sorted(test_resources_dir.glob("dummy_data.trans_0*.bz2"))
 
+# the outputs of the lumping of the test files with the trans_paths_split and the
+# default settings, as lumped before any of the processing optimizations
+expected_outputs_paths = {
+    "lumped_states": test_resources_dir / "expected_lumped_states.csv",
+    "lumped_transitions": test_resources_dir / "expected_lumped_transitions.csv",
+}
+
 shared_for_comparison = {
     "lumped_states": None,
     "states_map_lumped_to_original": None,
@@ -54,6 +66,59 @@ shared_for_comparison = {
 }
 
 
+@pytest.fixture(scope="module")
+def expected():
+    """The expected lumping outputs, read from the test resources."""
+    return {
+        name: pd.read_csv(path, float_precision="round_trip")
+        for name, path in expected_outputs_paths.items()
+    }
+
+
+@pytest.fixture
+def get_processor(monkeypatch, tmp_path):
+    """Factory of the processors of the test files, with the outputs in the tmp_path.
+
+    The attributes passed override those of the processor, which lumps the states
+    straight away unless `lump_states` is False.
+    """
+
+    def get_processor(
+        molecule=mol_input,
+        trans_paths=trans_paths_split,
+        lump_states=True,
+        resume=False,
+        temperatures=None,
+        **attributes,
+    ):
+        processor = DatasetProcessor(
+            molecule=molecule, resume=resume, temperatures=temperatures
+        )
+        monkeypatch.setattr(processor, "states_path", states_path)
+        monkeypatch.setattr(processor, "trans_paths", trans_paths)
+        monkeypatch.setattr(processor, "output_dir", tmp_path / processor.formula)
+        processor.trans_chunk_size = 100_000
+        for name, value in attributes.items():
+            monkeypatch.setattr(processor, name, value)
+        if lump_states:
+            processor.lump_states()
+        return processor
+
+    return get_processor
+
+
+def assert_expected_outputs(processor, expected):
+    """Assert the lumped states and transitions of the processor are exactly the
+    expected ones."""
+    for name, expected_output in expected.items():
+        pd.testing.assert_frame_equal(
+            getattr(processor, name).reset_index(drop=True),
+            expected_output,
+            check_dtype=False,
+            check_exact=True,
+        )
+
+
 @pytest.mark.parametrize("chunk_size", (1_000_000, 100_000, 10_000, 5_000))
 def test_states_lumping(monkeypatch, chunk_size):
     processor = DatasetProcessor(molecule=mol_input)
@@ -120,3 +185,300 @@ def test_trans_lumping(monkeypatch, trans_paths, chunk_size):
         assert processor.lumped_transitions.equals(
             shared_for_comparison["lumped_transitions"]
         )
+
+
+
+
+@pytest.mark.parametrize("states_chunk_size", (100_000, 5_000))
+def test_trans_lumping_states_chunk_size(get_processor, expected, states_chunk_size):
+    # the boltzmann weights of the initial states must be gathered from all the
+    # .states chunks, not only from the last one
+    processor = get_processor(states_chunk_size=states_chunk_size)
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+
+
+@pytest.mark.parametrize("num_workers, chunk_size", ((2, 100_000), (3, 10_000)))
+def test_trans_lumping_parallel(get_processor, expected, num_workers, chunk_size):
+    processor = get_processor(trans_chunk_size=chunk_size, num_workers=num_workers)
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+
+
+@pytest.mark.parametrize("trans_paths", (trans_paths_full, trans_paths_split))
+def test_lumping_block_parallel_decompression(get_processor, expected, trans_paths):
+    processor = get_processor(
+        trans_paths=trans_paths, states_chunk_size=10_000, decompression_threads=3
+    )
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_trans_lumping_numpy_reader(get_processor, expected, num_workers):
+    processor = get_processor(trans_reader="numpy", num_workers=num_workers)
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_trans_lumping_block_index(get_processor, expected, tmp_path, num_workers):
+    index_dir = tmp_path / "trans_index"
+    processor = get_processor(trans_index_dir=index_dir, num_workers=num_workers)
+    # the first pass builds the indices, the second one uses them
+    for _ in range(2):
+        processor.lump_transitions()
+        assert_expected_outputs(processor, expected)
+    assert len(list(index_dir.glob("*.npz"))) == len(trans_paths_split)
+
+
+@pytest.mark.parametrize("trans_reader", ("exomole", "numpy"))
+def test_trans_lumping_spans(get_processor, expected, tmp_path, trans_reader):
+    processor = get_processor(
+        trans_chunk_size=10_000,
+        trans_reader=trans_reader,
+        trans_span_size=300_000,
+        num_workers=3,
+    )
+    # the files are split into spans, unless they are to be indexed first
+    index_dir = tmp_path / "trans_index"
+    for trans_index_dir in (None, index_dir, index_dir):
+        processor.trans_index_dir = trans_index_dir
+        processor.lump_transitions()
+        assert_expected_outputs(processor, expected)
+
+
+# the same dataset with complementary filters, like HCN and HNC
+mol_input_other = MoleculeInput(
+    molecule_formula="BAR",
+    **{**mol_input.raw_input, "only_with": {"iso": "0"}, "energy_max": 0.5},
+)
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_shared_dataset_lumping(get_processor, expected, num_workers):
+    separate = [
+        get_processor(molecule=molecule, num_workers=num_workers)
+        for molecule in (mol_input, mol_input_other)
+    ]
+    for processor in separate:
+        processor.lump_transitions()
+    assert_expected_outputs(separate[0], expected)
+    shared = [
+        get_processor(molecule=molecule, lump_states=False, num_workers=num_workers)
+        for molecule in (mol_input, mol_input_other)
+    ]
+    shared_processor = SharedDatasetProcessor(shared)
+    shared_processor.lump_states()
+    shared_processor.lump_transitions()
+
+    assert len(separate[1].lumped_transitions)
+    for processor, shared_processor in zip(separate, shared):
+        assert shared_processor.lumped_states.equals(processor.lumped_states)
+        assert (
+            shared_processor.states_map_lumped_to_original
+            == processor.states_map_lumped_to_original
+        )
+        assert shared_processor.lumped_transitions.equals(
+            processor.lumped_transitions
+        )
+
+
+# the chunks end at the ends of the blocks, parsed here for each bz2 unit (of about
+# 25,000 lines), so there are 4 chunks per file. The last checkpoint is saved after 6
+# chunks, in the middle of the second file, and the resumed reading seeks straight past
+# them. With the workers, each of the files (not split into spans at the default span
+# size) comes as a single partial, and the last checkpoint is saved after 3 files, so
+# only the (empty) rest of the third file and the last 2 files are read again.
+@pytest.mark.parametrize(
+    "num_workers, limit, num_resumed",
+    ((1, 8, 4 * len(trans_paths_split) - 6), (2, 4, 3)),
+)
+def test_trans_lumping_resume(
+    monkeypatch, get_processor, expected, num_workers, limit, num_resumed
+):
+    def counting(processor, limit=None):
+        lump_partial = processor._lump_transitions_partial
+        counts = []
+
+        def lump_transitions_partial(chunk_prelumps):
+            if len(counts) == limit:
+                raise KeyboardInterrupt
+            counts.append(chunk_prelumps)
+            lump_partial(chunk_prelumps)
+
+        monkeypatch.setattr(
+            processor, "_lump_transitions_partial", lump_transitions_partial
+        )
+        return counts
+
+    settings = dict(
+        trans_chunk_size=20_000, num_workers=num_workers, checkpoint_chunks=3
+    )
+    monkeypatch.setattr(trans_index, "TRANS_BLOCK_SIZE", 1)
+    interrupted = get_processor(resume=False, **settings)
+    counting(interrupted, limit=limit)
+    with pytest.raises(KeyboardInterrupt):
+        interrupted.lump_transitions()
+    checkpoint_path = interrupted.output_dir / ".checkpoint"
+    assert checkpoint_path.is_file()
+
+    resumed = get_processor(resume=True, **settings)
+    counts = counting(resumed)
+    resumed.lump_transitions()
+    assert len(counts) == num_resumed
+    assert not checkpoint_path.exists()
+    assert_expected_outputs(resumed, expected)
+
+
+def test_states_artifact(monkeypatch, get_processor, expected):
+    lumped = get_processor(lump_states=False)
+    assert not lumped.load_lumped_states()
+    lumped.lump_states()
+    lumped.save_lumped_states()
+
+    loaded = get_processor(lump_states=False)
+    assert loaded.load_lumped_states()
+    assert loaded.lumped_states.equals(lumped.lumped_states)
+    assert loaded.states_map_lumped_to_original == lumped.states_map_lumped_to_original
+    assert np.array_equal(
+        loaded.states_array_original_to_lumped, lumped.states_array_original_to_lumped
+    )
+    assert np.array_equal(
+        loaded.states_boltzmann_weights, lumped.states_boltzmann_weights
+    )
+    loaded.lump_transitions()
+    assert_expected_outputs(loaded, expected)
+
+    # any change in the states lumping settings invalidates the artifact
+    changed = get_processor(lump_states=False)
+    monkeypatch.setattr(changed, "resolve_vib", ["v1", "v2"])
+    assert not changed.load_lumped_states()
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_trans_lumping_persisted_prelumps(
+    monkeypatch, get_processor, expected, num_workers
+):
+    settings = dict(trans_chunk_size=30_000, num_workers=num_workers)
+    reduced = get_processor(persist_prelumps=True, **settings)
+    reduced.lump_transitions()
+    # the prelumps sums do not depend on being reduced per file first
+    assert_expected_outputs(reduced, expected)
+    prelumps_paths = sorted(reduced.prelumps_dir.glob("*.npz"))
+    assert len(prelumps_paths) == len(trans_paths_split)
+
+    # all the prelumps are loaded, no .trans files are read
+    def read_columns(trans_path, state_ids=None):
+        raise AssertionError(f"{trans_path} read")
+
+    loaded = get_processor(persist_prelumps=True, **settings)
+    monkeypatch.setattr(loaded, "_get_read_trans_columns", lambda: read_columns)
+    loaded.lump_transitions()
+    assert_expected_outputs(loaded, expected)
+
+    # only the .trans file without its prelumps is reduced
+    prelumps_paths[0].unlink()
+    partially_loaded = get_processor(persist_prelumps=True, **settings)
+    partially_loaded.lump_transitions()
+    assert_expected_outputs(partially_loaded, expected)
+    assert len(list(reduced.prelumps_dir.glob("*.npz"))) == len(trans_paths_split)
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_shared_dataset_persisted_prelumps(
+    get_processor, expected, tmp_path, num_workers
+):
+    def get_shared():
+        processors = [
+            get_processor(
+                molecule=molecule,
+                lump_states=False,
+                trans_chunk_size=30_000,
+                num_workers=num_workers,
+            )
+            for molecule in (mol_input, mol_input_other)
+        ]
+        # only the first of the processors persists its prelumps
+        processors[0].persist_prelumps = True
+        shared = SharedDatasetProcessor(processors)
+        shared.lump_states()
+        return shared
+
+    reduced = get_shared()
+    reduced.lump_transitions()
+    lumped = [processor.lumped_transitions for processor in reduced.processors]
+    assert_expected_outputs(reduced.processors[0], expected)
+    prelumps_paths = sorted(reduced.lead.prelumps_dir.glob("*.npz"))
+    assert len(prelumps_paths) == len(trans_paths_split)
+    assert not (tmp_path / "BAR").exists()
+
+    # the .trans files are only reduced for the processors without their prelumps
+    prelumps_paths[0].unlink()
+    partially_loaded = get_shared()
+    partially_loaded.lump_transitions()
+    assert_expected_outputs(partially_loaded.processors[0], expected)
+    for processor, lumped_transitions in zip(partially_loaded.processors, lumped):
+        assert processor.lumped_transitions.equals(lumped_transitions)
+    assert len(list(reduced.lead.prelumps_dir.glob("*.npz"))) == len(
+        trans_paths_split
+    )
+
+
+def test_trans_lumping_temperatures(get_processor, expected):
+    processor = get_processor(temperatures=[700, 1500, 3000])
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+    # each temperature is the same as if processed on its own
+    for temp in [1500, 3000]:
+        single = get_processor(temperatures=[temp])
+        single.lump_transitions()
+        assert processor.lumped_transitions_by_temp[temp].equals(
+            single.lumped_transitions
+        )
+        assert processor.lumped_states_by_temp[temp].equals(single.lumped_states)
+    assert not processor.lumped_transitions_by_temp[3000].equals(
+        processor.lumped_transitions
+    )
+
+
+def test_trans_lumping_num_channels(get_processor, expected):
+    molecule = MoleculeInput("FOO", **{**mol_input.raw_input, "num_channels": 10})
+    processor = get_processor(molecule=molecule)
+    assert processor.num_channels == 10
+    processor.lump_transitions()
+    # the total lifetimes do not depend on the number of the channels kept
+    expected_states = expected["lumped_states"]
+    assert list(processor.lumped_states["tau"]) == list(expected_states["tau"])
+    lumped_transitions = processor.lumped_transitions
+    assert len(lumped_transitions) > len(expected["lumped_transitions"])
+    assert lumped_transitions.groupby("i").size().max() <= 10
+    # the kept channels add up to the total lifetimes
+    tau = 1 / (1 / lumped_transitions.tau_if).groupby(lumped_transitions.i).sum()
+    assert np.allclose(tau, processor.lumped_states.loc[tau.index, "tau"])
+
+
+@pytest.mark.parametrize("num_workers", (1, 2))
+def test_trans_lumping_downward_only(get_processor, expected, num_workers):
+    processor = get_processor(downward_only=True, num_workers=num_workers)
+    processor.lump_transitions()
+    assert_expected_outputs(processor, expected)
+
+
+@pytest.mark.parametrize("trans_reader", ("exomole", "numpy"))
+def test_trans_lumping_mixed_precision(get_processor, expected, trans_reader):
+    processor = get_processor(trans_reader=trans_reader, mixed_precision=True)
+    processor.lump_transitions()
+    lumped_transitions = processor.lumped_transitions
+    expected_transitions = expected["lumped_transitions"]
+    assert lumped_transitions[["i", "f"]].equals(expected_transitions[["i", "f"]])
+    # the documented bounds of the relative errors against the float64 lumping
+    assert np.allclose(
+        lumped_transitions.tau_if, expected_transitions.tau_if, rtol=3 * 2**-24, atol=0
+    )
+    assert np.allclose(
+        processor.lumped_states["tau"],
+        expected["lumped_states"]["tau"],
+        rtol=2**-24,
+        atol=0,
+    )
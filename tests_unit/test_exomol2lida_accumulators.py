@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from exomol2lida.accumulators import (
+    LumpedStatesAccumulator,
+    PrelumpsAccumulator,
+    compact_transitions,
+    reduce_transitions_chunk,
+    shared_surviving_transitions,
+    surviving_transitions,
+)
+
+
+def _states_chunk(rows, index):
+    return pd.DataFrame(
+        rows, columns=["E", "g_tot", "J", "v"], index=pd.Index(index, dtype="int64")
+    ).astype({"E": "float64", "g_tot": "float64", "J": "float64"})
+
+
+def test_lumped_states_accumulator_lowest_j_across_chunks():
+    acc = LumpedStatesAccumulator(["v"])
+    acc.update(_states_chunk([[10.0, 1, 2.0, "1"], [0.0, 1, 1.0, "0"]], [1, 2]))
+    # lower J for lump "1" in the second chunk resets its energy accumulate
+    acc.update(
+        _states_chunk(
+            [[12.0, 1, 1.0, "1"], [14.0, 3, 1.0, "1"], [2.0, 1, 3.0, "0"]], [3, 4, 5]
+        )
+    )
+    assert acc.lump_keys == ["0", "1"]
+    lumped_states = acc.get_lumped_states()
+    assert list(lumped_states.J_en) == [1.0, 1.0]
+    assert list(lumped_states.sum_w) == [0.0, 13.0]
+    assert list(lumped_states.sum_en_x_w) == [1.0, 4.0]
+    assert list(acc.lump_sizes) == [2, 3]
+    assert [list(ids) for ids in acc.group_by_slot(acc.state_ids)] == [
+        [2, 5],
+        [1, 3, 4],
+    ]
+
+
+def test_lumped_states_accumulator_multiple_quanta():
+    acc = LumpedStatesAccumulator(["el", "v"])
+    chunk = _states_chunk([[1.0, 1, 0.0, "0"], [2.0, 1, 0.0, "0"]], [1, 2])
+    chunk["el"] = ["B", "A"]
+    acc.update(chunk)
+    assert acc.lump_keys == [("A", "0"), ("B", "0")]
+    assert np.array_equal(acc.state_slots, [1, 0])
+
+
+def test_lumped_states_accumulator_missing_quanta():
+    acc = LumpedStatesAccumulator(["v"])
+    chunk = _states_chunk(
+        [[1.0, 1, 0.0, "a"], [2.0, 1, 0.0, None], [3.0, 1, 0.0, "b"]], [1, 2, 3]
+    )
+    chunk["v"] = pd.Categorical(chunk["v"])
+    # the state with the missing quantum is not accumulated, as if filtered out
+    assert list(acc.update(chunk)) == [True, False, True]
+    assert acc.lump_keys == ["a", "b"]
+    assert list(acc.state_ids) == [1, 3]
+    assert list(acc.state_slots) == [0, 1]
+    assert list(acc.get_lumped_states().sum_w) == [1.0, 3.0]
+    # a chunk without any quanta is skipped altogether
+    chunk = _states_chunk([[4.0, 1, 0.0, None]], [4])
+    assert list(acc.update(chunk)) == [False]
+    assert list(acc.state_ids) == [1, 3]
+
+
+def test_prelumps_accumulator_merges_chunks():
+    acc = PrelumpsAccumulator(num_lumped=3)
+    acc.update(np.array([5, 1, 5]), np.array([2, 0, 2]), np.array([0.5, 1.0, 0.25]))
+    acc.update(np.array([], dtype="int64"), np.array([], dtype="int64"), np.array([]))
+    acc.update(np.array([1, 7]), np.array([0, 1]), np.array([2.0, 4.0]))
+    assert acc.num_prelumps == 3
+    i, lumped_f, einstein_coeff_sums, sizes = acc.get_prelumps()
+    assert list(i) == [1, 5, 7]
+    assert list(lumped_f) == [0, 2, 1]
+    assert list(einstein_coeff_sums) == [3.0, 0.75, 4.0]
+    assert list(sizes) == [2, 2, 1]
+    assert acc.nbytes == 3 * 4 * 8
+
+
+def test_prelumps_accumulator_merges_into_store():
+    acc = PrelumpsAccumulator(num_lumped=1)
+    acc.update(np.array([2, 4, 6]), np.zeros(3, dtype="int64"), np.ones(3))
+    acc.get_store()  # merged into the store
+    # new keys before, between and after the stored ones, some repeated
+    acc.update(np.array([7, 0, 4, 3, 3]), np.zeros(5, dtype="int64"), np.ones(5))
+    keys, einstein_coeff_sums, _, sizes = acc.get_store()
+    assert list(keys) == [0, 2, 3, 4, 6, 7]
+    assert list(einstein_coeff_sums) == [1.0, 1.0, 2.0, 2.0, 1.0, 1.0]
+    assert list(sizes) == [1, 1, 2, 2, 1, 1]
+
+
+def test_compact_transitions_downward_only():
+    # original states 1, 2, 3, 4 lumped into 0, 1, 1, 2; state 5 filtered out
+    states_map = np.array([-1, 0, 1, 1, 2, -1, -1])
+    i = np.array([2, 1, 4, 3, 4, 5, 2], dtype="uint32")
+    f = np.array([1, 2, 1, 2, 5, 1, 9], dtype="uint32")
+    a_if = np.arange(7, dtype="float64")
+    i_kept, lumped_f, a_kept = compact_transitions(
+        states_map, i, f, a_if, downward_only=True
+    )
+    assert list(i_kept) == [2, 4]
+    assert list(lumped_f) == [0, 0]
+    assert list(a_kept) == [0.0, 2.0]
+    i_kept, lumped_f, a_kept = compact_transitions(states_map, i, f, a_if)
+    assert list(i_kept) == [2, 1, 4]
+
+
+def test_prelumps_accumulator_order_independent():
+    rng = np.random.default_rng(0)
+    i = rng.integers(0, 20, 20_000)
+    lumped_f = rng.integers(0, 3, 20_000)
+    einstein_coeffs = 10.0 ** rng.uniform(-20, 5, 20_000)
+    expected = {
+        key: math.fsum(einstein_coeffs[(i * 3 + lumped_f) == key])
+        for key in np.unique(i * 3 + lumped_f)
+    }
+    for chunk_size in (20_000, 999, 7):
+        order = rng.permutation(20_000)
+        acc = PrelumpsAccumulator(num_lumped=3)
+        for start in range(0, 20_000, chunk_size):
+            chunk = order[start : start + chunk_size]
+            acc.update(i[chunk], lumped_f[chunk], einstein_coeffs[chunk])
+        keys, einstein_coeff_sums, _, sizes = acc.get_store()
+        # the correctly rounded sums, whatever the chunks and the order
+        assert list(einstein_coeff_sums) == [expected[key] for key in keys]
+        assert sizes.sum() == 20_000
+
+
+def test_surviving_transitions():
+    # original states 1, 2, 3 lumped into 0, 0, 1; state 4 filtered out
+    states_map = np.array([-1, 0, 0, 1, -1, -1])
+    i = np.array([1, 2, 3, 4, 3, 1, 9], dtype="uint32")
+    f = np.array([3, 3, 1, 1, 2, 2, 1], dtype="uint32")
+    a_if = np.arange(7, dtype="float64")
+    # the blocks of the raw transitions are not aligned with the chunks
+    blocks = [(i[:2], f[:2], a_if[:2]), (i[2:7], f[2:7], a_if[2:7])]
+    survivors = list(surviving_transitions(blocks, 3, states_map))
+    assert len(survivors) == 3
+    assert [list(s[0]) for s in survivors] == [[1, 2, 3], [3], []]
+    assert [list(s[1]) for s in survivors] == [[1, 1, 0], [0], []]
+    assert [list(s[2]) for s in survivors] == [[0.0, 1.0, 2.0], [4.0], []]
+    # the same prelumps as reducing the raw chunks
+    for n, chunk_survivors in enumerate(survivors):
+        raw = slice(3 * n, 3 * n + 3)
+        expected = reduce_transitions_chunk(
+            states_map, i[raw], f[raw], a_if[raw], num_lumped=2
+        )
+        if not len(chunk_survivors[0]):
+            assert expected is None
+            continue
+        keys, inverse = np.unique(
+            chunk_survivors[0].astype("int64") * 2 + chunk_survivors[1],
+            return_inverse=True,
+        )
+        assert list(keys) == list(expected[0])
+        assert list(np.bincount(inverse, weights=chunk_survivors[2])) == list(
+            expected[1]
+        )
+
+
+def test_shared_surviving_transitions_positions():
+    states_map = np.array([-1, 0, 0, 1, -1, -1])
+    i = np.array([1, 2, 3, 4, 3, 1, 9], dtype="uint32")
+    f = np.array([3, 3, 1, 1, 2, 2, 1], dtype="uint32")
+    a_if = np.arange(7, dtype="float64")
+    # the blocks with positions are never split, the chunks end with the blocks
+    blocks = [
+        (i[:2], f[:2], a_if[:2], (1, 0)),
+        (i[2:3], f[2:3], a_if[2:3], (2, 5)),
+        (i[3:7], f[3:7], a_if[3:7], (3, 0)),
+    ]
+    chunks = list(shared_surviving_transitions(blocks, 3, [states_map]))
+    assert [position for _, position in chunks] == [(2, 5), (3, 0)]
+    assert [list(survivors[0][0]) for survivors, _ in chunks] == [[1, 2, 3], [3]]
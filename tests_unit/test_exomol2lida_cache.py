@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+
+from exomol2lida.cache import ColumnarCache
+
+
+def _states_chunks():
+    yield pd.DataFrame(
+        {"E": [0.0, 1.5], "v": ["0", "1"]}, index=pd.Index([1, 2], dtype="int64")
+    )
+    yield pd.DataFrame(
+        {"E": [2.5, 3.5], "v": ["1", "2"]}, index=pd.Index([3, 5], dtype="int64")
+    )
+
+
+def test_columnar_cache_round_trip(tmp_path):
+    input_path = tmp_path / "foo.states"
+    input_path.write_text("foo")
+    cache = ColumnarCache(tmp_path / "cache", size_limit=1e6)
+    original = pd.concat(cache.chunks(input_path, _states_chunks, chunk_size=2))
+    assert len(cache.entries()) == 1
+    # now served from the cache, which must not touch the source
+    cached_chunks = list(cache.chunks(input_path, None, chunk_size=3))
+    assert [len(chunk) for chunk in cached_chunks] == [3, 1]
+    assert pd.concat(cached_chunks).equals(original)
+    assert list(pd.concat(cached_chunks).index) == [1, 2, 3, 5]
+    assert pd.concat(cached_chunks).v.dtype == object
+
+
+def test_columnar_cache_invalidation_and_eviction(tmp_path):
+    input_path = tmp_path / "foo.states"
+    input_path.write_text("foo")
+    cache = ColumnarCache(tmp_path / "cache", size_limit=1e6)
+    list(cache.chunks(input_path, _states_chunks, chunk_size=2))
+    # changed input file results in a new entry
+    input_path.write_text("bar")
+    os.utime(input_path, ns=(0, 0))
+    list(cache.chunks(input_path, _states_chunks, chunk_size=2))
+    assert len(cache.entries()) == 2
+    # with the budget for a single entry, the least recently used one is evicted
+    entries = sorted(cache.entries(), key=lambda entry: entry[1]["last_used"])
+    cache.size_limit = max(size for _, _, size in entries)
+    cache.evict()
+    assert [entry_dir for entry_dir, _, _ in cache.entries()] == [entries[1][0]]
+
+
+def test_columnar_cache_categoricals(tmp_path):
+    input_path = tmp_path / "foo.states"
+    input_path.write_text("foo")
+    cache = ColumnarCache(tmp_path / "cache", size_limit=1e6)
+
+    def source_chunks():
+        for values in (["b", "a", None], ["c", "b"]):
+            yield pd.DataFrame({"el": pd.Categorical(values)})
+
+    original = list(cache.chunks(input_path, source_chunks, chunk_size=3))
+    cached = pd.concat(cache.chunks(input_path, None, chunk_size=3))
+    assert cached.el.dtype == "category"
+    assert list(cached.el.cat.categories) == ["a", "b", "c"]
+    assert cached.el.astype(object).tolist() == pd.concat(
+        [chunk.el.astype(object) for chunk in original]
+    ).tolist()
+
+
+def test_columnar_cache_reader_settings(tmp_path):
+    input_path = tmp_path / "foo.states"
+    input_path.write_text("foo")
+    cache = ColumnarCache(tmp_path / "cache", size_limit=1e6)
+    list(cache.chunks(input_path, _states_chunks, chunk_size=2, settings={"a": 1}))
+    list(cache.chunks(input_path, None, chunk_size=2, settings={"a": 1}))
+    assert len(cache.entries()) == 1
+    # changed settings of the reader (such as the column types) result in a new entry
+    list(cache.chunks(input_path, _states_chunks, chunk_size=2, settings={"a": 2}))
+    assert len(cache.entries()) == 2
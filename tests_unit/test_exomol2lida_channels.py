@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from exomol2lida.channels import (
+    renormalize_channels,
+    segment_sums,
+    select_fastest_channels,
+)
+
+
+def _pandas_fastest_channels(i, tau_if, num_channels):
+    frame = pd.DataFrame({"i": i, "tau_if": tau_if})
+    sorted_frame = frame.sort_values(["i", "tau_if"], ascending=[True, False])
+    return sorted_frame.groupby("i").tail(num_channels).index.to_numpy()
+
+
+@pytest.mark.parametrize("num_channels", (1, 2, 5, 50))
+def test_select_fastest_channels_as_sorted(num_channels):
+    rng = np.random.default_rng(42)
+    i = np.sort(rng.integers(0, 30, 500))
+    # plenty of ties and a few missing lifetimes
+    tau_if = rng.integers(1, 8, 500).astype("float64")
+    tau_if[rng.integers(0, 500, 10)] = np.nan
+    selected = select_fastest_channels(i, tau_if, num_channels)
+    assert np.array_equal(
+        selected, _pandas_fastest_channels(i, tau_if, num_channels)
+    )
+
+
+def test_segment_sums_as_pandas():
+    rng = np.random.default_rng(0)
+    values = rng.random(5000) * 10.0 ** rng.integers(-10, 10, 5000)
+    values[rng.integers(0, 5000, 10)] = np.nan
+    codes = np.sort(rng.integers(0, 50, 5000))
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+    expected = pd.Series(values).groupby(codes).sum().to_numpy()
+    assert np.array_equal(segment_sums(values, starts), expected)
+
+
+def test_renormalize_channels():
+    i = np.array([0, 0, 0, 3])
+    tau_if = np.array([1.0, 4.0, 2.0, 5.0])
+    states, tau, tau_kept, kept, tau_if_renorm = renormalize_channels(i, tau_if, 2)
+    assert list(states) == [0, 3]
+    assert np.allclose(tau, [1 / 1.75, 5.0])
+    assert np.allclose(tau_kept, [1 / 1.5, 5.0])
+    assert list(kept) == [2, 0, 3]
+    assert np.allclose(tau_if_renorm, [2.0 * 1.5 / 1.75, 1.5 / 1.75, 5.0])
+    # the kept channels add up to the total lifetime
+    assert np.isclose(1 / (1 / tau_if_renorm[:2]).sum(), tau[0])
+
+
+def test_renormalize_channels_empty():
+    empty = np.array([], dtype="int64")
+    states, tau, tau_kept, kept, tau_if_renorm = renormalize_channels(
+        empty, empty.astype("float64"), 5
+    )
+    assert not any(map(len, (states, tau, tau_kept, kept, tau_if_renorm)))
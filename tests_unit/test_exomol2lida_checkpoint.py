@@ -0,0 +1,39 @@
+import numpy as np
+
+from exomol2lida.checkpoint import TransCheckpoint, get_checkpoint_key
+
+
+def test_trans_checkpoint(tmp_path):
+    trans_path = tmp_path / "foo.trans"
+    trans_path.write_bytes(b"           1            2 1.0000E+00\n")
+    states_map = np.array([-1, 0, 1])
+
+    def get_key(states_map):
+        return get_checkpoint_key([trans_path], 10, "numpy", states_map, 2, -1)
+
+    key = get_key(states_map)
+    assert TransCheckpoint.load(tmp_path, key) is None
+    checkpoint = TransCheckpoint(
+        key, 0, (2**40, 3), [3], np.array([0.5]), np.array([1e-17]), np.array([7])
+    )
+    checkpoint.save(tmp_path)
+    assert {path.name for path in tmp_path.iterdir()} == {"foo.trans", ".checkpoint"}
+
+    loaded = TransCheckpoint.load(tmp_path, key)
+    assert (loaded.file_index, loaded.resume) == (0, (2**40, 3))
+    for field in TransCheckpoint.fields:
+        assert np.array_equal(getattr(loaded, field), getattr(checkpoint, field))
+
+    # a different states map (or changed .trans files) invalidates the checkpoint
+    assert TransCheckpoint.load(tmp_path, get_key(states_map[::-1])) is None
+    # and so do the positions of another kind
+    cached_key = get_checkpoint_key(
+        [trans_path], 10, "numpy", states_map, 2, -1, cached=True
+    )
+    assert TransCheckpoint.load(tmp_path, cached_key) is None
+    trans_path.write_bytes(b"           1            2 2.0000E+00\n")
+    assert TransCheckpoint.load(tmp_path, get_key(states_map)) is None
+
+    TransCheckpoint.remove(tmp_path)
+    assert not (tmp_path / ".checkpoint").exists()
+    TransCheckpoint.remove(tmp_path)
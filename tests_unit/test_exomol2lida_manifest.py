@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from exomol2lida import manifest
+
+
+def test_manifest_changes(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    states_path = data_dir / "foo.states"
+    trans_paths = [data_dir / "foo__00000-00100.trans", data_dir / "foo.trans"]
+    for path in [states_path] + trans_paths:
+        path.write_text(f"{path.name}\n")
+    molecule_input = SimpleNamespace(
+        raw_input={"mol_slug": "foo", "resolve_vib": ("v1",)},
+        version=20230101,
+        states_path=states_path,
+        trans_paths=trans_paths,
+    )
+    output_dir = tmp_path / "output"
+
+    fingerprint = manifest.get_input_fingerprint(molecule_input, [700], 5)
+    assert manifest.get_changes(manifest.load_manifest(output_dir), fingerprint) is None
+    manifest.save_manifest(output_dir, fingerprint)
+    saved = manifest.load_manifest(output_dir)
+    assert manifest.get_changes(saved, fingerprint) == []
+    assert manifest.get_changes(
+        saved, manifest.get_input_fingerprint(molecule_input, [700], 5)
+    ) == []
+
+    molecule_input.version = 20240101
+    trans_paths[1].write_text("changed\n")
+    changes = manifest.get_changes(
+        saved, manifest.get_input_fingerprint(molecule_input, [700], 5)
+    )
+    assert changes == ["version", "trans_files"]
+
+    manifest.remove_manifest(output_dir)
+    assert manifest.load_manifest(output_dir) is None
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from exomol2lida.process_dataset import DatasetProcessor
+
+
+def _bare_processor(monkeypatch):
+    monkeypatch.setattr(DatasetProcessor, "__init__", lambda self, molecule: None)
+    return DatasetProcessor("foo")
+
+
+def test_map_original_to_lumped(monkeypatch):
+    processor = _bare_processor(monkeypatch)
+    processor.states_array_original_to_lumped = np.array([-1, 1, -1, 0, -1])
+    processor._states_map_original_to_lumped = None
+    lumped = processor.map_original_to_lumped(np.array([1, 2, 3, 4, 1000]))
+    assert list(lumped) == [1, -1, 0, -1, -1]
+    assert processor.states_map_original_to_lumped == {1: 1, 3: 0}
+
+
+def test_lumped_states_ties_broken_by_quanta(monkeypatch):
+    def lumped_states(keys):
+        processor = _bare_processor(monkeypatch)
+        processor.molecule_input = SimpleNamespace(
+            def_parser=SimpleNamespace(num_states=None)
+        )
+        processor.states_header = ["i", "E", "g_tot", "J", "el", "v"]
+        processor.resolved_quanta = ["el", "v"]
+        processor.include_original_lifetimes = False
+        processor.temperatures = [2000.0]
+        processor._start_states_lumping()
+        # each lump in its own chunk, so the lumps come in the order of the keys
+        for state_id, (el, v) in enumerate(keys, start=1):
+            chunk = pd.DataFrame(
+                {"E": [1.0], "g_tot": [1.0], "J": [0.0], "el": [el], "v": [v]},
+                index=pd.Index([state_id], dtype="int64"),
+            )
+            processor._lump_states_chunk(chunk)
+        processor._finish_states_lumping()
+        return processor.lumped_states
+
+    keys = [("B", 1), ("A", 1), ("A", 0)]
+    lumped = lumped_states(keys)
+    # all the energies are tied, the lumped states are ordered by the quanta
+    assert list(zip(lumped.el, lumped.v)) == sorted(keys)
+    assert lumped.equals(lumped_states(keys[::-1]))
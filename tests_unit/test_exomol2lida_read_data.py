@@ -0,0 +1,129 @@
+import bz2
+
+import numpy as np
+import pandas as pd
+import pytest
+from exomole.exceptions import StatesParseError, TransParseError
+
+from exomol2lida import read_data
+from exomol2lida.read_data import (
+    EOS_MAGIC,
+    find_bz2_blocks,
+    fixed_width_trans_chunks,
+    iter_bz2_units,
+    read_trans_chunks,
+    single_precision_columns,
+    typed_states_chunks,
+)
+
+fixed_width_rows = (
+    "         12          3 1.2340e-05     1234.567890\n"
+    "          7        145 9.9000e+02        0.100000\n"
+    "       1001          1 5.0000e-01       12.000000\n"
+)
+whitespace_rows = "12 3 1.234e-05 1234.56789\n7  145 990.0 0.1\n1001 1 0.5 12\n"
+
+
+@pytest.mark.parametrize("rows", (fixed_width_rows, whitespace_rows))
+def test_fixed_width_trans_chunks(tmp_path, rows):
+    trans_path = tmp_path / "foo.trans"
+    trans_path.write_text(rows)
+    chunks = list(fixed_width_trans_chunks([trans_path], chunk_size=2, block_size=60))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [list(chunk.index) for chunk in chunks] == [[0, 1], [2]]
+    for chunk in chunks:
+        assert list(chunk.columns) == ["i", "f", "A_if"]
+        assert chunk.i.dtype == chunk.f.dtype == np.uint32
+    assert list(np.concatenate([chunk.i for chunk in chunks])) == [12, 7, 1001]
+    assert list(np.concatenate([chunk.f for chunk in chunks])) == [3, 145, 1]
+    assert list(np.concatenate([chunk.A_if for chunk in chunks])) == [
+        1.234e-05,
+        990.0,
+        0.5,
+    ]
+
+
+def test_single_precision_columns():
+    i = np.array([12, 7, 1001])
+    a_if = np.array([1.234e-05, 990.0, 0.5])
+    ((i_32, f_32, a_if_32),) = single_precision_columns([(i, i[::-1], a_if)])
+    assert i_32.dtype == f_32.dtype == np.uint32
+    assert a_if_32.dtype == np.float32
+    assert list(i_32) == [12, 7, 1001] and list(f_32) == [1001, 7, 12]
+    assert np.all(np.abs(a_if_32 / a_if - 1) <= 2**-24)
+
+
+def test_bz2_units_false_stream_end(monkeypatch):
+    rng = np.random.default_rng(0)
+    data = b"".join(b"%d\n" % n for n in rng.integers(0, 10**9, 60_000))
+    # two streams of several blocks each
+    buffer = bz2.compress(data, compresslevel=1) + bz2.compress(data, compresslevel=1)
+    blocks = find_bz2_blocks(buffer)
+    assert len(blocks) > 4
+    find_bit_pattern = read_data._find_bit_pattern
+
+    def with_false_stream_end(buffer, pattern, **kwargs):
+        offsets = find_bit_pattern(buffer, pattern, **kwargs)
+        if pattern == EOS_MAGIC:
+            # the end-of-stream magic appearing in the middle of the second block
+            offsets = sorted([*offsets, (blocks[1][0] + blocks[1][1]) // 2])
+        return offsets
+
+    monkeypatch.setattr(read_data, "_find_bit_pattern", with_false_stream_end)
+    assert find_bz2_blocks(buffer) == blocks
+    units = iter_bz2_units(buffer, num_threads=2)
+    assert b"".join(unit_data for _, _, unit_data in units) == 2 * data
+
+
+def test_fixed_width_trans_chunks_invalid(tmp_path):
+    trans_path = tmp_path / "foo.trans"
+    trans_path.write_text("1 2\n3 4\n")
+    with pytest.raises(TransParseError):
+        list(fixed_width_trans_chunks([trans_path]))
+    with pytest.raises(ValueError):
+        read_trans_chunks([trans_path], chunk_size=2, reader="foo")
+
+
+states_rows = (
+    "1 0.000000 1 0 A 0 1.0e+00 *\n"
+    "2 1.500000 3 1 A 1 inf 0\n"
+    "3 2.500000 3 1 X * NaN 1\n"
+)
+states_columns = ["i", "E", "g_tot", "J", "el", "v", "tau", "foo"]
+
+
+def test_typed_states_chunks(tmp_path):
+    states_path = tmp_path / "foo.states"
+    states_path.write_text(states_rows)
+    chunks = list(
+        typed_states_chunks(
+            states_path,
+            columns=states_columns,
+            usecols=["J", "E", "v", "el", "tau"],
+            int_columns=["v"],
+            numeric_columns=["tau"],
+            chunk_size=2,
+        )
+    )
+    assert [list(chunk.index) for chunk in chunks] == [[1, 2], [3]]
+    states = pd.concat(chunks)
+    assert list(states.columns) == ["E", "J", "el", "v", "tau"]
+    assert list(states.E) == [0.0, 1.5, 2.5]
+    assert list(states.v) == [0, 1, -1]
+    assert states.v.dtype == np.int32
+    assert list(chunks[0].el.cat.categories) == ["A"]
+    assert states.tau.iloc[:2].tolist() == [1.0, float("inf")]
+    assert np.isnan(states.tau.iloc[2])
+
+
+def test_typed_states_chunks_invalid(tmp_path):
+    states_path = tmp_path / "foo.states"
+    states_path.write_text(states_rows)
+    with pytest.raises(StatesParseError):
+        list(typed_states_chunks(states_path, states_columns[:-1], usecols=["E"]))
+    with pytest.raises(StatesParseError):
+        list(
+            typed_states_chunks(
+                states_path, states_columns, usecols=["el"], int_columns=["el"]
+            )
+        )
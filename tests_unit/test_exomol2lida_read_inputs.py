@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from exomol2lida.read_inputs import (
+    StatesFilter,
+    get_trans_wavenumber_range,
+    prune_trans_paths,
+)
+
+
+def _states_chunk():
+    return pd.DataFrame(
+        {
+            "E": [0.0, 100.0, 200.0, 300.0, 20_000.0, np.nan],
+            "J": [0.5, 1.5, 0.5, 0.5, 0.5, 0.5],
+            "el": ["X", "A", "*", "X", "X", "X"],
+            "iso": ["1", "1", "1", "0", "1", "1"],
+            "v": ["0", "-1", "1", "*", "2", "0"],
+        }
+    )
+
+
+def test_states_filter():
+    states_filter = StatesFilter(
+        only_with={"iso": "1"},
+        only_without={"el": "A"},
+        resolve_el=["el"],
+        resolve_vib=["v"],
+        energy_max=10_000.0,
+    )
+    assert states_filter.columns == ["E", "iso", "el", "v"]
+    chunk = _states_chunk()
+    expected = [True, False, False, False, False, False]
+    assert list(states_filter(chunk)) == expected
+    # the same for the categorical and typed columns
+    typed_chunk = chunk.astype({"el": "category", "iso": "category"})
+    typed_chunk["v"] = [0, -1, 1, -1, 2, 0]
+    assert list(states_filter(typed_chunk)) == expected
+
+
+def test_states_filter_missing_quanta():
+    states_filter = StatesFilter(resolve_el=["el"], resolve_vib=["v"])
+    chunk = pd.DataFrame(
+        {
+            "E": [0.0, 1.0, 2.0, 3.0],
+            "el": ["X", None, "X", np.nan],
+            "v": [0, 0, np.nan, 1],
+        }
+    )
+    # the states with any resolved quanta missing are rejected
+    expected = [True, False, False, False]
+    assert list(states_filter(chunk)) == expected
+    assert list(states_filter(chunk.astype({"el": "category"}))) == expected
+
+
+def test_states_filter_numerical_columns():
+    chunk = _states_chunk()
+    assert list(StatesFilter(only_with={"J": "1.5"})(chunk)) == [
+        False,
+        True,
+        False,
+        False,
+        False,
+        False,
+    ]
+    assert StatesFilter(only_without={"J": "foo"})(chunk)[:5].all()
+
+
+def test_prune_trans_paths():
+    trans_paths = [
+        Path("1H-12C-14N__Harris__00000-00100.trans.bz2"),
+        Path("1H-12C-14N__Harris__00100-00200.trans.bz2"),
+        Path("1H-12C-14N__Harris__00200-00300.trans"),
+        Path("1H-12C-14N__Harris.trans.bz2"),
+    ]
+    assert get_trans_wavenumber_range(trans_paths[1]) == (100.0, 200.0)
+    assert get_trans_wavenumber_range(trans_paths[3]) is None
+    kept, skipped = prune_trans_paths(trans_paths, energy_max=100.0)
+    assert kept == [trans_paths[0], trans_paths[1], trans_paths[3]]
+    assert skipped == [trans_paths[2]]
+    assert prune_trans_paths(trans_paths, energy_max=float("inf"))[1] == []
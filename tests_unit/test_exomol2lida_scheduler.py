@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from exomol2lida.scheduler import format_summary, run_jobs
+
+
+def _dying_target(formulas):
+    (name,) = formulas
+    if name == "dying":
+        os._exit(1)  # such as when killed out of memory
+    time.sleep(0.5)
+    return "OK", 0.5, None
+
+
+class _Job:
+    def __init__(self, name, cost, memory):
+        self.name = name
+        self.formulas = [name]
+        self.cost = (cost, 0)
+        self.memory = memory
+
+
+def test_run_jobs():
+    jobs = [
+        _Job("small1", 10, 1),
+        _Job("huge1", 300, 10),
+        _Job("small2", 20, 1),
+        _Job("huge2", 290, 10),
+        _Job("failing", 30, 1),
+    ]
+    memory = {job.name: job.memory for job in jobs}
+    duration = {job.name: job.cost[0] / 1000 for job in jobs}
+    lock = threading.Lock()
+    running, started, peaks = set(), [], []
+
+    def target(formulas):
+        (name,) = formulas
+        with lock:
+            running.add(name)
+            started.append(name)
+            peaks.append((len(running), sum(memory[n] for n in running)))
+        time.sleep(duration[name])
+        with lock:
+            running.remove(name)
+        if name == "failing":
+            raise ValueError("foo")
+        return "OK", duration[name], 1_000_000
+
+    results = run_jobs(
+        jobs, target, num_jobs=3, memory_budget=12, get_executor=ThreadPoolExecutor
+    )
+    # longest first, but the two huge jobs never run at once
+    assert started == ["huge1", "failing", "small2", "small1", "huge2"]
+    assert all(num_running <= 3 for num_running, _ in peaks)
+    assert all(memory_used <= 12 for _, memory_used in peaks)
+    assert results["failing"] == ("FAILED: ValueError: foo", None, None)
+    assert results["huge2"] == ("OK", 0.29, 1_000_000)
+
+    summary = format_summary(results).splitlines()
+    assert len(summary) == 1 + len(jobs)
+    assert "1 MB" in summary[1]
+
+
+def test_run_jobs_dead_worker():
+    jobs = [_Job("healthy1", 30, 1), _Job("dying", 20, 1), _Job("healthy2", 10, 1)]
+    results = run_jobs(jobs, _dying_target, num_jobs=3, memory_budget=12)
+    # only the job with the dead worker process fails, not the ones running alongside
+    assert results["dying"][0].startswith("FAILED: BrokenProcessPool")
+    assert results["healthy1"] == results["healthy2"] == ("OK", 0.5, None)
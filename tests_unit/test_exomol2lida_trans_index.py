@@ -0,0 +1,170 @@
+import bz2
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exomol2lida import trans_index
+from exomol2lida.read_data import TRANS_READERS, read_trans_chunks
+from exomol2lida.trans_index import TransBlockIndex, indexed_trans_chunks
+
+
+def _write_trans(path, i, f):
+    lines = "".join(
+        f"{i_:>12d} {f_:>12d} {1.5 * n:10.4E}\n" for n, (i_, f_) in enumerate(zip(i, f))
+    ).encode()
+    path.write_bytes(bz2.compress(lines) if path.suffix == ".bz2" else lines)
+
+
+@pytest.mark.parametrize("reader", TRANS_READERS)
+@pytest.mark.parametrize("file_name", ("foo.trans", "foo.trans.bz2"))
+def test_indexed_trans_chunks(monkeypatch, tmp_path, file_name, reader):
+    # small units of the uncompressed file, not aligned with the lines
+    monkeypatch.setattr(trans_index, "UNIT_SIZE", 100)
+    trans_path = tmp_path / file_name
+    i = np.arange(1, 101)
+    _write_trans(trans_path, i, i + 1000)
+    index_dir = tmp_path / "index"
+    indexed_trans_chunks = partial(trans_index.indexed_trans_chunks, reader=reader)
+
+    built = pd.concat(indexed_trans_chunks([trans_path], 30, index_dir))
+    assert built.i.tolist() == i.tolist()
+    assert built.f.tolist() == (i + 1000).tolist()
+    index = TransBlockIndex.load(index_dir, trans_path)
+    assert index is not None
+    assert index.num_rows.sum() == 100
+
+    # all the units read with the index give the same rows
+    full = pd.concat(indexed_trans_chunks([trans_path], 30, index_dir))
+    assert full.equals(built)
+
+    # only the units with any transitions between the state ids are read
+    state_ids = np.array([5, 1005])
+    selected = pd.concat(
+        indexed_trans_chunks([trans_path], 30, index_dir, state_ids=state_ids)
+    )
+    assert 5 in selected.i.tolist()
+    if file_name.endswith("bz2"):
+        # a single compressed block
+        assert len(selected) == 100
+    else:
+        assert len(selected) < 100
+        assert selected.equals(built[built.i.isin(selected.i)].reset_index(drop=True))
+
+    # no transition from the states
+    state_ids = np.array([200, 1005])
+    assert not list(
+        indexed_trans_chunks([trans_path], 30, index_dir, state_ids=state_ids)
+    )
+
+
+def test_trans_block_index_invalidation(monkeypatch, tmp_path):
+    monkeypatch.setattr(trans_index, "UNIT_SIZE", 100)
+    trans_path = tmp_path / "foo.trans"
+    _write_trans(trans_path, [1, 2], [3, 4])
+    list(indexed_trans_chunks([trans_path], 30, tmp_path))
+    assert TransBlockIndex.load(tmp_path, trans_path) is not None
+    _write_trans(trans_path, [1, 2, 5], [3, 4, 6])
+    assert TransBlockIndex.load(tmp_path, trans_path) is None
+
+
+@pytest.mark.parametrize("reader", TRANS_READERS)
+def test_trans_units_reader(monkeypatch, tmp_path, reader):
+    monkeypatch.setattr(trans_index, "UNIT_SIZE", 100)
+    trans_path = tmp_path / "foo.trans"
+    # more digits than float64 holds, not all parsed the same by both readers
+    trans_path.write_bytes(
+        b"".join(
+            f"{n:>6d} {n + 7:>6d} 1.23456789012345678{n:03d}E-0{n % 10}\n".encode()
+            for n in range(1, 200)
+        )
+    )
+    expected = pd.concat(read_trans_chunks([trans_path], 30, reader=reader))
+    # the configured reader is used without any index, and with the index built
+    # and used
+    index_dir = tmp_path / "index"
+    for index_dir in (None, index_dir, index_dir):
+        chunks = pd.concat(
+            indexed_trans_chunks([trans_path], 30, index_dir, reader=reader)
+        )
+        assert chunks.i.tolist() == expected.i.tolist()
+        assert chunks.f.tolist() == expected.f.tolist()
+        assert chunks.A_if.to_numpy().tobytes() == expected.A_if.to_numpy().tobytes()
+    assert TransBlockIndex.load(index_dir, trans_path) is not None
+
+
+def _write_units(trans_path, i):
+    if trans_path.suffix == ".bz2":
+        # several compressed blocks, in separate streams
+        trans_path.write_bytes(
+            b"".join(
+                bz2.compress(
+                    "".join(f"{n:>6d} {n + 1:>6d} 1.0E+00\n" for n in part).encode()
+                )
+                for part in np.array_split(i, 3)
+            )
+        )
+    else:
+        _write_trans(trans_path, i, i + 1)
+
+
+def _read_all(trans_path, index_dir, **kwargs):
+    return list(trans_index.indexed_trans_columns(trans_path, index_dir, **kwargs))
+
+
+@pytest.mark.parametrize("indexed", (False, True))
+@pytest.mark.parametrize("file_name", ("foo.trans", "foo.trans.bz2"))
+def test_trans_units_resume(monkeypatch, tmp_path, file_name, indexed):
+    # a block per unit
+    monkeypatch.setattr(trans_index, "UNIT_SIZE", 100)
+    monkeypatch.setattr(trans_index, "TRANS_BLOCK_SIZE", 1)
+    trans_path = tmp_path / file_name
+    i = np.arange(1, 301)
+    _write_units(trans_path, i)
+    index_dir = tmp_path / "index" if indexed else None
+    _read_all(trans_path, index_dir)
+    blocks = _read_all(trans_path, index_dir)
+    assert len(blocks) > 2
+    # resuming from any of the positions reads only the following blocks
+    for n in range(0, len(blocks), max(len(blocks) // 10, 1)):
+        position = blocks[n][3]
+        resumed = _read_all(trans_path, index_dir, start=position)
+        assert len(resumed) == len(blocks) - n - 1
+        for block, resumed_block in zip(blocks[n + 1 :], resumed):
+            assert block[0].tolist() == resumed_block[0].tolist()
+            assert block[3] == resumed_block[3]
+
+
+@pytest.mark.parametrize("indexed", (False, True))
+@pytest.mark.parametrize("file_name", ("foo.trans", "foo.trans.bz2"))
+def test_trans_spans(monkeypatch, tmp_path, file_name, indexed):
+    monkeypatch.setattr(trans_index, "UNIT_SIZE", 100)
+    monkeypatch.setattr(trans_index, "TRANS_BLOCK_SIZE", 1)
+    trans_path = tmp_path / file_name
+    i = np.arange(1, 301)
+    _write_units(trans_path, i)
+    index_dir = tmp_path / "index" if indexed else None
+    # the file to be indexed is not split before being indexed
+    assert trans_index.trans_spans(trans_path, 50, index_dir=index_dir) == (
+        [(None, None)] if indexed else trans_index.trans_spans(trans_path, 50)
+    )
+    _read_all(trans_path, index_dir)
+
+    for span_size in (50, 250, 10_000):
+        spans = trans_index.trans_spans(trans_path, span_size, index_dir=index_dir)
+        assert len(spans) == -(-trans_path.stat().st_size // span_size)
+        # all the lines are read once, whichever span they fall into
+        read = [
+            block[0]
+            for start, stop in spans
+            for block in _read_all(trans_path, index_dir, start=start, stop=stop)
+        ]
+        assert np.concatenate(read).tolist() == i.tolist()
+        # the spans can be resumed from the positions of their blocks
+        start, stop = spans[0]
+        blocks = _read_all(trans_path, index_dir, start=start, stop=stop)
+        resumed = _read_all(trans_path, index_dir, start=blocks[0][3], stop=stop)
+        assert [block[0].tolist() for block in resumed] == [
+            block[0].tolist() for block in blocks[1:]
+        ]